@@ -1,11 +1,32 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import lxml
+import os
 import os.path
+import re
+import hashlib
 import urllib.request
 import json
 import pprint as pp
 from datetime import datetime
 import time
+import event_registry
+
+#the only tags of a meet results page we look at. Everything else is skipped while the page is parsed.
+MEET_PAGE_TAGS = ["title", "h1", "h2", "h3", "h4", "h5", "h6", "table", "time"]
+#words in the header row of a results table -> which column it is
+MEET_COLUMNS = {"place": "place", "pl": "place", "#": "place",
+                "athlete": "name", "name": "name",
+                "gr": "grade", "grade": "grade", "yr": "grade", "year": "grade",
+                "team": "team", "school": "team", "affiliation": "team",
+                "mark": "mark", "time": "mark", "result": "mark", "performance": "mark", "distance": "mark",
+                "height": "mark"}
+#what the columns are when a table has no header row
+DEFAULT_COLUMNS = ["place", "name", "grade", "team", "mark"]
+#headings that are part of an event (a heat or flight of it) instead of a new one
+PART_OF_EVENT = re.compile(r"\b(heat|section|flight|final|finals|prelims?|division)\b", re.I)
+ATHLETE_LINK = re.compile(r"/athlete/(\d+)|[?&]AID=(\d+)", re.I)
+RESULT_LINK = re.compile(r"/result/(\d+)|[?&]RID=(\d+)", re.I)
+MEET_LINK = re.compile(r"/meet/(\d+)", re.I)
 
 
 def read_json(filepath, encoding='utf-8'):
@@ -55,6 +76,29 @@ def get_results(athlete):
     results_dict = athlete.get("resultsTF")
     return results_dict
 
+def index_results(athlete):
+    """
+    Goes through the athlete's races once and sorts them by EventID, so every event after the first
+    is just a lookup. The index is kept on the athlete dictionary.
+
+    Inputs: athlete (a dictionary from the json file of all info for that athlete)
+    Returns: a dictionary of EventID -> list of tuples of (race time, meet id)
+    """
+    if "_event_index" not in athlete:
+        index = {}
+        for result in get_results(athlete) or []:
+            index.setdefault(result.get("EventID"), []).append((result.get("Result"), result.get("MeetID")))
+        athlete["_event_index"] = index
+    return athlete["_event_index"]
+
+def get_event(athlete, event_id):
+    """
+    Inputs: athlete (a dictionary from the json file of all info for that athlete)
+            event_id (the athletic.net EventID, see event_registry.py)
+    Returns: a list of Tuples with race times and meet id numbers
+    """
+    return index_results(athlete).get(event_id, [])
+
 
 def get_800(athlete):
     """
@@ -65,11 +109,7 @@ def get_800(athlete):
 
     Returns: a list of Tuples with Meet Names and 800m times
     """
-    times800 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 4:
-            times800.append((result.get("Result"), result.get("MeetID")))
-    return times800
+    return get_event(athlete, event_registry.find("800")["id"])
 
 def get_1600(athlete):
     """
@@ -79,11 +119,7 @@ def get_1600(athlete):
 
     Returns: a list of Tuples with Meet Names and 800m times
     """
-    times1600 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 52: #and result.get("MeetID") in meetlist.values():
-            times1600.append((result.get("Result"), result.get("MeetID")))
-    return times1600
+    return get_event(athlete, event_registry.find("1600")["id"])
 
 def get_3200(athlete):
     """
@@ -93,11 +129,7 @@ def get_3200(athlete):
 
     Returns: a list of Tuples with Meet Names and 800m times
     """
-    times3200 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 60: #and result.get("MeetID") in meetlist.values():
-            times3200.append((result.get("Result"), result.get("MeetID")))
-    return times3200
+    return get_event(athlete, event_registry.find("3200")["id"])
 
 def get_4x800(athlete):
     """
@@ -107,11 +139,7 @@ def get_4x800(athlete):
 
     Returns: a list of Tuples with Meet Names and 800m times
     """
-    times4x800 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 39: #and result.get("MeetID") in meetlist.values():
-            times4x800.append((result.get("Result"), result.get("MeetID")))
-    return times4x800
+    return get_event(athlete, event_registry.find("4x800")["id"])
 
 def get_4x400(athlete):
     """
@@ -121,11 +149,7 @@ def get_4x400(athlete):
 
     Returns: a list of Tuples with Meet Names and 800m times
     """
-    times4x400 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 8: #and result.get("MeetID") in meetlist.values():
-            times4x400.append((result.get("Result"), result.get("MeetID")))
-    return times4x400
+    return get_event(athlete, event_registry.find("4x400")["id"])
 
 def pretty_results(meets, distance_results):
     """
@@ -182,6 +206,233 @@ def fastest(racelist):
             pass
     return fastest
 
+def read_meet_page(source, cache_directory="meets", client=None):
+    """
+    Gets the html of a meet results page. A url is downloaded once and kept in cache_directory (named after
+    a hash of the url), so asking for the same meet again reads the saved copy. Anything else is read as a
+    saved html file.
+
+    Inputs: source (url or file path), cache_directory, client (an AthleticNetClient to download with)
+
+    Returns: the html as a string
+    """
+    if not source.startswith(("http://", "https://")):
+        with open(source, "r", encoding="utf-8") as file_obj:
+            return file_obj.read()
+    filename = os.path.join(cache_directory, hashlib.sha256(source.encode("utf-8")).hexdigest()[:20] + ".html")
+    if os.path.isfile(filename):
+        with open(filename, "r", encoding="utf-8") as file_obj:
+            return file_obj.read()
+    from athletic_client import AthleticNetClient
+    own_client = client is None
+    client = client or AthleticNetClient()
+    try:
+        html = client.get(source).body.decode("utf-8", errors="replace")
+    finally:
+        if own_client:
+            client.close()
+    os.makedirs(cache_directory, exist_ok=True)
+    with open(filename + ".part", "w", encoding="utf-8") as f_out:
+        f_out.write(html)
+    os.replace(filename + ".part", filename)
+    return html
+
+def _cell_text(cell):
+    return " ".join(cell.get_text(" ", strip=True).split())
+
+def _link_id(cell, pattern):
+    for link in cell.find_all("a", href=True):
+        found = pattern.search(link["href"])
+        if found:
+            return found.group(1) or found.group(2)
+    return None
+
+def _table_columns(table):
+    """
+    Returns: a tuple of (list of column names for the table's cells, the header row or None)
+    """
+    for row in table.find_all("tr"):
+        headers = row.find_all("th")
+        if headers and not row.find("td"):
+            return [MEET_COLUMNS.get(_cell_text(cell).lower().rstrip(".:"), None) for cell in headers], row
+        break
+    return DEFAULT_COLUMNS, None
+
+def _number(text):
+    digits = re.match(r"\d+", text or "")
+    return int(digits.group()) if digits else None
+
+def parse_meet_page(html, meet_id=None, meet_name=None, date=None):
+    """
+    Reads every athlete's marks out of a meet results page (or a saved copy of one). The page is parsed with
+    lxml through BeautifulSoup, keeping only the headings and tables, then walked once from top to bottom:
+    a heading that names an event (see event_registry.match) starts that event, and each row of the tables
+    under it is one mark. The columns of a table are found from its header row (Place, Athlete, Grade, Team,
+    Mark...), and the athlete and result ids from the links in the row.
+
+    Inputs:
+    html - the page
+    meet_id, meet_name, date - the meet's athletic.net id, name and date ('YYYY-MM-DD'), if the page doesn't
+                               have them (the id comes from a /meet/<id> link, the name from the first h1 or the
+                               title and the date from a <time datetime="..."> tag)
+
+    Returns: a dictionary with the "meet" (shaped like an entry of a bio's "meets": IDMeet, MeetName, EndDate),
+    the "results", a list of dictionaries shaped like a bio's resultsTF (IDResult, EventID, Result, MeetID,
+    Grade) plus the Place, AthleteID, Name and Team, and how many rows were "skipped" (a dictionary of reason ->
+    number of rows). Athletes without a link (relay teams, usually) have an AthleteID of None. Rows of events we
+    don't know and rows without a mark or name are skipped.
+    """
+    if meet_id is None:
+        found = MEET_LINK.search(html)
+        meet_id = int(found.group(1)) if found else None
+    soup = BeautifulSoup(html, "lxml", parse_only=SoupStrainer(MEET_PAGE_TAGS))
+    if meet_name is None:
+        heading = soup.find("h1") or soup.find("title")
+        meet_name = _cell_text(heading) if heading else None
+    if date is None:
+        stamp = soup.find("time", attrs={"datetime": True})
+        date = stamp["datetime"][:10] if stamp else None
+    meet = {"IDMeet": meet_id, "MeetName": meet_name, "EndDate": date}
+
+    results = []
+    skipped = {"event we don't know": 0, "no mark or name": 0}
+    event = None
+    for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6", "table"]):
+        if tag.name != "table":
+            text = _cell_text(tag)
+            found = event_registry.match(text)
+            if found is not None:
+                event = found
+            elif not PART_OF_EVENT.search(text):
+                event = None
+            continue
+        caption = tag.find("caption")
+        table_event = event_registry.match(_cell_text(caption)) if caption else None
+        table_event = table_event or event
+        if table_event is None:
+            skipped["event we don't know"] += sum(1 for row in tag.find_all("tr") if len(row.find_all("td")) >= 2)
+            continue
+        columns, header = _table_columns(tag)
+        for row in tag.find_all("tr"):
+            if row is header:
+                continue
+            cells = row.find_all("td")
+            if len(cells) < 2:
+                continue
+            values = {}
+            for column, cell in zip(columns, cells):
+                if column is not None:
+                    values[column] = cell
+            if "mark" not in values or "name" not in values:
+                skipped["no mark or name"] += 1
+                continue
+            mark = _cell_text(values["mark"])
+            result_id = _link_id(row, RESULT_LINK)
+            athlete_id = _link_id(values["name"], ATHLETE_LINK)
+            results.append({"IDResult": int(result_id) if result_id else None,
+                            "EventID": table_event["id"],
+                            "Result": mark,
+                            "MeetID": meet_id,
+                            "Grade": _number(_cell_text(values["grade"])) if "grade" in values else None,
+                            "Place": _number(_cell_text(values["place"])) if "place" in values else None,
+                            "AthleteID": athlete_id,
+                            "Name": _cell_text(values["name"]),
+                            "Team": _cell_text(values["team"]) if "team" in values else None})
+    return {"meet": meet, "results": results, "skipped": skipped}
+
+def meet_bios(meet_results):
+    """
+    Splits a meet's results (from parse_meet_page) into one dictionary per athlete shaped like their bio json
+    ("athlete", "resultsTF" and "meets"), so everything that reads a bio (get_event, fastest, track.py's get_
+    functions) works on them. Athletes without an id are left out.
+
+    Returns: a dictionary of athlete id -> bio dictionary
+    """
+    meet = meet_results["meet"]
+    bios = {}
+    for result in meet_results["results"]:
+        if result["AthleteID"] is None:
+            continue
+        bio = bios.get(result["AthleteID"])
+        if bio is None:
+            bio = bios[result["AthleteID"]] = {"athlete": {"IDAthlete": int(result["AthleteID"]), "Name": result["Name"],
+                                                           "Team": result["Team"]},
+                                               "resultsTF": [], "meets": {str(meet["IDMeet"]): meet}}
+        bio["resultsTF"].append(result)
+    return bios
+
+def _mark_key(event_id, mark, value):
+    #two marks are the same race if they are in the same event and come to the same number (so "4:31.2" on a meet
+    #page matches "4:31.20" in a bio and 13.88m matches 45' 6.5"), or read the same if they aren't a mark
+    if value is not None:
+        return event_id, round(value, 2)
+    return event_id, " ".join((mark or "").lower().split())
+
+def _meet_result_id(result, number):
+    #results without an athletic.net id get a made up (negative) one that is the same every time the page is read,
+    #so reading a meet twice doesn't save its marks twice
+    key = f"{result['MeetID']}-{result['EventID']}-{result['AthleteID']}-{number}"
+    return -int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:12], 16)
+
+def ingest_meet(store, meet_results):
+    """
+    Adds a meet's results (from parse_meet_page) to the team database (see results_store.py). Each athlete's
+    marks are added next to what is already saved for them, and their leaderboards are updated. A mark without
+    an athletic.net result id that is already saved for the athlete at this meet (from their bio, or from reading
+    the page before) in the same event is matched up with it and updated instead of being saved again.
+    Marks without an athlete (relay teams) can't be saved and are only counted.
+
+    Inputs: store (an open results_store.ResultsStore), meet_results
+
+    Returns: a tuple of (number of athletes, number of marks saved, number of marks without an athlete)
+    Raises: ValueError if the meet has no id
+    """
+    meet = meet_results["meet"]
+    if meet["IDMeet"] is None:
+        raise ValueError("The meet page doesn't say which meet it is. Give the meet id.")
+    meets = [(meet["IDMeet"], meet["MeetName"], meet["EndDate"])]
+    athletes, marks = 0, 0
+    for athlete_id, bio in meet_bios(meet_results).items():
+        page_ids = {result["IDResult"] for result in bio["resultsTF"] if result["IDResult"] is not None}
+        #saved races at this meet, athletic.net's own (positive) ids first so a bio's race is the one that is kept
+        saved = {}
+        for result_id, event_id, mark, value in sorted(store.meet_marks(athlete_id, meet["IDMeet"]),
+                                                       key=lambda row: row[0] is None or row[0] < 0):
+            if result_id is not None and result_id not in page_ids:
+                saved.setdefault(_mark_key(event_id, mark, value), []).append(result_id)
+        seen = {}
+        rows = []
+        for result in bio["resultsTF"]:
+            number = seen[result["EventID"]] = seen.get(result["EventID"], 0) + 1
+            value = event_registry.parse_mark(result["Result"], event_registry.kind(result["EventID"]))
+            result_id = result["IDResult"]
+            if result_id is None:
+                matches = saved.get(_mark_key(result["EventID"], result["Result"], value))
+                result_id = matches.pop(0) if matches else _meet_result_id(result, number)
+            rows.append((result_id, result["EventID"], result["MeetID"], result["Result"], value, result["Grade"]))
+        marks += store.ingest(athlete_id, bio["athlete"]["Name"], meets, rows, replace=False)
+        athletes += 1
+    return athletes, marks, sum(1 for result in meet_results["results"] if result["AthleteID"] is None)
+
+def print_meet(meet_results, team=None):
+    """
+    Prints a meet's results event by event, optionally only one team's (any team whose name contains team).
+    """
+    meet = meet_results["meet"]
+    print(f"{meet['MeetName']} ({meet['EndDate'] or 'no date'})")
+    event_id = None
+    for result in meet_results["results"]:
+        if team and team.lower() not in (result["Team"] or "").lower():
+            continue
+        if result["EventID"] != event_id:
+            event_id = result["EventID"]
+            print(event_registry.event(event_id)["title"])
+        place = "" if result["Place"] is None else result["Place"]
+        print(f"{place:>4} {result['Result']:<10} {result['Name']:<26} {result['Team'] or ''}")
+    for reason, rows in (meet_results.get("skipped") or {}).items():
+        if rows:
+            print(f"Skipped {rows} row(s): {reason}")
+
 def main():
 
     hdr = {
@@ -193,7 +444,8 @@ def main():
         'Connection': 'keep-alive'
         }
 
-    base_url = "https://www.athletic.net/api/v1/AthleteBio/GetAthleteBioData?athleteId="
+    #ATHLETIC_NET_URL points this at a stand-in server (see athletic_standin.py) instead of athletic.net
+    base_url = os.environ.get("ATHLETIC_NET_URL") or "https://www.athletic.net/api/v1/AthleteBio/GetAthleteBioData?athleteId="
 
 
     athlete_info = [{'David Whitaker': '15714155'},
@@ -0,0 +1,329 @@
+import io
+import os
+import json
+import zlib
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import instrument
+
+#brotli is optional. If it isn't installed we just don't ask the server for it.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#url to access athletic.net
+DEFAULT_BASE_URL = "https://www.athletic.net/api/v1/AthleteBio/GetAthleteBioData?athleteId="
+#set this to send every download somewhere else, i.e. to a stand-in server from athletic_standin.py:
+#ATHLETIC_NET_URL=http://127.0.0.1:8508/api/v1/AthleteBio/GetAthleteBioData?athleteId=
+BASE_URL_VAR = "ATHLETIC_NET_URL"
+WEB_TYPE = '&sport=tf&'
+LEVEL = 'level=4'
+#where a school's track roster for one season is, on the same host as the bio data. The same path is served by
+#athletic_standin.py. If athletic.net moves it, this and school_crawl.parse_roster are the places to fix.
+ROSTER_PATH = "/api/v1/TeamHome/GetAthletes"
+
+#header info for athletic.net. Accept-Encoding and Connection are filled in by the client.
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36',
+    'Accept': 'application/json,text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.3',
+    'Accept-Language': 'en-US,en;q=0.8'
+    }
+
+#redirects that are followed (the request is sent again, still a GET, to the Location), and how many in a row
+REDIRECT_STATUS = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+#how much of the response body is read (and decompressed) at a time
+CHUNK_SIZE = 64 * 1024
+
+#errors that mean a kept-alive connection was closed by the server while it sat in the pool
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                           ConnectionResetError, BrokenPipeError)
+
+
+def default_base_url():
+    """
+    Returns: the url downloads go to, ATHLETIC_NET_URL if it is set or athletic.net otherwise
+    """
+    return os.environ.get(BASE_URL_VAR) or DEFAULT_BASE_URL
+
+def accept_encoding():
+    """
+    Returns: the Accept-Encoding header value for the compression formats we can decode
+    """
+    return "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+class StreamDecoder:
+    """
+    Decompresses a response body a chunk at a time as it comes off the socket, so the compressed
+    and the decompressed copies of a big bio never have to sit in memory together.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = (encoding or "identity").strip().lower()
+        if self.encoding == "gzip" or self.encoding == "x-gzip":
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "deflate":
+            #most servers send zlib wrapped deflate but some send it raw, so the first chunk decides
+            self._decoder = zlib.decompressobj()
+            self._first = True
+        elif self.encoding == "br":
+            if brotli is None:
+                raise ValueError("Server sent a brotli response but the brotli package isn't installed")
+            self._decoder = brotli.Decompressor()
+        elif self.encoding == "identity":
+            self._decoder = None
+        else:
+            raise ValueError("Unsupported Content-Encoding: " + self.encoding)
+
+    def feed(self, data):
+        """
+        Input: a chunk of the (possibly compressed) body as bytes
+
+        Returns: the decompressed bytes that chunk produced
+        """
+        if self._decoder is None:
+            return data
+        if self.encoding == "br":
+            return self._decoder.process(data)
+        if self.encoding == "deflate" and self._first:
+            self._first = False
+            try:
+                return self._decoder.decompress(data)
+            except zlib.error:
+                self._decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._decoder.decompress(data)
+
+    def flush(self):
+        """
+        Returns: whatever decompressed bytes are still held in the decoder at the end of the body
+        """
+        if self._decoder is None or self.encoding == "br":
+            return b""
+        return self._decoder.flush()
+
+
+class Response:
+    """
+    A finished response from AthleticNetClient: the status code, headers, the decompressed body and
+    how many bytes actually came over the wire.
+    """
+
+    def __init__(self, url, status, reason, headers, body, wire_bytes):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.wire_bytes = wire_bytes
+
+    def json(self):
+        """
+        Returns: the body decoded as json
+        """
+        return json.loads(self.body)
+
+
+class AthleticNetClient:
+    """
+    Reusable http client for the athletic.net api. It keeps a pool of open connections per host so
+    refreshing many athletes only pays for the TLS handshake once per connection, asks for gzip/deflate
+    (and brotli when installed) and decompresses the body as it streams in. It also counts requests,
+    connections and bytes so a sync can report what it cost.
+
+    The client is safe to share between threads. Use it as a context manager (or call close()) to
+    shut the pooled connections when you are done.
+    """
+
+    def __init__(self, base_url=None, headers=None, timeout=30, max_connections=8):
+        """
+        Inputs:
+        base_url - the GetAthleteBioData url up to the athlete id, can point at a local stand-in server
+                   (defaults to the ATHLETIC_NET_URL environment variable, or athletic.net if it isn't set)
+        headers - extra headers to send with every request
+        timeout - seconds to wait when connecting and between bytes of a response
+        max_connections - the most idle connections kept open per host
+        """
+        self.base_url = base_url or default_base_url()
+        self.headers = dict(HEADERS)
+        self.headers.update(headers or {})
+        self.headers['Accept-Encoding'] = accept_encoding()
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.requests = 0
+        self.connections_opened = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def bio_url(self, athlete_id):
+        """
+        Builds the GetAthleteBioData url for one athlete.
+
+        Input: athlete_id (the athletic.net id)
+
+        Returns: the url as a string
+        """
+        return self.base_url + str(athlete_id) + WEB_TYPE + LEVEL
+
+    def roster_url(self, school_id, season):
+        """
+        Builds the url of a school's track roster for one season, on the same host as base_url.
+
+        Inputs: school_id (the athletic.net SchoolID/team id), season (i.e. 2022)
+
+        Returns: the url as a string
+        """
+        parts = urllib.parse.urlsplit(self.base_url)
+        query = urllib.parse.urlencode({"teamId": school_id, "seasonId": season, "sport": "tf", "level": 4})
+        return urllib.parse.urlunsplit((parts.scheme, parts.netloc, ROSTER_PATH, query, ""))
+
+    def get_athlete_bio(self, athlete_id, headers=None):
+        """
+        Downloads the bio data for one athlete.
+
+        Inputs: athlete_id (the athletic.net id), headers (extra headers for this request only)
+
+        Returns: a Response
+        """
+        return self.get(self.bio_url(athlete_id), headers)
+
+    def get(self, url, headers=None):
+        """
+        Sends a GET request over a pooled connection and reads the whole (decompressed) body.
+        A 304 Not Modified comes back as a normal Response with an empty body. Redirects are followed,
+        up to MAX_REDIRECTS in a row, and the Response has the url it finally came from.
+
+        Inputs: url (string), headers (extra headers for this request only)
+
+        Returns: a Response
+        Raises: urllib.error.HTTPError for 4xx/5xx answers (the same error urllib.request.urlopen raises) and for
+                any other 3xx, including a redirect without a Location or too many redirects,
+                OSError/http.client.HTTPException when the connection fails
+        """
+        with instrument.span("download", url):
+            for _ in range(MAX_REDIRECTS + 1):
+                response = self._get(url, headers)
+                if response.status not in REDIRECT_STATUS:
+                    break
+                location = response.headers.get("Location")
+                if not location:
+                    raise urllib.error.HTTPError(url, response.status, "Redirect without a Location",
+                                                 response.headers, io.BytesIO(response.body))
+                url = urllib.parse.urljoin(url, location)
+            else:
+                raise urllib.error.HTTPError(url, response.status, f"More than {MAX_REDIRECTS} redirects",
+                                             response.headers, io.BytesIO(response.body))
+            if 300 <= response.status < 400 and response.status != 304:
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers,
+                                             io.BytesIO(response.body))
+            return response
+
+    def _get(self, url, headers=None):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+
+        conn, reused = self._checkout(key)
+        try:
+            try:
+                conn.request("GET", path, headers=request_headers)
+                response = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                #the server closed the idle connection, so try one more time on a fresh one
+                conn.close()
+                conn, reused = self._connect(key), False
+                conn.request("GET", path, headers=request_headers)
+                response = conn.getresponse()
+
+            decoder = StreamDecoder(response.getheader("Content-Encoding"))
+            body = io.BytesIO()
+            wire_bytes = 0
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                wire_bytes += len(chunk)
+                body.write(decoder.feed(chunk))
+            body.write(decoder.flush())
+        except BaseException:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+        data = body.getvalue()
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += wire_bytes
+            self.bytes_decoded += len(data)
+        instrument.count("bytes_fetched", wire_bytes)
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(data))
+        return Response(url, response.status, response.reason, response.headers, data, wire_bytes)
+
+    def stats(self):
+        """
+        Returns: a dictionary of the request, connection and byte counters
+        """
+        with self._lock:
+            return {"requests": self.requests,
+                    "connections_opened": self.connections_opened,
+                    "bytes_received": self.bytes_received,
+                    "bytes_decoded": self.bytes_decoded}
+
+    def close(self):
+        """
+        Closes every idle connection in the pool.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+    def _connect(self, key):
+        scheme, netloc = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _checkout(self, key):
+        with self._lock:
+            connections = self._idle.get(key)
+            if connections:
+                return connections.pop(), True
+        return self._connect(key), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.max_connections:
+                connections.append(conn)
+                return
+        conn.close()
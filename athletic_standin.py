@@ -0,0 +1,405 @@
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import re
+import hashlib
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8508
+#the path athletic.net serves the bio data on. base_url() gives the whole url for AthleticNetClient.
+BIO_PATH = "/api/v1/AthleteBio/GetAthleteBioData"
+#the path of a school's roster for one season (see athletic_client.ROSTER_PATH)
+ROSTER_PATH = "/api/v1/TeamHome/GetAthletes"
+#a meet's results page, i.e. /TrackAndField/meet/<meet id>/results (see WebScrape.parse_meet_page)
+MEET_PAGE = re.compile(r"^/TrackAndField/meet/(\d+)(?:/results(?:/all)?)?/?$")
+#how much of a response is sent at a time when the bandwidth is capped
+SEND_CHUNK = 16 * 1024
+
+
+def base_url(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Returns: the url to give AthleticNetClient (or put in ATHLETIC_NET_URL) to download from a stand-in
+    """
+    return f"http://{host}:{port}{BIO_PATH}?athleteId="
+
+
+class StandIn:
+    """
+    Pretends to be athletic.net's GetAthleteBioData for load tests and offline work. Each athlete's payload
+    comes from a recorded fixture (fixtures/<athlete id>.json), is recorded from a real server the first
+    time it is asked for (record_url), or is made up (synthetic_results races, see benchmark.make_bio).
+
+    Answers can be slowed down and broken on purpose: a fixed latency plus random jitter before every
+    answer, a bandwidth cap on the body, and a share of requests answered with 500 (error_rate) or
+    429 Too Many Requests with a Retry-After header (throttle_rate). Whether a request fails only depends
+    on the seed, the athlete and how many times that athlete was asked for, so a run with the same seed
+    fails the same requests no matter how the threads line up. Every payload has an ETag and Last-Modified,
+    and a request that sends them back gets a 304 Not Modified, the same as the real site.
+
+    It also serves school rosters (see school_crawl.py), from fixtures (fixtures/team-<school id>-<season>.json)
+    or made up (roster_size athletes a season, a quarter of them new each season like a real team), and meet
+    results pages (see WebScrape.py), from fixtures (fixtures/meet-<meet id>.html) or made up (meet_size rows an
+    event, see benchmark.make_meet_page).
+
+    Safe to share between the server's threads.
+    """
+
+    def __init__(self, fixtures=None, synthetic_results=None, record_url=None, latency=0.0, jitter=0.0,
+                 bandwidth=None, error_rate=0.0, throttle_rate=0.0, retry_after=1, seed=0, compress=True,
+                 roster_size=None, meet_size=None):
+        """
+        Inputs:
+        fixtures - folder of <athlete id>.json payloads (recorded payloads are saved here too)
+        synthetic_results - make up a payload with this many races for athletes without a fixture (None for a 404)
+        record_url - a GetAthleteBioData url up to the athlete id to record missing fixtures from
+        latency, jitter - seconds to wait before answering, plus a random extra of up to jitter
+        bandwidth - the most bytes per second to send a body at (None for no cap)
+        error_rate, throttle_rate - share of requests (0 to 1) answered with a 500 or a 429
+        retry_after - seconds to put in the Retry-After header of a 429
+        seed - seed for the failures, jitter and made up payloads
+        compress - gzip bodies for clients that accept it (athletic.net does)
+        roster_size - make up school rosters with this many athletes a season (None for a 404 without a fixture)
+        meet_size - make up meet results pages with this many rows an event (None for a 404 without a fixture)
+        """
+        self.fixtures = fixtures
+        self.synthetic_results = synthetic_results
+        self.record_url = record_url
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.compress = compress
+        self.roster_size = roster_size
+        self.meet_size = meet_size
+        self.attempts = {}
+        self.counts = {"requests": 0, "200": 0, "304": 0, "404": 0, "429": 0, "500": 0, "bytes_sent": 0}
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def _fixture_path(self, athlete_id):
+        return os.path.join(self.fixtures, str(athlete_id) + ".json")
+
+    def _load(self, athlete_id):
+        if self.fixtures and os.path.isfile(self._fixture_path(athlete_id)):
+            with open(self._fixture_path(athlete_id), "rb") as file_obj:
+                return file_obj.read()
+        if self.record_url:
+            from athletic_client import AthleticNetClient
+            with AthleticNetClient(self.record_url) as client:
+                body = client.get_athlete_bio(athlete_id).body
+            if self.fixtures:
+                os.makedirs(self.fixtures, exist_ok=True)
+                with open(self._fixture_path(athlete_id), "wb") as f_out:
+                    f_out.write(body)
+            return body
+        if self.synthetic_results is not None and str(athlete_id).isdigit():
+            import benchmark
+            bio = benchmark.make_bio(self.synthetic_results, seed=self.seed, athlete_id=int(athlete_id))
+            return json.dumps(bio).encode("utf-8")
+        return None
+
+    def payload(self, athlete_id):
+        """
+        Returns: the athlete's payload as a dictionary of "body", "gzip" (the body compressed, or None),
+                 "etag" and "last_modified", or None if there isn't one. Payloads are loaded once and kept.
+        """
+        athlete_id = str(athlete_id)
+        with self._lock:
+            entry = self._payloads.get(athlete_id)
+        if entry is None:
+            body = self._load(athlete_id)
+            if body is None:
+                return None
+            entry = self.set_payload(athlete_id, body)
+        return entry
+
+    def set_payload(self, athlete_id, body):
+        """
+        Replaces an athlete's payload (i.e. to act like they just ran a race). The ETag changes with it,
+        so clients holding the old one get a full download instead of a 304.
+
+        Inputs: athlete_id, body (bytes, or a dictionary to send as json)
+        """
+        if isinstance(body, dict):
+            body = json.dumps(body).encode("utf-8")
+        entry = {"body": body,
+                 "gzip": gzip.compress(body, 6) if self.compress else None,
+                 "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+                 "last_modified": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())}
+        with self._lock:
+            self._payloads[str(athlete_id)] = entry
+        return entry
+
+    def roster(self, school_id, season):
+        """
+        Returns: a school's roster for one season as a list of {"ID", "Name"} dictionaries, or None if there isn't one
+        """
+        name = f"team-{school_id}-{season}.json"
+        if self.fixtures and os.path.isfile(os.path.join(self.fixtures, name)):
+            with open(os.path.join(self.fixtures, name), "r", encoding="utf-8") as file_obj:
+                return json.load(file_obj)
+        if self.roster_size is None or not str(school_id).isdigit() or not str(season).isdigit():
+            return None
+        #athlete number k is on the team for the four seasons starting at (k // (roster_size / 4)), so each
+        #season a quarter of the team graduates and a quarter is new
+        per_class = max(1, self.roster_size // 4)
+        first = (int(season) - 2000) * per_class
+        return [{"ID": int(school_id) * 100000 + number, "Name": f"Runner {school_id}-{number}"}
+                for number in range(first, first + per_class * 4)]
+
+    def meet_page(self, meet_id):
+        """
+        Returns: a meet's results page as html bytes, or None if there isn't one
+        """
+        name = f"meet-{meet_id}.html"
+        if self.fixtures and os.path.isfile(os.path.join(self.fixtures, name)):
+            with open(os.path.join(self.fixtures, name), "rb") as file_obj:
+                return file_obj.read()
+        if self.meet_size is None:
+            return None
+        import benchmark
+        return benchmark.make_meet_page(int(meet_id), self.meet_size, self.seed).encode("utf-8")
+
+    def outcome(self, athlete_id):
+        """
+        Decides how to answer the next request for an athlete.
+
+        Returns: a tuple of ("ok", "error" or "throttle", seconds to wait before answering)
+        """
+        with self._lock:
+            attempt = self.attempts.get(athlete_id, 0) + 1
+            self.attempts[athlete_id] = attempt
+            self.counts["requests"] += 1
+        rng = random.Random(f"{self.seed}-{athlete_id}-{attempt}")
+        delay = self.latency + rng.random() * self.jitter
+        roll = rng.random()
+        if roll < self.error_rate:
+            return "error", delay
+        if roll < self.error_rate + self.throttle_rate:
+            return "throttle", delay
+        return "ok", delay
+
+    def count(self, status, sent=0):
+        with self._lock:
+            self.counts[str(status)] = self.counts.get(str(status), 0) + 1
+            self.counts["bytes_sent"] += sent
+
+    def stats(self):
+        """
+        Returns: a dictionary of how many requests were answered with each status and the bytes sent
+        """
+        with self._lock:
+            return dict(self.counts, athletes=len(self._payloads))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Answers:
+    /api/v1/AthleteBio/GetAthleteBioData?athleteId=<id>&...   the athlete's payload (like athletic.net)
+    /api/v1/TeamHome/GetAthletes?teamId=<id>&seasonId=<year>   a school's roster for a season
+    /TrackAndField/meet/<id>/results                          a meet's results page (html)
+    /_stats                                                   what the stand-in has answered, as json
+    """
+
+    server_version = "AthleticStandIn/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        standin = self.server.standin
+        parts = urllib.parse.urlsplit(self.path)
+        if parts.path == "/_stats":
+            self._send(200, json.dumps(standin.stats()).encode("utf-8"), {"Content-Type": "application/json"})
+            return
+        query = urllib.parse.parse_qs(parts.query)
+        if parts.path == ROSTER_PATH:
+            self._roster(standin, query.get("teamId", [""])[0], query.get("seasonId", [""])[0])
+            return
+        meet = MEET_PAGE.match(parts.path)
+        if meet:
+            self._meet_page(standin, meet.group(1))
+            return
+        athlete_id = query.get("athleteId", [None])[0]
+        if parts.path != BIO_PATH or not athlete_id:
+            self._send(404, b"Not found\n", {"Content-Type": "text/plain"})
+            return
+        result, delay = standin.outcome(athlete_id)
+        if delay:
+            time.sleep(delay)
+        if result == "error":
+            standin.count(500)
+            self._send(500, b"Internal Server Error\n", {"Content-Type": "text/plain"})
+            return
+        if result == "throttle":
+            standin.count(429)
+            self._send(429, b"Too Many Requests\n", {"Content-Type": "text/plain",
+                                                      "Retry-After": str(standin.retry_after)})
+            return
+        try:
+            entry = standin.payload(athlete_id)
+        except Exception as inst:
+            standin.count(500)
+            self._send(500, f"Couldn't record the athlete: {inst}\n".encode("utf-8"), {"Content-Type": "text/plain"})
+            return
+        if entry is None:
+            standin.count(404)
+            self._send(404, b"No such athlete\n", {"Content-Type": "text/plain"})
+            return
+        headers = {"ETag": entry["etag"], "Last-Modified": entry["last_modified"]}
+        if self.headers.get("If-None-Match") == entry["etag"] or \
+                (self.headers.get("If-None-Match") is None and self.headers.get("If-Modified-Since") == entry["last_modified"]):
+            standin.count(304)
+            self._send(304, b"", headers)
+            return
+        body = entry["body"]
+        headers["Content-Type"] = "application/json; charset=utf-8"
+        if entry["gzip"] is not None and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = entry["gzip"]
+            headers["Content-Encoding"] = "gzip"
+        standin.count(200, len(body))
+        self._send(200, body, headers, standin.bandwidth)
+
+    def _failed(self, standin, key):
+        """
+        Answers with a 500 or a 429 if the stand-in says this request fails (see StandIn.outcome).
+
+        Returns: True if it answered
+        """
+        result, delay = standin.outcome(key)
+        if delay:
+            time.sleep(delay)
+        if result == "ok":
+            return False
+        standin.count(500 if result == "error" else 429)
+        headers = {"Content-Type": "text/plain"}
+        if result == "throttle":
+            headers["Retry-After"] = str(standin.retry_after)
+        self._send(500 if result == "error" else 429, b"Try again\n", headers)
+        return True
+
+    def _roster(self, standin, school_id, season):
+        #rosters fail and get throttled the same way as athletes do
+        if self._failed(standin, f"team-{school_id}-{season}"):
+            return
+        roster = standin.roster(school_id, season)
+        if roster is None:
+            standin.count(404)
+            self._send(404, b"No such team\n", {"Content-Type": "text/plain"})
+            return
+        body = json.dumps(roster).encode("utf-8")
+        standin.count(200, len(body))
+        self._send(200, body, {"Content-Type": "application/json; charset=utf-8"}, standin.bandwidth)
+
+    def _meet_page(self, standin, meet_id):
+        #meet pages fail and get throttled the same way as athletes do
+        if self._failed(standin, f"meet-{meet_id}"):
+            return
+        body = standin.meet_page(meet_id)
+        if body is None:
+            standin.count(404)
+            self._send(404, b"No such meet\n", {"Content-Type": "text/plain"})
+            return
+        standin.count(200, len(body))
+        self._send(200, body, {"Content-Type": "text/html; charset=utf-8"}, standin.bandwidth)
+
+    def _send(self, status, body, headers, bandwidth=None):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        #send a chunk at a time and wait as long as the chunk would take at the capped speed
+        for start in range(0, len(body), SEND_CHUNK):
+            chunk = body[start:start + SEND_CHUNK]
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            time.sleep(len(chunk) / bandwidth)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, standin=None, verbose=False):
+    """
+    Makes the stand-in server (one thread per connection, all sharing one StandIn). Port 0 picks a free port.
+
+    Returns: the ThreadingHTTPServer
+    """
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.standin = standin or StandIn(synthetic_results=200)
+    server.verbose = verbose
+    return server
+
+def start(standin=None, host=DEFAULT_HOST, port=0):
+    """
+    Runs a stand-in server in a background thread, i.e. for a load test in the same program:
+
+        server, url = athletic_standin.start(StandIn(synthetic_results=500, throttle_rate=0.1))
+        roster_sync.sync_roster(roster, base_url=url)
+        server.shutdown()
+
+    Returns: a tuple of (the server, the url to download from)
+    """
+    server = make_server(host, port, standin)
+    threading.Thread(target=server.serve_forever, name="athletic-standin", daemon=True).start()
+    return server, base_url(host, server.server_address[1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="A local stand-in for athletic.net's GetAthleteBioData.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--fixtures", help="folder of <athlete id>.json payloads to replay")
+    parser.add_argument("--record", metavar="URL", nargs="?", const="https://www.athletic.net" + BIO_PATH + "?athleteId=",
+                        help="download athletes without a fixture from URL (default athletic.net) and save them in --fixtures")
+    parser.add_argument("--synthetic", type=int, metavar="RACES",
+                        help="make up a payload with this many races for athletes without a fixture")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before every answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra random seconds")
+    parser.add_argument("--bandwidth", type=float, help="bytes per second to send bodies at")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that get a 500 (0 to 1)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests that get a 429 (0 to 1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="seconds in the Retry-After of a 429")
+    parser.add_argument("--roster-size", type=int, metavar="ATHLETES",
+                        help="make up school rosters with this many athletes a season")
+    parser.add_argument("--meet-size", type=int, metavar="ROWS",
+                        help="make up meet results pages with this many rows an event")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-gzip", action="store_true", help="never compress bodies")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures to save the recordings in")
+    standin = StandIn(args.fixtures, args.synthetic, args.record, args.latency, args.jitter, args.bandwidth,
+                      args.error_rate, args.throttle_rate, args.retry_after, args.seed, not args.no_gzip,
+                      args.roster_size, args.meet_size)
+    server = make_server(args.host, args.port, standin, args.verbose)
+    url = base_url(args.host, server.server_address[1])
+    print(f"Standing in for athletic.net at {url}<id> (Ctrl-C to stop)")
+    print(f"Point the programs at it with ATHLETIC_NET_URL='{url}' or python track.py --base-url '{url}' ...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(standin.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
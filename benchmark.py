@@ -0,0 +1,405 @@
+import os
+import os.path
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import datetime
+import tempfile
+import contextlib
+import statistics
+import tracemalloc
+import track
+import event_registry
+from bio_stream import read_bio
+
+#(athletes, results per athlete) to run for each preset. "full" goes from a single small athlete up to
+#one athlete with 100k results and a 5,000 athlete team.
+PRESETS = {"quick": [(1, 10), (1, 1000), (10, 1000)],
+           "full": [(1, 10), (1, 1000), (1, 10000), (1, 100000), (100, 1000), (1000, 100), (5000, 100)]}
+
+#the stages that are timed, in the order they run for each athlete
+STAGES = ("read_json", "read_bio", "load_athlete", "get_meets", "get_meet_dates", "index_results",
+          "get_event", "pretty_results", "fastest",
+          "graph_progress", "create_html")
+
+#graphs and reports are slow and write files, so by default only this many athletes of a scenario get them
+SAMPLE_ATHLETES = 25
+
+#EventID -> (roughly how fast a good high school boy runs it in seconds, how much slower the times can be).
+#The report events (4, 52, 60, 39 and 8) plus 1, 10, 9 and 27, which aren't in event_registry, so the event filters
+#have something to skip over.
+EVENT_TIMES = {4: (115, 30), 52: (260, 70), 60: (570, 140), 39: (480, 90), 8: (205, 40),
+               1: (11, 2), 10: (15, 3), 9: (23, 4), 27: (52, 10)}
+#EventID -> (roughly how far a good high school boy jumps or throws it in meters, how much shorter it can be).
+#None of 14, 12 and 16 are in event_registry either, so these are skipped like the unregistered races.
+EVENT_MARKS = {14: (6.5, 1.5), 12: (1.9, 0.3), 16: (14.0, 4.0)}
+NOT_TIMES = ("DNS", "DNF", "SCR", "DQ", "FS", "")
+NOT_MARKS = ("FOUL", "NH", "ND", "DNS", "")
+
+
+def _mark(seconds, rng):
+    """
+    Writes a time in seconds the way athletic.net does ("58.21", "4:31.20a", "10:02.4h"), with the odd DNS thrown in.
+    """
+    if rng.random() < 0.03:
+        return rng.choice(NOT_TIMES)
+    minutes, secs = divmod(seconds, 60)
+    text = f"{int(minutes)}:{secs:05.2f}" if minutes else f"{secs:.2f}"
+    ending = rng.random()
+    if ending < 0.2:
+        text += "a"
+    elif ending < 0.25:
+        text = text[:-1] + "h"
+    return text
+
+def _field_mark(meters, rng):
+    """
+    Writes a distance or height in meters in feet and inches the way athletic.net does ("19-08.50", "6' 2\""),
+    with the odd FOUL thrown in.
+    """
+    if rng.random() < 0.05:
+        return rng.choice(NOT_MARKS)
+    feet, inches = divmod(meters / event_registry.INCH, 12)
+    if rng.random() < 0.5:
+        return f"{int(feet)}-{inches:05.2f}"
+    return f"{int(feet)}' {inches:.2f}\""
+
+def make_bio(results=100, meets=None, seed=0, athlete_id=1, first_season=2019, last_season=2024):
+    """
+    Makes a made up GetAthleteBioData payload shaped like the ones athletic.net sends, so the programs can
+    be timed on any amount of data.
+
+    Inputs:
+    results - how many races the athlete has
+    meets - how many meets they went to (defaults to one for every 8 races)
+    seed - the same seed always makes the same payload
+    athlete_id - the athlete's id number
+    first_season, last_season - the seasons the meet dates are spread over (indoor and outdoor)
+
+    Returns: a dictionary with "athlete", "resultsTF" and "meets", like the json from athletic.net
+    """
+    rng = random.Random(f"{seed}-{athlete_id}")
+    meet_count = max(1, meets if meets is not None else results // 8)
+    first_day = datetime.date(first_season - 1, 11, 1).toordinal()
+    last_day = datetime.date(last_season, 7, 31).toordinal()
+    meet_table = {}
+    for number in range(meet_count):
+        meet_id = athlete_id * 1000000 + number
+        date = datetime.date.fromordinal(rng.randint(first_day, last_day))
+        meet_table[str(meet_id)] = {"IDMeet": meet_id, "MeetName": f"Invitational {number % 500}",
+                                    "EndDate": date.isoformat() + "T00:00:00", "Location": "Northville HS"}
+    meet_ids = [entry["IDMeet"] for entry in meet_table.values()]
+    event_ids = list(EVENT_TIMES) + list(EVENT_MARKS)
+    races = []
+    for number in range(results):
+        event_id = rng.choice(event_ids)
+        if event_id in EVENT_TIMES:
+            best, spread = EVENT_TIMES[event_id]
+            mark = _mark(best + rng.random() * spread, rng)
+        else:
+            best, spread = EVENT_MARKS[event_id]
+            mark = _field_mark(best - rng.random() * spread, rng)
+        races.append({"IDResult": athlete_id * 10000000 + number, "EventID": event_id,
+                      "Result": mark, "MeetID": rng.choice(meet_ids),
+                      "SeasonID": 0, "Grade": rng.randint(9, 12), "Place": rng.randint(1, 30)})
+    return {"athlete": {"IDAthlete": athlete_id, "FirstName": "Runner", "LastName": str(athlete_id)},
+            "resultsTF": races, "meets": meet_table}
+
+def write_team(directory, athletes=1, results=100, seed=0):
+    """
+    Writes a made up json file (see make_bio) for each athlete of a team into directory.
+
+    Returns: a list of (athlete name, athlete id, json path) tuples
+    """
+    team = []
+    for number in range(1, athletes + 1):
+        athlete_name = f"Runner {number}"
+        path = os.path.join(directory, athlete_name.replace(" ", "") + ".json")
+        with open(path, "w", encoding="utf-8") as f_out:
+            json.dump(make_bio(results, seed=seed, athlete_id=number), f_out)
+        team.append((athlete_name, str(number), path))
+    return team
+
+def make_meet_page(meet_id, entries=20, seed=0):
+    """
+    Makes a made up meet results page shaped like athletic.net's (see WebScrape.parse_meet_page): an h1 with the
+    meet name, a <time> tag with the date, and a heading and table (Pl, Athlete, Gr, Team, Time) for each report
+    event plus a sprint that isn't in event_registry. Athletes link to /athlete/<id>/ and marks to /result/<id>,
+    except on relays, where the team runs without a link.
+
+    Inputs: meet_id, entries (rows in each event's table), seed (the same seed and meet always make the same page)
+
+    Returns: the html as a string
+    """
+    rng = random.Random(f"{seed}-meet-{meet_id}")
+    date = datetime.date(2024, 3, 1) + datetime.timedelta(days=rng.randint(0, 90))
+    events = [(f"Boys {title}", EVENT_TIMES[event_id], event_registry.find(name)["relay"])
+              for event_id, name, title in event_registry.report_events()]
+    events.append(("Boys 100 Meters", EVENT_TIMES[1], False))
+    page = [f"<html><head><title>Stand-in Invitational {meet_id} - athletic.net</title></head><body>",
+            f'<a href="/meet/{meet_id}/results">Results</a>',
+            f"<h1>Stand-in Invitational {meet_id}</h1>",
+            f'<time datetime="{date.isoformat()}T09:00:00">{date:%B %d}</time>']
+    result_id = meet_id * 10000
+    for title, (best, spread), relay in events:
+        page.append(f"<h3>{title}</h3>")
+        page.append("<table><tr><th>Pl</th><th>Athlete</th><th>Gr</th><th>Team</th><th>Time</th></tr>")
+        for place in range(1, entries + 1):
+            result_id += 1
+            team = rng.choice(["Northville", "Novi", "Brighton", "Plymouth"])
+            if relay:
+                name = team
+            else:
+                athlete_id = rng.randint(1, entries * 5)
+                name = f'<a href="/athlete/{athlete_id}/track-and-field/">Runner {athlete_id}</a>'
+            mark = _mark(best + rng.random() * spread, rng)
+            page.append(f'<tr><td>{place}.</td><td>{name}</td><td>{rng.randint(9, 12)}</td><td>{team}</td>'
+                        f'<td><a href="/result/{result_id}">{mark}</a></td></tr>')
+        page.append("</table>")
+    page.append("</body></html>")
+    return "\n".join(page)
+
+
+class StageTimer:
+    """
+    Adds up how long each stage takes and how many items (races, meets, reports...) it went through.
+    With memory on, tracemalloc records the most memory any one call of a stage used on top of what was
+    already allocated. tracemalloc slows everything down, so timing and memory are measured in separate runs.
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.samples = {}
+        self.items = {}
+        self.peaks = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, items=1):
+        if self.memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            yield
+            self.peaks[name] = max(self.peaks.get(name, 0), tracemalloc.get_traced_memory()[1] - before)
+            return
+        start = time.perf_counter()
+        yield
+        self.samples.setdefault(name, []).append(time.perf_counter() - start)
+        self.add_items(name, items)
+
+    def add_items(self, name, items):
+        """
+        Counts items for a stage that only knows how many it went through after it finished.
+        """
+        self.items[name] = self.items.get(name, 0) + items
+
+    def summary(self, peaks=None):
+        """
+        Returns: a dictionary of stage -> calls, total/min/median/max seconds, items, items per second and
+        peak bytes (from the peaks of a memory run if given)
+        """
+        stages = {}
+        for name in STAGES:
+            samples = self.samples.get(name)
+            if not samples:
+                continue
+            total = sum(samples)
+            stages[name] = {"calls": len(samples),
+                            "seconds": total,
+                            "min": min(samples),
+                            "median": statistics.median(samples),
+                            "max": max(samples),
+                            "items": self.items[name],
+                            "items_per_second": self.items[name] / total if total else None,
+                            "peak_bytes": (peaks or {}).get(name)}
+        return stages
+
+
+def _run_athlete(timer, athlete_name, path, output_directory, draw):
+    """
+    Runs every stage once for one athlete, the way main() and build_team_reports do.
+    """
+    with timer.stage("read_json", 0):
+        athlete = track.read_json(path)
+    results = len(athlete.get("resultsTF") or [])
+    timer.add_items("read_json", results)
+    with timer.stage("read_bio", results):
+        track_athlete = read_bio(path)
+    #time the first load of the athlete, which also saves their snapshot
+    if os.path.exists(track.snapshot_path(path)):
+        os.remove(track.snapshot_path(path))
+    with timer.stage("load_athlete", results):
+        track.load_athlete(path)
+    with timer.stage("get_meets", len(track_athlete.get("meets") or {})):
+        meets = track.get_meets(track_athlete)
+    with timer.stage("get_meet_dates", len(meets)):
+        track.get_meet_dates(track_athlete)
+    with timer.stage("index_results", results):
+        track.index_results(track_athlete)
+    catalog = track.get_meet_catalog(track_athlete)
+    query = track.season_query(catalog)
+    name = athlete_name.replace(" ", "")
+    results_type, report_results, images = [], [], []
+    for event_id, event_name, title in track.REPORT_EVENTS:
+        with timer.stage("get_event"):
+            event_results = track.get_event(track_athlete, event_id)
+        with timer.stage("pretty_results", len(event_results)):
+            track.pretty_results(meets, event_results)
+        records = catalog.join(event_results, **query)
+        with timer.stage("fastest", len(records)):
+            track.fastest(records, event_id)
+        if not draw or not records:
+            continue
+        image_name = "images/" + name + event_name + ".png"
+        race_dets = [(time_, date) for time_, meet, date in records]
+        if len(race_dets) > 1:
+            with timer.stage("graph_progress", len(race_dets)):
+                track.graph_progress(race_dets, title, image_name, output_directory, event_id)
+        results_type.append(event_name)
+        report_results.append([(time_, meet) for time_, meet, date in records])
+        images.append(image_name)
+    if draw:
+        with timer.stage("create_html", sum(len(races) for races in report_results)):
+            track.create_html(athlete_name, name, results_type, report_results, images, output_directory,
+                              policy="always")
+
+def _run_team(timer, team, output_directory, sample):
+    os.makedirs(os.path.join(output_directory, "images"), exist_ok=True)
+    for number, (athlete_name, athlete_id, path) in enumerate(team):
+        _run_athlete(timer, athlete_name, path, output_directory, number < sample)
+
+def run_scenario(athletes, results, sample=SAMPLE_ATHLETES, seed=0, memory=True, directory=None):
+    """
+    Times every stage on a made up team.
+
+    Inputs:
+    athletes - how many athletes
+    results - how many races each athlete has
+    sample - how many of the athletes also get graphs and a report (they are slow and write files)
+    seed - seed for the made up data
+    memory - also measure the peak memory of each stage (a second run with tracemalloc on)
+    directory - where to write the team and reports (a temporary folder that is deleted afterwards if not given)
+
+    Returns: a dictionary with the scenario, how long making the data took, the "stages" (see StageTimer.summary)
+    and the peak resident memory of the process in kB
+    """
+    with contextlib.ExitStack() as stack:
+        if directory is None:
+            directory = stack.enter_context(tempfile.TemporaryDirectory(prefix="track-bench-"))
+        team_directory = os.path.join(directory, "team")
+        os.makedirs(team_directory, exist_ok=True)
+        start = time.perf_counter()
+        team = write_team(team_directory, athletes, results, seed)
+        generate_seconds = time.perf_counter() - start
+        #the report programs print a line for every graph and file, which would swamp the timings
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        timer = StageTimer()
+        start = time.perf_counter()
+        _run_team(timer, team, os.path.join(directory, "reports"), sample)
+        total_seconds = time.perf_counter() - start
+        peaks = None
+        if memory:
+            memory_timer = StageTimer(memory=True)
+            tracemalloc.start()
+            try:
+                #a new reports folder, so the graphs are drawn again instead of found up to date
+                _run_team(memory_timer, team, os.path.join(directory, "reports-memory"), sample)
+            finally:
+                tracemalloc.stop()
+            peaks = memory_timer.peaks
+    return {"athletes": athletes,
+            "results_per_athlete": results,
+            "sampled_athletes": min(sample, athletes),
+            "generate_seconds": generate_seconds,
+            "total_seconds": total_seconds,
+            "stages": timer.summary(peaks),
+            "max_rss_kb": _max_rss()}
+
+def _max_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run(scenarios, sample=SAMPLE_ATHLETES, seed=0, memory=True):
+    """
+    Runs a list of (athletes, results per athlete) scenarios.
+
+    Returns: a dictionary of the run, ready to be saved as json and compared with compare()
+    """
+    return {"started": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "scenarios": [run_scenario(athletes, results, sample, seed, memory) for athletes, results in scenarios]}
+
+def print_run(report):
+    """
+    Prints the timings of a run as one table per scenario.
+    """
+    for scenario in report["scenarios"]:
+        print(f"\n{scenario['athletes']} athlete(s) x {scenario['results_per_athlete']} results "
+              f"({scenario['total_seconds']:.2f}s, graphs/reports for {scenario['sampled_athletes']})")
+        print(f"{'Stage':<16}{'Calls':>7}{'Total s':>10}{'Median ms':>11}{'Max ms':>10}{'Items/s':>13}{'Peak kB':>10}")
+        for name, stage in scenario["stages"].items():
+            rate = f"{stage['items_per_second']:.0f}" if stage["items_per_second"] else "-"
+            peak = f"{stage['peak_bytes'] / 1024:.0f}" if stage["peak_bytes"] is not None else "-"
+            print(f"{name:<16}{stage['calls']:>7}{stage['seconds']:>10.4f}{stage['median'] * 1000:>11.3f}"
+                  f"{stage['max'] * 1000:>10.3f}{rate:>13}{peak:>10}")
+
+def compare(old, new):
+    """
+    Prints how much faster or slower each stage got between two runs, matching scenarios by size.
+    A ratio under 1 means the new run is faster.
+    """
+    old_scenarios = {(scenario["athletes"], scenario["results_per_athlete"]): scenario for scenario in old["scenarios"]}
+    for scenario in new["scenarios"]:
+        size = (scenario["athletes"], scenario["results_per_athlete"])
+        before = old_scenarios.get(size)
+        if before is None:
+            continue
+        print(f"\n{size[0]} athlete(s) x {size[1]} results: new / old")
+        for name, stage in scenario["stages"].items():
+            old_stage = before["stages"].get(name)
+            if old_stage is None or not old_stage["median"]:
+                continue
+            ratio = stage["median"] / old_stage["median"]
+            print(f"{name:<16}{old_stage['median'] * 1000:>10.3f} ms -> {stage['median'] * 1000:>10.3f} ms  x{ratio:.2f}")
+
+def _scenario(text):
+    athletes, _, results = text.partition("x")
+    try:
+        return int(athletes), int(results)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected ATHLETESxRESULTS like 100x1000, not {text!r}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of track.py on made up athletes.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick", help="which sizes to run (default quick)")
+    parser.add_argument("--scenario", type=_scenario, action="append",
+                        help="run ATHLETESxRESULTS (i.e. 100x1000) instead of a preset, can be given more than once")
+    parser.add_argument("--sample", type=int, default=SAMPLE_ATHLETES,
+                        help=f"athletes per scenario that get graphs and reports (default {SAMPLE_ATHLETES})")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the made up data")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("--output", help="save the results to this json file")
+    parser.add_argument("--compare", help="json file of an earlier run to compare against")
+    args = parser.parse_args(argv)
+    report = run(args.scenario or PRESETS[args.preset], args.sample, args.seed, not args.no_memory)
+    print_run(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f_out:
+            json.dump(report, f_out, indent=1)
+        print(f"\nSaved {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file_obj:
+            compare(json.load(file_obj), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
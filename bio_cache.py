@@ -0,0 +1,225 @@
+import os
+import os.path
+import json
+import time
+import hashlib
+import threading
+import urllib.error
+import instrument
+
+#how long a downloaded athlete counts as fresh before we check athletic.net again (one day, in seconds)
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class BioCache:
+    """
+    On-disk cache of athletic.net bio json files. Each athlete's json ('DavidWhitaker.json') gets a
+    small sidecar file ('DavidWhitaker.meta.json') with when it was fetched, the ETag and Last-Modified
+    headers the server sent, and the size and sha256 hash of the body.
+
+    - Entries younger than the TTL are used as they are.
+    - Older entries are revalidated with a conditional GET (If-None-Match / If-Modified-Since), so an
+      athlete that hasn't raced comes back as a cheap 304 instead of a full download.
+    - With stale_while_revalidate on, an old entry is handed back right away and the refresh runs in a
+      background thread, so a report can render from the old data while the new data downloads.
+    - Files are written to a temporary name and renamed into place, and a file whose size doesn't match
+      its metadata is treated as missing, so a failed download never leaves us reading half a file.
+    """
+
+    def __init__(self, directory=".", ttl=DEFAULT_TTL, client=None, stale_while_revalidate=False):
+        """
+        Inputs:
+        directory - folder the json and metadata files live in
+        ttl - seconds an entry counts as fresh (0 always revalidates)
+        client - the AthleticNetClient to download with (one is made the first time something is downloaded
+                 if not given, so reading cached copies never loads the download code)
+        stale_while_revalidate - hand back stale entries right away and refresh them in the background
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self._client = client
+        self.stale_while_revalidate = stale_while_revalidate
+        self._refreshing = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        The AthleticNetClient downloads go through.
+        """
+        with self._lock:
+            if self._client is None:
+                from athletic_client import AthleticNetClient
+                self._client = AthleticNetClient()
+            return self._client
+
+    def path(self, athlete_name):
+        """
+        Returns: the path of the cached json file for an athlete, i.e. 'DavidWhitaker.json'
+        """
+        return os.path.join(self.directory, athlete_name.replace(" ", "") + '.json')
+
+    def meta_path(self, athlete_name):
+        """
+        Returns: the path of the metadata sidecar for an athlete, i.e. 'DavidWhitaker.meta.json'
+        """
+        return os.path.join(self.directory, athlete_name.replace(" ", "") + '.meta.json')
+
+    def load_meta(self, athlete_name):
+        """
+        Returns: the metadata dictionary for an athlete, or None if there isn't a usable cached copy
+        (no json file, no metadata, or a json file that doesn't match its metadata)
+        """
+        filename = self.path(athlete_name)
+        try:
+            with open(self.meta_path(athlete_name), 'r', encoding='utf-8') as file_obj:
+                meta = json.load(file_obj)
+            if os.path.getsize(filename) != meta.get("size"):
+                return None
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def has_copy(self, athlete_name):
+        """
+        Returns: True if there is a cached copy that can be read. Besides entries with good metadata, this
+        counts json files downloaded before the cache kept metadata (they have no sidecar at all).
+        """
+        if self.load_meta(athlete_name) is not None:
+            return True
+        return os.path.isfile(self.path(athlete_name)) and not os.path.isfile(self.meta_path(athlete_name))
+
+    def fingerprint(self, athlete_name):
+        """
+        Returns: the sha256 hash of an athlete's cached json, from the metadata when it has it (otherwise the
+        file is hashed), or None if there is no cached copy
+        """
+        meta = self.load_meta(athlete_name)
+        if meta is not None and meta.get("sha256"):
+            return meta["sha256"]
+        digest = hashlib.sha256()
+        try:
+            with open(self.path(athlete_name), "rb") as file_obj:
+                for chunk in iter(lambda: file_obj.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    def is_fresh(self, athlete_name, ttl=None):
+        """
+        Input: athlete_name, ttl (seconds, uses the cache's ttl if not given)
+
+        Returns: True if there is a cached copy younger than the ttl
+        """
+        meta = self.load_meta(athlete_name)
+        ttl = self.ttl if ttl is None else ttl
+        return meta is not None and time.time() - meta.get("fetched_at", 0) < ttl
+
+    def get(self, athlete_name, athlete_id, ttl=None):
+        """
+        Makes sure there is a usable cached json file for an athlete and returns its path. Fresh entries
+        are used as they are, stale ones are revalidated (in the background if stale_while_revalidate is
+        on) and missing ones are downloaded.
+
+        Inputs: athlete_name, athlete_id (the athletic.net id), ttl (seconds, overrides the cache's ttl)
+
+        Returns: the path of the json file
+        Raises: the download error if there is no cached copy to fall back on
+        """
+        if self.is_fresh(athlete_name, ttl):
+            return self.path(athlete_name)
+        if self.stale_while_revalidate and self.has_copy(athlete_name):
+            self.refresh_in_background(athlete_name, athlete_id)
+            return self.path(athlete_name)
+        try:
+            self.refresh(athlete_name, athlete_id)
+        except Exception as inst:
+            if not self.has_copy(athlete_name):
+                raise
+            print(f"Couldn't refresh {athlete_name} ({inst}). Using the copy downloaded earlier.")
+        return self.path(athlete_name)
+
+    def refresh(self, athlete_name, athlete_id, fetch=None):
+        """
+        Revalidates or downloads one athlete. If there is a cached copy its ETag/Last-Modified are sent
+        along so the server can answer 304 Not Modified.
+
+        Inputs:
+        athlete_name, athlete_id (the athletic.net id)
+        fetch - optional function fetch(url, headers) -> athletic_client.Response used in place of
+                client.get, i.e. to add retries or rate limiting
+
+        Returns: "not_modified" if the server said the cached copy is still good, otherwise "downloaded"
+        Raises: urllib.error.HTTPError if the answer isn't a 200 (or a 304 for a cached copy). Nothing is
+                written then, so the copy downloaded earlier stays as it was.
+        """
+        meta = self.load_meta(athlete_name)
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        url = self.client.bio_url(athlete_id)
+        response = fetch(url, headers) if fetch is not None else self.client.get(url, headers)
+
+        if response.status == 304 and meta is not None:
+            meta["fetched_at"] = time.time()
+            self._write_meta(athlete_name, meta)
+            return "not_modified"
+        if response.status != 200:
+            #a redirect, 204 or 206 (or a 304 with nothing cached) isn't the athlete's bio data
+            raise urllib.error.HTTPError(url, response.status, f"{response.reason} (expected 200 OK)", response.headers, None)
+
+        body = response.body
+        self._write_atomic(self.path(athlete_name), body)
+        self._write_meta(athlete_name, {"url": url,
+                                        "fetched_at": time.time(),
+                                        "etag": response.headers.get("ETag"),
+                                        "last_modified": response.headers.get("Last-Modified"),
+                                        "sha256": hashlib.sha256(body).hexdigest(),
+                                        "size": len(body)})
+        return "downloaded"
+
+    def refresh_in_background(self, athlete_name, athlete_id):
+        """
+        Starts refreshing an athlete in a background thread (only one refresh per athlete at a time).
+        The thread isn't a daemon, so the program waits for it to finish writing before it exits.
+
+        Returns: the thread doing the refresh
+        """
+        with self._lock:
+            thread = self._refreshing.get(athlete_name)
+            if thread is not None and thread.is_alive():
+                return thread
+
+            def run():
+                try:
+                    self.refresh(athlete_name, athlete_id)
+                except Exception as inst:
+                    print(f"Background refresh of {athlete_name} failed: {inst}")
+
+            thread = threading.Thread(target=run, name="refresh-" + athlete_name)
+            self._refreshing[athlete_name] = thread
+            thread.start()
+            return thread
+
+    def wait(self):
+        """
+        Waits for every background refresh to finish.
+        """
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join()
+
+    def _write_meta(self, athlete_name, meta):
+        self._write_atomic(self.meta_path(athlete_name), json.dumps(meta, indent=1).encode('utf-8'))
+
+    def _write_atomic(self, filename, data):
+        temp_name = f"{filename}.{threading.get_ident()}.part"
+        with open(temp_name, "wb") as f_out:
+            f_out.write(data)
+        os.replace(temp_name, filename)
+        instrument.count("bytes_written", len(data))
@@ -0,0 +1,221 @@
+import os
+import re
+import json
+
+#how much of the file is read at a time
+CHUNK_SIZE = 64 * 1024
+#files smaller than this are read with json.load, which is about 3x faster than streaming. Streaming only pays
+#off when a file is big enough that holding all of it decoded in memory (several times its size) is a problem.
+STREAM_THRESHOLD = 8 * 1024 * 1024
+
+#the only fields of each race and meet the programs use. Everything else is dropped while reading.
+RESULT_FIELDS = ("IDResult", "EventID", "Result", "MeetID", "SeasonID", "Grade")
+MEET_FIELDS = ("IDMeet", "MeetName", "EndDate")
+
+#the top level sections we keep, and which fields of their records to keep
+SECTIONS = {"resultsTF": RESULT_FIELDS, "meets": MEET_FIELDS}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_END = re.compile(r'["\\]')
+
+
+class _JsonStream:
+    """
+    Reads a json document a chunk at a time. Only the text that hasn't been used yet is kept in the
+    buffer, so memory stays around one chunk plus the biggest single record no matter how big the file is.
+    """
+
+    def __init__(self, file_obj, chunk_size=CHUNK_SIZE):
+        self.file_obj = file_obj
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        """
+        Drops the used part of the buffer and reads another chunk. Returns False at the end of the file.
+        """
+        if self.eof:
+            return False
+        chunk = self.file_obj.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self):
+        """
+        Returns: the next character that isn't whitespace ('' at the end of the file), without using it up
+        """
+        if self.pos < len(self.buf) and self.buf[self.pos] not in " \t\n\r":
+            return self.buf[self.pos]
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at character {self.pos} of the buffer, found {self.peek()!r}")
+        self.pos += 1
+
+    def read_value(self):
+        """
+        Decodes the next json value (a whole race or meet record, a key, a number...) into python.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            #a number right at the end of the buffer might carry on in the next chunk
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        """
+        Moves past the next json value without building it, which is how the sections we don't need are thrown away.
+        """
+        char = self.peek()
+        if char == '"':
+            self.pos += 1
+            self._skip_string()
+        elif char in ("{", "["):
+            depth = 0
+            while True:
+                match = _STRUCTURE.search(self.buf, self.pos)
+                if match is None:
+                    self.pos = len(self.buf)
+                    if not self.fill():
+                        raise ValueError("The json ended in the middle of a value")
+                    continue
+                self.pos = match.end()
+                found = match.group()
+                if found == '"':
+                    self._skip_string()
+                elif found in ("{", "["):
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return
+        else:
+            self.read_value()
+
+    def _skip_string(self):
+        #called just after the opening quote of a string
+        while True:
+            match = _STRING_END.search(self.buf, self.pos)
+            if match is None or (match.group() == "\\" and match.end() >= len(self.buf)):
+                self.pos = match.start() if match is not None else len(self.buf)
+                if not self.fill():
+                    raise ValueError("The json ended in the middle of a string")
+                continue
+            if match.group() == "\\":
+                self.pos = match.end() + 1
+            else:
+                self.pos = match.end()
+                return
+
+    def items(self):
+        """
+        Yields the key of each entry of the object or array that starts here, leaving the stream at the
+        entry's value. For an array the key is the position in the array. The caller must read or skip each value.
+        """
+        opening = self.peek()
+        if opening not in ("{", "["):
+            self.read_value()
+            return
+        closing = "}" if opening == "{" else "]"
+        self.pos += 1
+        number = 0
+        if self.peek() == closing:
+            self.pos += 1
+            return
+        while True:
+            if opening == "{":
+                key = self.read_value()
+                self.expect(":")
+            else:
+                key = number
+            yield key
+            number += 1
+            char = self.peek()
+            self.pos += 1
+            if char == closing:
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or {closing!r}, found {char!r}")
+
+
+def compact(record, fields):
+    """
+    Keeps only the listed fields of a record.
+
+    Inputs: record (dictionary), fields (tuple of field names)
+
+    Returns: a smaller dictionary with just those fields (missing ones are left out)
+    """
+    if not isinstance(record, dict):
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+def iter_bio(filepath, sections=SECTIONS, encoding='utf-8', chunk_size=CHUNK_SIZE):
+    """
+    Streams through a GetAthleteBioData json file and yields the records of the sections we use, one at a
+    time, as compact dictionaries. Everything else in the file is skipped over without being decoded, so
+    only a chunk of the file is ever in memory.
+
+    Inputs:
+    filepath - path to the json file
+    sections - dictionary of top level section name -> fields to keep (default resultsTF and meets)
+
+    Yields: tuples of (section name, key, compact record). The key is the position in the list for
+    resultsTF and the meet id key for meets.
+    """
+    with open(filepath, 'r', encoding=encoding) as file_obj:
+        stream = _JsonStream(file_obj, chunk_size)
+        for section in stream.items():
+            fields = sections.get(section)
+            if fields is None:
+                stream.skip_value()
+                continue
+            for key in stream.items():
+                yield section, key, compact(stream.read_value(), fields)
+
+def read_bio(filepath, encoding='utf-8', threshold=STREAM_THRESHOLD):
+    """
+    Reads just the resultsTF and meets sections of an athlete's json file, in the same shape json.load
+    would give them (a list of race dictionaries and a dictionary of meets) but with only the fields we use.
+    Files of threshold bytes or more are streamed (see iter_bio), so any size of file works without loading
+    the whole document. Smaller files are read with json.load and trimmed, which is quicker.
+
+    Input: filepath (path to the json file), threshold (size in bytes to start streaming at)
+
+    Returns: a dictionary with "resultsTF" and "meets"
+    """
+    if os.path.getsize(filepath) < threshold:
+        with open(filepath, 'r', encoding=encoding) as file_obj:
+            document = json.load(file_obj)
+        return {"resultsTF": [compact(record, RESULT_FIELDS) for record in document.get("resultsTF") or []],
+                "meets": {str(key): compact(record, MEET_FIELDS) for key, record in (document.get("meets") or {}).items()}}
+    athlete = {"resultsTF": [], "meets": {}}
+    results = athlete["resultsTF"]
+    meets = athlete["meets"]
+    for section, key, record in iter_bio(filepath, encoding=encoding):
+        if section == "resultsTF":
+            results.append(record)
+        else:
+            meets[str(key)] = record
+    return athlete
@@ -0,0 +1,182 @@
+import io
+import os
+import json
+import struct
+import hashlib
+import threading
+import instrument
+
+#bump this when the way charts are drawn changes, so every chart gets redrawn once
+CHART_VERSION = 1
+
+#how the progress graphs look. Part of the chart hash, so changing any of it redraws the charts.
+STYLE = {"title_font": {'family':'serif','color':'blue','size':20},
+         "label_font": {'family':'serif','color':'darkred','size':15},
+         "xlabel": "Date of the Race",
+         "ylabel": "Time in Seconds",
+         "figsize": [6.4, 4.8],
+         "dpi": 100}
+
+#the png text field the chart hash is saved in
+HASH_FIELD = "Description"
+HASH_PREFIX = "chart-hash:"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def chart_hash(xpoints, ypoints, title, style=STYLE):
+    """
+    Makes a hash of everything that goes into a chart: the dates, the times, the title and the style.
+    Two charts with the same hash would come out as the same picture.
+
+    Inputs: xpoints (dates), ypoints (times in seconds), title (string), style (dictionary like STYLE)
+
+    Returns: the hash as a hex string
+    """
+    import numpy as np
+    digest = hashlib.sha256()
+    digest.update(json.dumps([CHART_VERSION, title, style], sort_keys=True).encode("utf-8"))
+    digest.update(np.asarray(xpoints, dtype="datetime64[D]").astype(np.int64).tobytes())
+    digest.update(np.asarray(ypoints, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def read_chart_hash(png_path):
+    """
+    Reads the chart hash saved in a png made by ChartRenderer. Only the chunks before the picture data are
+    read, so this is much cheaper than opening the image.
+
+    Input: png_path
+
+    Returns: the hash as a string, or None if the file is missing or doesn't have one
+    """
+    try:
+        with open(png_path, "rb") as png:
+            if png.read(8) != PNG_SIGNATURE:
+                return None
+            while True:
+                header = png.read(8)
+                if len(header) < 8:
+                    return None
+                length, chunk_type = struct.unpack(">I4s", header)
+                if chunk_type == b"IDAT" or chunk_type == b"IEND":
+                    return None
+                data = png.read(length)
+                png.read(4)
+                if chunk_type == b"tEXt":
+                    keyword, _, text = data.partition(b"\x00")
+                    text = text.decode("latin-1")
+                    if keyword.decode("latin-1") == HASH_FIELD and text.startswith(HASH_PREFIX):
+                        return text[len(HASH_PREFIX):]
+    except OSError:
+        return None
+
+
+class ChartRenderer:
+    """
+    Draws the progress graphs without pyplot. Each renderer owns one matplotlib Figure drawn with the Agg
+    backend (straight to png, no window and nothing to block on) and clears and reuses it for every chart,
+    so lines never pile up from one event onto the next. Every png gets the hash of its data and style
+    saved inside it, and a chart whose png already has the same hash isn't drawn again.
+
+    A renderer should only be used from one thread at a time. get_renderer() hands out one per thread.
+    matplotlib is only imported when the first chart is actually drawn, so importing this module (or
+    checking whether a saved png is up to date) stays cheap.
+    """
+
+    def __init__(self, style=STYLE):
+        self.style = style
+        self.rendered = 0
+        self.skipped = 0
+        self._figure = None
+
+    def _clean_figure(self):
+        if self._figure is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            self._figure = Figure(figsize=self.style["figsize"], dpi=self.style["dpi"])
+            FigureCanvasAgg(self._figure)
+        else:
+            self._figure.clear()
+        return self._figure
+
+    def _style(self, ylabel):
+        return self.style if ylabel is None or ylabel == self.style["ylabel"] else dict(self.style, ylabel=ylabel)
+
+    def render(self, xpoints, ypoints, title, png_path, force=False, ylabel=None):
+        """
+        Draws a progress graph of times over dates and saves it as a png, unless the png is already there
+        with the same data and style.
+
+        Inputs:
+        xpoints - the race dates
+        ypoints - the race times in seconds
+        title - title of the graph
+        png_path - where to save the png
+        force - draw it even if the png is up to date
+        ylabel - label of the y axis in place of the style's (i.e. "Distance in Meters" for a throw)
+
+        Returns: a tuple of (the chart hash, True if it was drawn or False if the saved png was reused)
+        """
+        style = self._style(ylabel)
+        key = chart_hash(xpoints, ypoints, title, style)
+        if not force and read_chart_hash(png_path) == key:
+            self.skipped += 1
+            return key, False
+
+        with instrument.span("chart", title, png=png_path):
+            figure = self._draw(xpoints, ypoints, title, style)
+            #save to a temporary name and rename it, so nobody ever sees half a png
+            directory = os.path.dirname(png_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{png_path}.{os.getpid()}.{threading.get_ident()}.part"
+            figure.savefig(temp_path, format="png", metadata={HASH_FIELD: HASH_PREFIX + key})
+            os.replace(temp_path, png_path)
+            figure.clear()
+        if instrument.enabled():
+            instrument.count("bytes_written", os.path.getsize(png_path))
+        self.rendered += 1
+        return key, True
+
+    def render_png(self, xpoints, ypoints, title, ylabel=None):
+        """
+        Draws a progress graph in memory instead of to a file (for the report server).
+
+        Inputs: the same as render, without the path
+
+        Returns: a tuple of (the chart hash, the png as bytes)
+        """
+        style = self._style(ylabel)
+        key = chart_hash(xpoints, ypoints, title, style)
+        with instrument.span("chart", title):
+            figure = self._draw(xpoints, ypoints, title, style)
+            png = io.BytesIO()
+            figure.savefig(png, format="png", metadata={HASH_FIELD: HASH_PREFIX + key})
+            figure.clear()
+        self.rendered += 1
+        return key, png.getvalue()
+
+    def _draw(self, xpoints, ypoints, title, style):
+        import numpy as np
+        figure = self._clean_figure()
+        axes = figure.add_subplot()
+        axes.plot(np.asarray(xpoints, dtype="datetime64[D]"), ypoints)
+        axes.set_title(title, fontdict=style["title_font"])
+        axes.set_xlabel(style["xlabel"], fontdict=style["label_font"])
+        axes.set_ylabel(style["ylabel"], fontdict=style["label_font"])
+        axes.tick_params(axis='x', labelrotation=45)
+        figure.tight_layout()
+        return figure
+
+
+_renderers = threading.local()
+
+def get_renderer():
+    """
+    Returns: the ChartRenderer for the current thread (made the first time it is asked for)
+    """
+    renderer = getattr(_renderers, "renderer", None)
+    if renderer is None:
+        renderer = ChartRenderer()
+        _renderers.renderer = renderer
+    return renderer
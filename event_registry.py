@@ -0,0 +1,208 @@
+import re
+
+#how an event is measured. Times are compared in seconds (lower is better), distances and heights in
+#meters (higher is better).
+TIME = "time"
+DISTANCE = "distance"
+HEIGHT = "height"
+KINDS = (TIME, DISTANCE, HEIGHT)
+
+#every event we know about, in the order they show up in reports and menus:
+#(athletic.net EventID, short name, title, distance in meters (None for field events), how it's measured, relay)
+#Only events whose EventID has been checked against a real athletic.net bio go here. The id decides how a mark
+#is read and which way it is ranked, so a wrong one would mislabel real results and rank them backwards.
+#Sprints, hurdles, the short relays and the jumps and throws can be added one line each once their ids have
+#been checked (i.e. (id, "LJ", "Long Jump", None, DISTANCE, False)); field marks, graph labels and ranking for
+#them already work. Add or fix an event here and the filters, best marks, graphs, reports and menus all pick it up.
+EVENT_TABLE = [(4, "800", "800m", 800, TIME, False),
+               (52, "1600", "1600m", 1600, TIME, False),
+               (60, "3200", "3200m", 3200, TIME, False),
+               (8, "4x400", "4x400m Relay", 1600, TIME, True),
+               (39, "4x800", "4x800m Relay", 3200, TIME, True)]
+
+#what the y axis of an event's graph is called
+AXIS_LABELS = {TIME: "Time in Seconds", DISTANCE: "Distance in Meters", HEIGHT: "Height in Meters"}
+
+_FEET_INCHES = re.compile(r"^(\d+)\s*(?:'|-|ft)\s*(\d+(?:\.\d*)?)?\s*(?:\"|''|in)?$")
+_METERS = re.compile(r"^(\d+(?:\.\d*)?)\s*m?$")
+INCH = 0.0254
+#words in results page headings that aren't part of the event name
+_NOT_EVENT = re.compile(r"\b(boys|girls|men'?s|women'?s|varsity|jv|junior varsity|open|frosh|freshman|finals?|prelims?|"
+                        r"heat \d+|section \d+|flight \d+|division \d+|run|dash|meters?|relay)\b|[-,()]")
+_RELAY = re.compile(r"\b(\d)\s*x\s*(\d+)")
+#a distance like "800", "800m" or "110mh"/"110 h" (a hurdle race)
+_DISTANCE = re.compile(r"\b(\d{2,5})\s*m?\s*(h)?\b")
+
+
+def _entry(row):
+    event_id, name, title, distance, kind, relay = row
+    return {"id": event_id, "name": name, "title": title, "distance": distance, "type": kind, "relay": relay,
+            "lower_is_better": kind == TIME}
+
+EVENTS = [_entry(row) for row in EVENT_TABLE]
+BY_ID = {event["id"]: event for event in EVENTS}
+BY_NAME = {event["name"].lower(): event for event in EVENTS}
+BY_NAME.update({event["title"].lower(): event for event in EVENTS})
+
+
+def event(event_id):
+    """
+    Returns: the registry entry of an EventID (a dictionary of "id", "name", "title", "distance", "type", "relay"
+             and "lower_is_better"), or None if we don't know the event
+    """
+    return BY_ID.get(event_id)
+
+def find(name):
+    """
+    Looks an event up by its short name or title, i.e. "800", "1600m", "4x400".
+
+    Returns: the registry entry
+    Raises: LookupError if there's no such event
+    """
+    entry = BY_NAME.get(str(name).strip().lower())
+    if entry is None:
+        raise LookupError(f"No event called {name!r}. Known events: " + ", ".join(event["name"] for event in EVENTS))
+    return entry
+
+def match(text):
+    """
+    Works out which event a heading on a results page is about, i.e. "Boys 800 Meter Run", "1600m - Varsity",
+    "110m Hurdles - 39\"", "Girls 4x400 Relay" or "Shot Put - 12lb".
+
+    Input: the heading text
+
+    Returns: the registry entry, or None if it isn't an event we know
+    """
+    cleaned = _NOT_EVENT.sub(" ", str(text).lower())
+    cleaned = " ".join(cleaned.split())
+    entry = BY_NAME.get(cleaned)
+    if entry is not None:
+        return entry
+    for entry in EVENTS:
+        if entry["distance"] is None and entry["title"].lower() in cleaned:
+            return entry
+    relay = _RELAY.search(cleaned)
+    if relay:
+        return BY_NAME.get(f"{relay.group(1)}x{relay.group(2)}")
+    distance = _DISTANCE.search(cleaned)
+    if distance is None:
+        return None
+    if "hurdle" in cleaned or distance.group(2):
+        return BY_NAME.get(distance.group(1) + "h")
+    return BY_NAME.get(distance.group(1))
+
+def kind(event_id):
+    """
+    Returns: how an event is measured (TIME, DISTANCE or HEIGHT). Events we don't know are treated as times.
+    """
+    entry = BY_ID.get(event_id)
+    return TIME if entry is None else entry["type"]
+
+def lower_is_better(event_id):
+    return kind(event_id) == TIME
+
+def axis_label(event_id):
+    return AXIS_LABELS[kind(event_id)]
+
+def report_events(names=None):
+    """
+    Gives events in the (EventID, report name, graph title) form the report code uses.
+
+    Input: names (short names or titles to pick, in that order; None for every event)
+
+    Returns: a list of (EventID, report name, graph title) tuples
+    """
+    entries = EVENTS if names is None else [find(name) for name in names]
+    return [(entry["id"], entry["name"], entry["title"]) for entry in entries]
+
+def parse_field_mark(mark):
+    """
+    Converts a distance or height mark to meters. Understands feet and inches ("45' 6.5\"", "45-06.50", "6' 2")
+    and meters ("13.72m", "13.72"). Trailing wind/conversion letters (w, c) and stars are ignored.
+
+    Input: string of a mark
+
+    Returns: the mark in meters (float), or None if it isn't a mark (FOUL, NH, ND, DNS, blank...)
+    """
+    if mark is None:
+        return None
+    cleaned = str(mark).strip().lower().rstrip("wc* ")
+    feet_inches = _FEET_INCHES.match(cleaned)
+    if feet_inches and ("'" in cleaned or "-" in cleaned or "ft" in cleaned):
+        inches = int(feet_inches.group(1)) * 12 + float(feet_inches.group(2) or 0)
+        return inches * INCH
+    meters = _METERS.match(cleaned)
+    if meters:
+        return float(meters.group(1))
+    return None
+
+def parse_marks(marks, kind=TIME):
+    """
+    Takes a whole list (or array) of race time strings and converts them to seconds all at once with numpy,
+    instead of splitting each string by hand. Handles marks like "52.34", "4:31.2a", "10:02.45h" and
+    "1:02:03.4". Anything that isn't a time (DNS, DNF, scratch, FS, DQ, blank...) is marked as not valid, and so
+    is a clock that can't be right: seconds of 60 or more after minutes ("4:60.00"), minutes of 60 or more after
+    hours, or an empty minutes or hours field (":30").
+    Distance and height marks (kind DISTANCE or HEIGHT, i.e. "45' 6.5\"" or "13.72m") are converted to meters.
+    This is the one mark parser for track.py, track_tree.py and the team database.
+
+    Input: list of strings of race times, kind (how the event is measured, see kind)
+
+    Returns: a tuple of (numpy float64 array of the times in seconds, numpy bool array that is True where the mark is a real time)
+    Seconds are 0 wherever the mark isn't valid, so always use the mask before comparing or averaging.
+    """
+    import numpy as np
+    marks = np.char.strip(np.asarray(marks, dtype=str).reshape(-1))
+    if marks.size == 0:
+        return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=bool)
+    if kind != TIME:
+        meters = [parse_field_mark(mark) for mark in marks.tolist()]
+        valid = np.array([value is not None for value in meters], dtype=bool)
+        return np.array([value or 0.0 for value in meters], dtype=np.float64), valid
+    #drop the timing letters on the end (a = adjusted, h = hand timed, c = converted) and stray quotes/stars
+    cleaned = np.char.rstrip(np.char.lower(marks), 'ahcw*" ')
+    #split off the seconds, then the minutes, then whatever is left is hours
+    split_secs = np.char.rpartition(cleaned, ":")
+    rest, secs = split_secs[:, 0], split_secs[:, 2]
+    split_mins = np.char.rpartition(rest, ":")
+    hours, mins = split_mins[:, 0], split_mins[:, 2]
+    digits = np.char.replace(np.char.replace(cleaned, ":", ""), ".", "")
+    colons = np.char.count(cleaned, ":")
+    valid = (np.char.isdigit(digits)
+             & (np.char.count(cleaned, ".") <= 1)
+             & (colons <= 2)
+             & np.char.isdigit(np.char.replace(secs, ".", ""))
+             & ((colons < 1) | np.char.isdigit(mins))
+             & ((colons < 2) | np.char.isdigit(hours)))
+    seconds = np.where(valid, secs, "0").astype(np.float64)
+    minutes = np.where(valid & (colons >= 1), mins, "0").astype(np.float64)
+    valid &= ((colons < 1) | (seconds < 60)) & ((colons < 2) | (minutes < 60))
+    seconds = np.where(valid, seconds + minutes * 60, 0.0)
+    seconds += np.where(valid & (colons >= 2), hours, "0").astype(np.float64) * 3600
+    return seconds, valid
+
+def parse_mark(mark, kind=TIME):
+    """
+    Converts one race time string to seconds in plain python, with the same rules as parse_marks.
+    Used for short lists of times, where loading and setting up numpy would take longer than the work.
+
+    Input: string of a race time (i.e. "4:31.2a"), kind (how the event is measured, see kind)
+
+    Returns: the time in seconds (float), or None if the mark isn't a time (DNS, DNF, blank...).
+    Distance and height marks come back in meters.
+    """
+    if kind != TIME:
+        return parse_field_mark(mark)
+    if mark is None:
+        return None
+    cleaned = str(mark).strip().lower().rstrip('ahcw*" ')
+    rest, has_mins, secs = cleaned.rpartition(":")
+    hours, has_hours, mins = rest.rpartition(":")
+    digits = cleaned.replace(":", "").replace(".", "")
+    if not digits.isdigit() or cleaned.count(".") > 1 or cleaned.count(":") > 2 or not secs.replace(".", "").isdigit():
+        return None
+    if has_mins and (not mins.isdigit() or float(secs) >= 60):
+        return None
+    if has_hours and (not hours.isdigit() or int(mins) >= 60):
+        return None
+    return float(secs) + float(mins or 0) * 60 + float(hours or 0) * 3600
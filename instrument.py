@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+
+#the stages a report goes through. Every span belongs to one of them.
+STAGES = ("download", "parse", "index", "join", "chart", "render")
+#set this to a file name (i.e. TRACK_TRACE=trace.json) to turn tracing on without changing any code
+ENV_VAR = "TRACK_TRACE"
+
+
+class _NoSpan:
+    """
+    What span() hands back while tracing is off: entering and leaving it does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    def __init__(self, tracer, stage, name, args):
+        self.tracer = tracer
+        self.stage = stage
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        event = {"ph": "X", "cat": self.stage, "name": self.name or self.stage, "ts": self.start,
+                 "dur": end - self.start, "pid": os.getpid(), "tid": threading.get_ident()}
+        if self.args:
+            event["args"] = self.args
+        if exc_info[0] is not None:
+            event.setdefault("args", {})["error"] = exc_info[0].__name__
+        self.tracer.record(event)
+        return False
+
+
+class Tracer:
+    """
+    Records how long each stage of a run took (download, parse, index, join, chart and render), how many
+    times it ran and how many bytes were fetched and written. Everything is kept as a list of events, which
+    can be saved as a Chrome trace (open it at chrome://tracing or https://ui.perfetto.dev) or summed up into
+    a text table. Safe to use from several threads.
+
+    Times come from time.perf_counter_ns, which is the same clock in every process on one machine, so events
+    sent back from chart worker processes (see drain and merge) line up with the ones from the main process.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._lock = threading.Lock()
+
+    def span(self, stage, name=None, **args):
+        """
+        Times a with block as one span of a stage. Does nothing while tracing is off.
+
+        Inputs: stage (one of STAGES), name (what the span is, i.e. an athlete or url; defaults to the stage),
+                args (anything else to show with the span in the trace)
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, stage, name, args)
+
+    def count(self, counter, amount):
+        """
+        Adds to a counter ("bytes_fetched" or "bytes_written"). Does nothing while tracing is off.
+        """
+        if self.enabled and amount:
+            self.record({"ph": "C", "name": counter, "ts": time.perf_counter_ns(), "value": amount,
+                         "pid": os.getpid(), "tid": threading.get_ident()})
+
+    def record(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def drain(self):
+        """
+        Takes the events this process recorded (for a worker process to send back to the main one).
+        A forked worker starts with a copy of the main process's events, so only its own are taken.
+
+        Returns: a list of events (empty while tracing is off)
+        """
+        if not self.enabled:
+            return []
+        pid = os.getpid()
+        with self._lock:
+            mine = [event for event in self.events if event["pid"] == pid]
+            self.events = [event for event in self.events if event["pid"] != pid]
+        return mine
+
+    def merge(self, events):
+        """
+        Adds events that were drained in another process.
+        """
+        if events:
+            with self._lock:
+                self.events.extend(events)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.events)
+
+    def summary(self):
+        """
+        Returns: a dictionary with the "stages" (stage -> calls, seconds, max_seconds), the "counters"
+                 (counter -> total) and the "wall" seconds from the first event to the end of the last one
+        """
+        events = self.snapshot()
+        stages = {}
+        counters = {}
+        first, last = None, None
+        for event in events:
+            end = event["ts"] + event.get("dur", 0)
+            first = event["ts"] if first is None else min(first, event["ts"])
+            last = end if last is None else max(last, end)
+            if event["ph"] == "C":
+                counters[event["name"]] = counters.get(event["name"], 0) + event["value"]
+                continue
+            stage = stages.setdefault(event["cat"], {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+            seconds = event["dur"] / 1e9
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+        return {"stages": stages, "counters": counters, "wall": 0.0 if first is None else (last - first) / 1e9}
+
+    def summary_text(self):
+        """
+        Returns: the summary as a table, one line per stage. Spans inside worker threads and processes
+        overlap, so the stage totals can add up to more than the wall time.
+        """
+        summary = self.summary()
+        lines = [f"{'Stage':<10}{'Calls':>8}{'Total s':>10}{'Mean ms':>10}{'Max ms':>10}"]
+        for stage in STAGES + tuple(sorted(set(summary["stages"]) - set(STAGES))):
+            info = summary["stages"].get(stage)
+            if info is None:
+                continue
+            lines.append(f"{stage:<10}{info['calls']:>8}{info['seconds']:>10.3f}"
+                         f"{info['seconds'] / info['calls'] * 1000:>10.2f}{info['max_seconds'] * 1000:>10.2f}")
+        for counter, total in sorted(summary["counters"].items()):
+            lines.append(f"{counter}: {total:,}")
+        lines.append(f"wall: {summary['wall']:.3f}s")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """
+        Returns: the events as a Chrome trace-event dictionary. Times are in microseconds from the first event,
+                 and counters are shown as running totals.
+        """
+        events = sorted(self.snapshot(), key=lambda event: event["ts"])
+        start = events[0]["ts"] if events else 0
+        totals = {}
+        trace = []
+        for event in events:
+            out = dict(event, ts=(event["ts"] - start) / 1000)
+            if event["ph"] == "C":
+                totals[event["name"]] = totals.get(event["name"], 0) + event["value"]
+                out["args"] = {event["name"]: totals[event["name"]]}
+                del out["value"]
+            else:
+                out["dur"] = event["dur"] / 1000
+            trace.append(out)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def write(self, trace_path):
+        """
+        Saves the Chrome trace to trace_path and the text summary next to it (trace.json -> trace.summary.txt).
+
+        Returns: the path of the summary
+        """
+        with open(trace_path, "w", encoding="utf-8") as f_out:
+            json.dump(self.chrome_trace(), f_out)
+        summary_path = os.path.splitext(trace_path)[0] + ".summary.txt"
+        with open(summary_path, "w", encoding="utf-8") as f_out:
+            f_out.write(self.summary_text() + "\n")
+        return summary_path
+
+
+#the tracer every module records into
+TRACER = Tracer()
+_export_path = None
+
+
+def span(stage, name=None, **args):
+    """
+    Times a with block as one span of a stage (see Tracer.span). Does nothing unless tracing is on.
+    """
+    return TRACER.span(stage, name, **args)
+
+def count(counter, amount):
+    """
+    Adds to the "bytes_fetched" or "bytes_written" counter. Does nothing unless tracing is on.
+    """
+    TRACER.count(counter, amount)
+
+def drain():
+    """
+    Takes the events this process recorded, to send back from a worker process (see Tracer.drain).
+    """
+    return TRACER.drain()
+
+def merge(events):
+    """
+    Adds events sent back from a worker process.
+    """
+    TRACER.merge(events)
+
+def enabled():
+    return TRACER.enabled
+
+def enable(trace_path=None):
+    """
+    Turns tracing on. With a trace_path the Chrome trace and text summary are saved there when the program
+    exits and the summary is printed to stderr. The path is also put in the TRACK_TRACE environment variable
+    so worker processes started from scratch (instead of forked) record too.
+    """
+    global _export_path
+    TRACER.enabled = True
+    if trace_path and _export_path is None:
+        atexit.register(_export)
+    if trace_path:
+        _export_path = trace_path
+        os.environ[ENV_VAR] = trace_path
+
+def disable():
+    TRACER.enabled = False
+
+def _export():
+    if _export_path is None or not TRACER.events:
+        return
+    try:
+        summary_path = TRACER.write(_export_path)
+    except OSError as inst:
+        print(f"Couldn't save the trace to {_export_path}: {inst}", file=sys.stderr)
+        return
+    print("\n" + TRACER.summary_text(), file=sys.stderr)
+    print(f"Trace saved to {_export_path} (summary in {summary_path})", file=sys.stderr)
+
+
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])
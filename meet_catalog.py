@@ -0,0 +1,212 @@
+import re
+import bisect
+import datetime
+import instrument
+
+#months that belong to the indoor season. Indoor meets in November and December count toward the next
+#year's season (the 2023 indoor season runs from December 2022 to March 2023), everything else is outdoor.
+INDOOR_MONTHS = (11, 12, 1, 2, 3)
+PARTS = ("indoor", "outdoor")
+
+_YEARS = re.compile(r'^(\d{4})(?:\s*(?:-|–|to)\s*(\d{4}))?$')
+_LAST_DAYS = re.compile(r'^last\s+(\d+)\s+days?$')
+
+
+def season_of(date):
+    """
+    Works out which season a meet date belongs to. Indoor track starts in November, so November and December
+    meets count toward the next year's season, i.e. a meet on 2023-11-02 is in the 2024 season.
+
+    Input: date (a 'YYYY-MM-DD...' string, datetime.date or numpy datetime64)
+
+    Returns: the season as an int (i.e. 2022), or None if there is no date
+    """
+    text = "" if date is None else str(date)[:10]
+    if len(text) < 10:
+        return None
+    year, month = int(text[:4]), int(text[5:7])
+    return year + 1 if month >= 11 else year
+
+def _to_day(value):
+    if value is None:
+        return None
+    return datetime.date.fromisoformat(str(value)[:10])
+
+def parse_query(text, today=None):
+    """
+    Turns a season description typed by a person into a query for MeetCatalog.select. Understands a
+    season ("2022"), a range of seasons ("2021-2024"), either of those followed by "indoor" or "outdoor",
+    "indoor"/"outdoor" on their own, "all", and "last 30 days". "Last N days" is turned into dates right
+    away (counting back from today) so the query means the same thing later on.
+
+    Inputs: text (string), today (date to count back from, defaults to today)
+
+    Returns: a dictionary with "seasons" ([first, last] or None), "part", "start" and "end" ('YYYY-MM-DD' or None)
+    Raises: ValueError if the text isn't understood
+    """
+    query = {"seasons": None, "part": None, "start": None, "end": None}
+    words = text.strip().lower()
+    days = _LAST_DAYS.match(words)
+    if days:
+        end = _to_day(today or datetime.date.today())
+        query["start"] = str(end - datetime.timedelta(days=int(days.group(1))))
+        query["end"] = str(end)
+        return query
+    for part in PARTS:
+        if words.endswith(part):
+            query["part"] = part
+            words = words[:-len(part)].strip()
+    if words in ("", "all"):
+        return query
+    years = _YEARS.match(words)
+    if years is None:
+        raise ValueError(f"Don't know which seasons {text!r} means. Try 2022, 2021-2024, 2022 outdoor or last 30 days")
+    first = int(years.group(1))
+    last = int(years.group(2) or first)
+    query["seasons"] = [min(first, last), max(first, last)]
+    return query
+
+def _check_part(part):
+    if part is not None and part not in PARTS:
+        raise ValueError(f"Unknown part of the season {part!r}, expected one of {PARTS}")
+    return part
+
+def describe(query):
+    """
+    Returns: a short label for a query to put in a report header, i.e. "2022", "2021-2024 Outdoor" or
+    "2022-05-01 to 2022-05-31"
+    """
+    label = ""
+    seasons = query.get("seasons")
+    if seasons:
+        label = str(seasons[0]) if seasons[0] == seasons[1] else f"{seasons[0]}-{seasons[1]}"
+    if query.get("start") or query.get("end"):
+        label = (label + " " if label else "") + f"{query.get('start') or '...'} to {query.get('end') or '...'}"
+    if query.get("part"):
+        label = (label + " " if label else "") + query["part"].title()
+    return label or "All"
+
+
+class MeetCatalog:
+    """
+    Every meet an athlete went to, parsed once and sorted by date, along with each meet's season and
+    whether it was indoors. Because seasons follow the date order, any range of seasons or dates is one
+    slice of the sorted lists found with a binary search, so queries like "2021-2024 outdoor" or "the last
+    30 days" never rescan the meets. Everything is plain python so looking up a time doesn't have to wait
+    for numpy to load; the dates as a numpy datetime64 array (ready to plot) are made the first time they
+    are asked for.
+
+    Meets without a date are kept for lookups but never match a query.
+    """
+
+    def __init__(self, meet_table):
+        """
+        Input: meet_table (meet id -> {"name", "date"}, from track.get_meet_table)
+        """
+        dated = sorted(((info["date"][:10], meet_id) for meet_id, info in meet_table.items()
+                        if info.get("date") and len(info["date"]) >= 10), key=lambda pair: pair[0])
+        self.meet_ids = [meet_id for date, meet_id in dated]
+        self.names = [meet_table[meet_id]["name"] for meet_id in self.meet_ids]
+        #'YYYY-MM-DD' strings sort the same way as the dates they stand for, so they can be searched directly
+        self.date_text = [date for date, meet_id in dated]
+        self.seasons = [season_of(date) for date in self.date_text]
+        self.indoor = [int(date[5:7]) in INDOOR_MONTHS for date in self.date_text]
+        self._position = {meet_id: position for position, meet_id in enumerate(self.meet_ids)}
+        self._meets = meet_table
+        self._dates = None
+
+    def __len__(self):
+        return len(self.meet_ids)
+
+    @property
+    def dates(self):
+        """
+        The meet dates as a numpy datetime64[D] array, in the same order as meet_ids.
+        """
+        if self._dates is None:
+            import numpy as np
+            self._dates = np.array(self.date_text, dtype="datetime64[D]")
+        return self._dates
+
+    def season_list(self):
+        """
+        Returns: the seasons the athlete has meets in, oldest first
+        """
+        return sorted(set(self.seasons))
+
+    def latest_season(self):
+        """
+        Returns: the most recent season with a meet, or None if there are no dated meets
+        """
+        return self.seasons[-1] if self.seasons else None
+
+    def meet(self, meet_id):
+        """
+        Returns: the meet table entry ({"name", "date", "season"}) for a meet id, or None
+        """
+        return self._meets.get(meet_id)
+
+    def _bounds(self, seasons=None, start=None, end=None, days=None, today=None):
+        if days is not None:
+            end = _to_day(today or datetime.date.today())
+            start = end - datetime.timedelta(days=int(days))
+        lo, hi = 0, len(self.meet_ids)
+        if seasons is not None:
+            if isinstance(seasons, (int, str)):
+                seasons = (seasons, seasons)
+            lo = max(lo, bisect.bisect_left(self.seasons, int(seasons[0])))
+            hi = min(hi, bisect.bisect_right(self.seasons, int(seasons[1])))
+        if start is not None:
+            lo = max(lo, bisect.bisect_left(self.date_text, str(_to_day(start))))
+        if end is not None:
+            hi = min(hi, bisect.bisect_right(self.date_text, str(_to_day(end))))
+        return lo, max(lo, hi)
+
+    def select(self, seasons=None, part=None, start=None, end=None, days=None, today=None):
+        """
+        Finds the meets that match a query.
+
+        Inputs:
+        seasons - one season (2022 or "2022"), a (first, last) pair of seasons, or None for every season
+        part - "indoor", "outdoor" or None for both
+        start, end - first and last date to keep (inclusive, 'YYYY-MM-DD', date or datetime64)
+        days - only keep the last this many days before today (or before the today argument)
+
+        Returns: a list of positions in the catalog, in date order (use meet_ids/date_text/names/dates with it)
+        """
+        lo, hi = self._bounds(seasons, start, end, days, today)
+        if _check_part(part) is None:
+            return list(range(lo, hi))
+        want_indoor = part == "indoor"
+        return [position for position in range(lo, hi) if self.indoor[position] == want_indoor]
+
+    def select_meets(self, **query):
+        """
+        Returns: a list of (meet name, meet id, date) tuples for the meets that match a query (see select)
+        """
+        return [(self.names[position], self.meet_ids[position], self.date_text[position])
+                for position in self.select(**query)]
+
+    def join(self, distance_results, seasons=None, part=None, start=None, end=None, days=None, today=None):
+        """
+        Connects each race of a distance with the meet it was run at, keeping only races at meets that
+        match the query (see select). Each race is checked with a dictionary lookup and a comparison against
+        the query's slice, so nothing is searched.
+
+        Inputs: the list of tuples of (race time, meet id) from get_event, and the query
+
+        Returns: A list of tuples of (race time, meet name, meet date), in date order.
+        """
+        with instrument.span("join", races=len(distance_results)):
+            lo, hi = self._bounds(seasons, start, end, days, today)
+            want_indoor = None if _check_part(part) is None else part == "indoor"
+            matched = []
+            for result in distance_results:
+                position = self._position.get(result[1])
+                if position is None or position < lo or position >= hi:
+                    continue
+                if want_indoor is not None and self.indoor[position] != want_indoor:
+                    continue
+                matched.append((position, result[0]))
+            matched.sort(key=lambda pair: pair[0])
+            return [(time, self.names[position], self.date_text[position]) for position, time in matched]
@@ -0,0 +1,222 @@
+import os
+import os.path
+import html
+import datetime
+import json
+import threading
+import contextlib
+from string import Template
+import charts
+import instrument
+
+#bump this when the layout of the html reports changes, so every report gets rebuilt once
+REPORT_TEMPLATE_VERSION = 3
+
+#what goes in the header of a report. Anything here can be changed per report with create_html's header argument.
+#The season is normally filled in from the seasons the report covers (see meet_catalog.describe).
+HEADER = {"page_title": "Northville Track and Field",
+          "logo": "Mustangs.png",
+          "logo_alt": "Mustang-Logo",
+          "season": str(datetime.date.today().year),
+          "school": "Northville HS",
+          "sport": "Track & Field",
+          "stylesheet": "styles.css"}
+
+#the pieces of a report. They are compiled once when the program starts and filled in for every report.
+#Every value is html escaped before it goes in.
+PAGE_START = Template('''<!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <link rel="stylesheet" href="$stylesheet">
+        <title>$page_title</title>
+    </head>
+    <body>
+        <div class="header">
+        <img class="logo" src="$logo" alt="$logo_alt">
+        <div class="header-text">
+           <div class="athlete_name">$athlete_name</div>
+           <div class="season_year">$season Season</div>
+           <div class="school">$school</div>
+           <div class="sport">$sport</div>
+        </div>
+    </div>
+''')
+SECTION_START = Template('''    <hr class="solid">    <div class="RaceTitle">$event</div>
+    <div class="Results">
+''')
+RESULT = Template('''        <div class="Result">
+            <div class="Place">$meet: </div>
+            <div class="Time">$time</div>
+        </div>
+''')
+SECTION_END = Template('''    </div>
+    <img class="graph" src="$image">
+''')
+PAGE_END = '''
+    </body>
+    </html>'''
+
+#file in the reports folder that remembers what each report was built from
+MANIFEST_NAME = ".build_manifest.json"
+
+#what to do when a report already exists:
+#  "changed" - rewrite it only if what it was built from changed (the default)
+#  "always"  - always rewrite it
+#  "never"   - keep the report that is there
+POLICIES = ("changed", "always", "never")
+
+
+@contextlib.contextmanager
+def atomic_open(filepath, encoding='utf-8'):
+    """
+    Opens a temporary file next to filepath for writing and renames it into place when the with block
+    finishes, so anyone reading the file (a browser, the report server) sees either the old version or the
+    new one, never half of one. If the block fails the temporary file is deleted and filepath is left alone.
+    """
+    temp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with open(temp_path, "w", encoding=encoding) as f_out:
+            yield f_out
+            written = f_out.tell()
+        os.replace(temp_path, filepath)
+        instrument.count("bytes_written", written)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_atomic(filepath, text, encoding='utf-8'):
+    """
+    Writes text to filepath all at once (see atomic_open).
+    """
+    with atomic_open(filepath, encoding) as f_out:
+        f_out.write(text)
+
+def _escaped(values):
+    return {key: html.escape(str(value)) for key, value in values.items()}
+
+def render_report(out, athlete_name, results_type, results, images, header=None):
+    """
+    Writes an athlete's html report into out (an open file or io.StringIO) one piece at a time, so the
+    time it takes only grows with the size of the report.
+
+    Inputs:
+    out - anything with a write method
+    athlete_name - the athlete's name
+    results_type - the names of the events in the report (i.e. 800, 1600)
+    results - for each event, a list of (race time, meet name) tuples
+    images - for each event, the link to its graph
+    header - values to use in place of the ones in HEADER
+    """
+    values = dict(HEADER)
+    values.update(header or {})
+    values["athlete_name"] = athlete_name.upper()
+    out.write(PAGE_START.substitute(_escaped(values)))
+    for event, races, image in zip(results_type, results, images):
+        out.write(SECTION_START.substitute(event=html.escape(str(event))))
+        for race in races:
+            out.write(RESULT.substitute(meet=html.escape(str(race[1])), time=html.escape(str(race[0]))))
+        out.write(SECTION_END.substitute(image=html.escape(str(image))))
+    out.write(PAGE_END)
+
+
+def report_inputs(source, requested, results_type, chart_hashes, query=None):
+    """
+    Collects everything a report depends on, so it can be compared with what the last build used.
+
+    Inputs:
+    source - the hash of the athlete's json (BioCache.fingerprint)
+    requested - the EventIDs that were asked for
+    results_type - the names of the events that ended up in the report
+    chart_hashes - dictionary of image path -> chart hash (None for events without a graph)
+    query - the seasons/dates the report covers (from meet_catalog.parse_query, None for the latest season)
+
+    Returns: a dictionary of the inputs
+    """
+    return {"source": source,
+            "requested": list(requested),
+            "query": query,
+            "events": list(results_type),
+            "charts": dict(chart_hashes),
+            "template": REPORT_TEMPLATE_VERSION}
+
+
+class BuildManifest:
+    """
+    Remembers the inputs each report in a folder was built from (the json hash, the events asked for and
+    shown, the hashes of its graphs and the template version), saved as .build_manifest.json in that folder.
+    It is used to skip reports whose inputs haven't changed. Safe to share between threads.
+    """
+
+    def __init__(self, output_directory="reports"):
+        self.output_directory = output_directory
+        self.path = os.path.join(output_directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file_obj:
+                self.entries = json.load(file_obj)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def entry(self, name):
+        """
+        Returns: the recorded inputs of a report (by its file name without .html), or None
+        """
+        with self._lock:
+            return self.entries.get(name)
+
+    def record(self, name, inputs):
+        """
+        Remembers the inputs a report was just built from.
+        """
+        with self._lock:
+            self.entries[name] = inputs
+
+    def save(self):
+        """
+        Writes the manifest to the reports folder.
+        """
+        with self._lock:
+            text = json.dumps(self.entries, indent=1, sort_keys=True)
+        write_atomic(self.path, text)
+
+    def should_write(self, name, policy="changed", inputs=None):
+        """
+        Decides whether a report needs to be written, using the overwrite policy instead of asking.
+
+        Inputs: name (report file name without .html), policy (one of POLICIES), inputs (from report_inputs,
+                None if not known, which counts as changed)
+
+        Returns: True if the report should be written
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overwrite policy {policy!r}, expected one of {POLICIES}")
+        if not os.path.isfile(os.path.join(self.output_directory, name + ".html")):
+            return True
+        if policy == "always":
+            return True
+        if policy == "never":
+            return False
+        return inputs is None or self.entry(name) != inputs
+
+    def up_to_date(self, name, source, requested, query=None):
+        """
+        Checks before doing any work whether a report can be skipped: the json hash, the events and seasons
+        asked for and the template version all match the last build, the report is still there and every graph
+        it uses is still on disk with the hash it was built with.
+
+        Inputs: name (report file name without .html), source (hash of the athlete's json), requested (EventIDs),
+                query (the seasons/dates asked for, see report_inputs)
+
+        Returns: True if nothing about the report would change
+        """
+        entry = self.entry(name)
+        if entry is None or entry.get("source") != source or entry.get("requested") != list(requested) \
+                or entry.get("query") != query or entry.get("template") != REPORT_TEMPLATE_VERSION:
+            return False
+        if not os.path.isfile(os.path.join(self.output_directory, name + ".html")):
+            return False
+        for image, key in entry.get("charts", {}).items():
+            if key is not None and charts.read_chart_hash(os.path.join(self.output_directory, image)) != key:
+                return False
+        return True
@@ -0,0 +1,354 @@
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import collections
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import track
+import charts
+import report_build
+import meet_catalog
+import event_registry
+from bio_cache import BioCache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8507
+
+#files the server hands out from the static folder (the style sheet and the logo live in reports/)
+STATIC_TYPES = {".css": "text/css; charset=utf-8",
+                ".png": "image/png",
+                ".jpg": "image/jpeg",
+                ".gif": "image/gif",
+                ".ico": "image/x-icon"}
+
+
+class LRUCache:
+    """
+    A dictionary that holds at most maxsize entries and forgets the one used longest ago when it is full.
+    Every entry is saved with a stamp of what it was built from (i.e. the size and modified time of the
+    athlete's json). Asking for an entry with a different stamp counts as a miss and drops the old entry,
+    so nothing built from an old file is ever handed out. Safe to share between threads.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, stamp):
+        """
+        Returns: the value saved under key with this stamp, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, stamp, value):
+        """
+        Saves a value, forgetting the least recently used entries if there are too many.
+        """
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns: a dictionary with the number of "entries", "hits" and "misses"
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class ReportService:
+    """
+    Everything the report server knows, kept in memory between requests: the parsed athletes, the
+    rendered html pages and the rendered graphs, each in its own LRUCache. Entries are stamped with
+    the size and modified time of the athlete's cached json, so when BioCache downloads a new copy the
+    next request rebuilds from it. Asking BioCache whether an athlete needs refreshing only happens once
+    per cache ttl, so a page that is already built is one stat of the json plus a dictionary lookup.
+    """
+
+    def __init__(self, cache=None, athlete_info=track.ATHLETE_INFO, events=track.REPORT_EVENTS,
+                 static_directory="reports", max_athletes=32, max_pages=64, max_charts=128, offline=False):
+        """
+        Inputs:
+        cache - the BioCache athletes come from (one that refreshes in the background is made if not given)
+        athlete_info - who can be looked up (list of {name: id} dictionaries like track.ATHLETE_INFO)
+        events - the (EventID, report name, graph title) tuples shown on a page
+        static_directory - where the style sheet and logo are
+        max_athletes, max_pages, max_charts - how many of each to keep in memory
+        offline - only use saved copies, never check athletic.net
+        """
+        self.cache = cache or BioCache(stale_while_revalidate=True)
+        self.athlete_info = athlete_info
+        self.events = events
+        self.static_directory = static_directory
+        self.offline = offline
+        self.athletes = LRUCache(max_athletes)
+        self.pages = LRUCache(max_pages)
+        self.charts = LRUCache(max_charts)
+        self._checked = {}
+        self._renderer = charts.ChartRenderer()
+        self._chart_lock = threading.Lock()
+
+    def find(self, url_name):
+        """
+        Finds an athlete from the name in a url ("DavidWhitaker" or "David Whitaker", any capitals).
+
+        Returns: a tuple of (athlete name, athlete id)
+        Raises: LookupError if they aren't in athlete_info
+        """
+        wanted = url_name.replace(" ", "").lower()
+        for entry in self.athlete_info:
+            for name, athlete_id in entry.items():
+                if name.replace(" ", "").lower() == wanted:
+                    return name, athlete_id
+        raise LookupError(f"{url_name} isn't on the roster")
+
+    def _stamp(self, athlete_name):
+        try:
+            stat = os.stat(self.cache.path(athlete_name))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def athlete(self, athlete_name, athlete_id):
+        """
+        Gets a parsed athlete from memory, loading it (and downloading it if there is no copy) when it isn't
+        there or its json changed.
+
+        Returns: a tuple of (athlete dictionary, stamp of the json it came from)
+        """
+        now = time.monotonic()
+        last_check = self._checked.get(athlete_name)
+        if not self.offline and (last_check is None or now - last_check > self.cache.ttl):
+            #lets the cache download a missing athlete or start refreshing an old one in the background
+            self.cache.get(athlete_name, athlete_id)
+            self._checked[athlete_name] = now
+        stamp = self._stamp(athlete_name)
+        if stamp is None:
+            if self.offline:
+                raise LookupError(f"There is no saved copy of {athlete_name}")
+            self.cache.get(athlete_name, athlete_id)
+            stamp = self._stamp(athlete_name)
+        athlete = self.athletes.get(athlete_name, stamp)
+        if athlete is None:
+            athlete = track.load_athlete(self.cache.path(athlete_name))
+            self.athletes.put(athlete_name, stamp, athlete)
+        return athlete, stamp
+
+    def _records(self, athlete, query):
+        catalog = track.get_meet_catalog(athlete)
+        athlete_query = track.season_query(catalog, query)
+        records = {}
+        for event_id, event_name, title in self.events:
+            event_records = catalog.join(track.get_event(athlete, event_id), **athlete_query)
+            if event_records:
+                records[event_name] = event_records
+        return athlete_query, records
+
+    def page(self, url_name, seasons=None):
+        """
+        Gives an athlete's report page, rendering it only if it isn't in memory for the current json.
+
+        Inputs: url_name (athlete name from the url), seasons (text for meet_catalog.parse_query, None for the latest season)
+
+        Returns: a tuple of (the html as utf-8 bytes, an ETag for it)
+        Raises: LookupError for an unknown athlete, ValueError for seasons that can't be understood
+        """
+        athlete_name, athlete_id = self.find(url_name)
+        query = meet_catalog.parse_query(seasons) if seasons else None
+        athlete, stamp = self.athlete(athlete_name, athlete_id)
+        key = (athlete_name, json.dumps(query, sort_keys=True))
+        page = self.pages.get(key, stamp)
+        if page is None:
+            athlete_query, records = self._records(athlete, query)
+            name = athlete_name.replace(" ", "")
+            suffix = "?" + urllib.parse.urlencode({"seasons": seasons}) if seasons else ""
+            results_type = list(records)
+            results = [[(time_, meet) for time_, meet, date in records[event]] for event in results_type]
+            images = [f"/athlete/{name}/{event}.png{suffix}" for event in results_type]
+            header = {"season": meet_catalog.describe(athlete_query),
+                      "stylesheet": "/static/" + report_build.HEADER["stylesheet"],
+                      "logo": "/static/" + report_build.HEADER["logo"]}
+            out = io.StringIO()
+            report_build.render_report(out, athlete_name, results_type, results, images, header)
+            body = out.getvalue().encode("utf-8")
+            page = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+            self.pages.put(key, stamp, page)
+        return page
+
+    def chart(self, url_name, event_name, seasons=None):
+        """
+        Gives the png of an athlete's progress graph for one event, drawing it only if it isn't in memory.
+
+        Returns: a tuple of (the png bytes, an ETag for it (the chart hash))
+        Raises: LookupError for an unknown athlete or event (or one with less than two races to graph),
+                ValueError for seasons that can't be understood
+        """
+        athlete_name, athlete_id = self.find(url_name)
+        events = {event[1]: event for event in self.events}
+        if event_name not in events:
+            raise LookupError(f"No event called {event_name}")
+        event_id, event_name, title = events[event_name]
+        query = meet_catalog.parse_query(seasons) if seasons else None
+        athlete, stamp = self.athlete(athlete_name, athlete_id)
+        key = (athlete_name, event_name, json.dumps(query, sort_keys=True))
+        chart = self.charts.get(key, stamp)
+        if chart is None:
+            athlete_query, records = self._records(athlete, query)
+            race_dets = [(time_, date) for time_, meet, date in records.get(event_name, [])]
+            if len(race_dets) < 2:
+                raise LookupError(f"Not enough {event_name} races to graph")
+            xpoints, ypoints = track.progress_points(race_dets, event_registry.kind(event_id))
+            with self._chart_lock:
+                chart_key, png = self._renderer.render_png(xpoints, ypoints, title, event_registry.axis_label(event_id))
+            chart = (png, '"' + chart_key + '"')
+            self.charts.put(key, stamp, chart)
+        return chart
+
+    def static(self, filename):
+        """
+        Reads a file from the static folder (only plain file names, nothing in other folders).
+
+        Returns: a tuple of (the file's bytes, its content type)
+        Raises: LookupError if there is no such file
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if os.path.basename(filename) != filename or filename.startswith(".") or extension not in STATIC_TYPES:
+            raise LookupError(filename)
+        try:
+            with open(os.path.join(self.static_directory, filename), "rb") as file_obj:
+                return file_obj.read(), STATIC_TYPES[extension]
+        except OSError:
+            raise LookupError(filename)
+
+    def index(self):
+        """
+        Returns: a small html page linking to every athlete, as utf-8 bytes
+        """
+        import html
+        links = "".join(f'        <li><a href="/athlete/{urllib.parse.quote(name.replace(" ", ""))}">{html.escape(name)}</a></li>\n'
+                        for entry in self.athlete_info for name in entry)
+        return (f'<!DOCTYPE html>\n<html lang="en">\n<head>\n    <link rel="stylesheet" href="/static/styles.css">\n'
+                f'    <title>{html.escape(report_build.HEADER["page_title"])}</title>\n</head>\n<body>\n'
+                f'    <ul>\n{links}    </ul>\n</body>\n</html>\n').encode("utf-8")
+
+    def stats(self):
+        """
+        Returns: the hit/miss counts of the athlete, page and chart caches
+        """
+        return {"athletes": self.athletes.stats(), "pages": self.pages.stats(), "charts": self.charts.stats()}
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    """
+    Answers:
+    /                                   list of athletes
+    /athlete/<name>[?seasons=...]       the athlete's report page
+    /athlete/<name>/<event>.png         a progress graph (i.e. /athlete/DavidWhitaker/1600.png)
+    /static/<file>                      the style sheet and logo
+    /stats                              cache hits and misses as json
+    """
+
+    server_version = "TrackReports/1.0"
+
+    def do_GET(self):
+        service = self.server.service
+        parts = urllib.parse.urlsplit(self.path)
+        segments = [urllib.parse.unquote(segment) for segment in parts.path.split("/") if segment]
+        seasons = urllib.parse.parse_qs(parts.query).get("seasons", [None])[0]
+        try:
+            if not segments:
+                self._send(200, service.index(), "text/html; charset=utf-8")
+            elif segments == ["stats"]:
+                self._send(200, json.dumps(service.stats()).encode("utf-8"), "application/json")
+            elif len(segments) == 2 and segments[0] == "static":
+                body, content_type = service.static(segments[1])
+                self._send(200, body, content_type)
+            elif len(segments) == 2 and segments[0] == "athlete":
+                body, etag = service.page(segments[1], seasons)
+                self._send(200, body, "text/html; charset=utf-8", etag)
+            elif len(segments) == 3 and segments[0] == "athlete" and segments[2].endswith(".png"):
+                body, etag = service.chart(segments[1], segments[2][:-len(".png")], seasons)
+                self._send(200, body, "image/png", etag)
+            else:
+                self._send_error(404, "Not found")
+        except LookupError as inst:
+            self._send_error(404, str(inst))
+        except ValueError as inst:
+            self._send_error(400, str(inst))
+        except Exception as inst:
+            self._send_error(502, f"Couldn't get the athlete's data: {inst}")
+
+    def _send(self, status, body, content_type, etag=None):
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send(status, (message + "\n").encode("utf-8"), "text/plain; charset=utf-8")
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None):
+    """
+    Makes the report server (one thread per request, all sharing one ReportService). Call serve_forever on it.
+
+    Returns: the ThreadingHTTPServer
+    """
+    server = ThreadingHTTPServer((host, port), ReportHandler)
+    server.daemon_threads = True
+    server.service = service or ReportService()
+    return server
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None):
+    """
+    Runs the report server until Ctrl-C.
+    """
+    server = make_server(host, port, service)
+    print(f"Serving reports at http://{host}:{server.server_address[1]}/ (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    serve(port=port)
+
+if __name__ == "__main__":
+    main()
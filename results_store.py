@@ -0,0 +1,393 @@
+import time
+import sqlite3
+import meet_catalog
+import event_registry
+
+#where the team database goes unless told otherwise
+DEFAULT_PATH = "results.sqlite3"
+
+#the season/grade of leaderboard entries that cover every season or grade
+ALL = 0
+
+#bump this when the tables change, so an old database gets rebuilt from the json files
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS athletes (
+    athlete_id   INTEGER PRIMARY KEY,
+    name         TEXT NOT NULL,
+    source_hash  TEXT,
+    ingested_at  REAL
+);
+CREATE TABLE IF NOT EXISTS meets (
+    meet_id      INTEGER PRIMARY KEY,
+    name         TEXT,
+    date         TEXT,
+    season       INTEGER,
+    indoor       INTEGER
+);
+CREATE TABLE IF NOT EXISTS events (
+    event_id     INTEGER PRIMARY KEY,
+    name         TEXT NOT NULL,
+    title        TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id           INTEGER PRIMARY KEY,
+    result_id    INTEGER,
+    athlete_id   INTEGER NOT NULL REFERENCES athletes(athlete_id) ON DELETE CASCADE,
+    event_id     INTEGER,
+    meet_id      INTEGER,
+    mark         TEXT,
+    value        REAL,
+    date         TEXT,
+    season       INTEGER,
+    indoor       INTEGER,
+    grade        INTEGER,
+    UNIQUE (athlete_id, result_id)
+);
+CREATE TABLE IF NOT EXISTS bests (
+    event_id     INTEGER NOT NULL,
+    season       INTEGER NOT NULL,
+    grade        INTEGER NOT NULL,
+    athlete_id   INTEGER NOT NULL REFERENCES athletes(athlete_id) ON DELETE CASCADE,
+    value        REAL NOT NULL,
+    mark         TEXT,
+    meet_id      INTEGER,
+    date         TEXT,
+    PRIMARY KEY (event_id, season, grade, athlete_id)
+);
+CREATE INDEX IF NOT EXISTS results_event_value ON results(event_id, value);
+CREATE INDEX IF NOT EXISTS results_athlete_date ON results(athlete_id, date);
+CREATE INDEX IF NOT EXISTS results_meet ON results(meet_id);
+CREATE INDEX IF NOT EXISTS bests_board ON bests(event_id, season, grade, value);
+"""
+
+
+def _query_filters(seasons=None, part=None, start=None, end=None):
+    """
+    Turns a meet_catalog style query into sql conditions on the season, indoor and date columns.
+
+    Returns: a tuple of (list of sql conditions, list of their parameters)
+    """
+    conditions = []
+    parameters = []
+    if seasons is not None:
+        if isinstance(seasons, (int, str)):
+            seasons = (seasons, seasons)
+        conditions.append("results.season BETWEEN ? AND ?")
+        parameters.extend([int(seasons[0]), int(seasons[1])])
+    if part is not None:
+        if part not in meet_catalog.PARTS:
+            raise ValueError(f"Unknown part of the season {part!r}, expected one of {meet_catalog.PARTS}")
+        conditions.append("results.indoor = ?")
+        parameters.append(int(part == "indoor"))
+    if start is not None:
+        conditions.append("results.date >= ?")
+        parameters.append(str(start)[:10])
+    if end is not None:
+        conditions.append("results.date <= ?")
+        parameters.append(str(end)[:10])
+    return conditions, parameters
+
+def _grade(grade):
+    try:
+        return int(grade)
+    except (TypeError, ValueError):
+        return None
+
+def athlete_bests(athlete_id, result_rows):
+    """
+    Works out one athlete's leaderboard entries: their best mark in each event for every season they raced
+    and all-time, both overall and in each grade they raced in.
+
+    Inputs: athlete_id, result_rows (the rows ResultsStore.ingest saves: result_id, athlete_id, event_id,
+            meet_id, mark, value, date, season, indoor, grade)
+
+    Returns: a list of (event_id, season, grade, athlete_id, value, mark, meet_id, date) tuples, with ALL (0)
+             as the season of all-time bests and the grade of bests from every grade
+    """
+    bests = {}
+    for result_id, _, event_id, meet_id, mark, value, date, season, indoor, grade in result_rows:
+        if value is None:
+            continue
+        lower = event_registry.lower_is_better(event_id)
+        for board in {(event_id, season or ALL, grade or ALL), (event_id, season or ALL, ALL),
+                      (event_id, ALL, grade or ALL), (event_id, ALL, ALL)}:
+            best = bests.get(board)
+            #on a tie the earlier mark stays
+            if best is None or (value < best[0] if lower else value > best[0]) \
+                    or (value == best[0] and (date or "") < (best[3] or "")):
+                bests[board] = (value, mark, meet_id, date)
+    return [board + (int(athlete_id),) + best for board, best in bests.items()]
+
+
+class ResultsStore:
+    """
+    The whole team's races in one SQLite database, so questions about the team (the 10 fastest 1600s this
+    season, everyone's races at one meet) are an indexed query instead of loading every athlete's json.
+
+    Tables: athletes, meets, events and results. Each result also keeps its meet's date, season and
+    whether it was indoors, and its mark as a number (seconds for races, meters for jumps and throws, NULL for
+    DNS, DNF, FOUL...), so the common queries never need a join to filter. Indexed on (event_id, value),
+    (athlete_id, date) and meet_id.
+
+    The leaderboards live in the bests table: each athlete's best mark in every event for each season (and
+    all-time), overall and by grade. They are updated with the athlete's races on every ingest, so reading the
+    top K of a leaderboard walks K rows of the bests_board index however big the team or its history is.
+
+    Ingesting an athlete again updates their rows in place (and removes races that are gone from their
+    json). An athlete whose json hash hasn't changed since the last ingest is skipped.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Opens (or makes) the database at path. Use ":memory:" for one that only lives in memory.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode = WAL")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.connection.executescript("DROP TABLE IF EXISTS bests; DROP TABLE IF EXISTS results; "
+                                          "DROP TABLE IF EXISTS meets; "
+                                          "DROP TABLE IF EXISTS events; DROP TABLE IF EXISTS athletes;")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def source_hash(self, athlete_id):
+        """
+        Returns: the hash of the json an athlete was last ingested from, or None if they haven't been
+        """
+        row = self.connection.execute("SELECT source_hash FROM athletes WHERE athlete_id = ?",
+                                      (int(athlete_id),)).fetchone()
+        return row[0] if row else None
+
+    def add_events(self, events):
+        """
+        Saves the names of events.
+
+        Input: events (list of (EventID, report name, graph title) tuples like track.REPORT_EVENTS)
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO events (event_id, name, title) VALUES (?, ?, ?) "
+                "ON CONFLICT(event_id) DO UPDATE SET name = excluded.name, title = excluded.title",
+                [(event[0], event[1], event[2]) for event in events])
+
+    def ingest(self, athlete_id, name, meets, results, source_hash=None, replace=True):
+        """
+        Saves (or updates) one athlete's meets and races in one transaction.
+
+        Inputs:
+        athlete_id, name - who the races belong to
+        meets - list of (meet id, meet name, date 'YYYY-MM-DD') tuples
+        results - list of (IDResult, EventID, meet id, mark as written, value from
+                  event_registry.parse_mark or None if it isn't a mark, grade or None) tuples
+        source_hash - hash of the json they came from (skips the next ingest if it hasn't changed)
+        replace - the races are all of the athlete's races (from their json), so any saved race that isn't one
+                  of them is removed. False only adds and updates races (i.e. from one meet's results page)
+                  and leaves the athlete's source hash and name alone (the name on a meet page is only filled in
+                  for an athlete that isn't saved yet or has no name).
+
+        Returns: the number of races saved
+        """
+        athlete_id = int(athlete_id)
+        meet_rows = []
+        meet_info = {}
+        for meet_id, meet_name, date in meets:
+            date = (date or "")[:10] or None
+            season = meet_catalog.season_of(date)
+            indoor = None if date is None else int(int(date[5:7]) in meet_catalog.INDOOR_MONTHS)
+            meet_rows.append((meet_id, meet_name, date, season, indoor))
+            meet_info[meet_id] = (date, season, indoor)
+        result_rows = []
+        for result_id, event_id, meet_id, mark, value, grade in results:
+            date, season, indoor = meet_info.get(meet_id, (None, None, None))
+            result_rows.append((result_id, athlete_id, event_id, meet_id, mark, value, date, season, indoor,
+                                _grade(grade)))
+        saved = len(result_rows)
+
+        with self.connection:
+            if replace:
+                self.connection.execute(
+                    "INSERT INTO athletes (athlete_id, name, source_hash, ingested_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(athlete_id) DO UPDATE SET name = excluded.name, source_hash = excluded.source_hash, "
+                    "ingested_at = excluded.ingested_at",
+                    (athlete_id, name, source_hash, time.time()))
+            else:
+                #the roster's spelling of the name wins over the meet page's
+                self.connection.execute(
+                    "INSERT INTO athletes (athlete_id, name, source_hash, ingested_at) VALUES (?, ?, NULL, ?) "
+                    "ON CONFLICT(athlete_id) DO UPDATE SET name = COALESCE(athletes.name, excluded.name)",
+                    (athlete_id, name, time.time()))
+            #a meet that is already saved keeps its name and date if these don't have them
+            self.connection.executemany(
+                "INSERT INTO meets (meet_id, name, date, season, indoor) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(meet_id) DO UPDATE SET name = COALESCE(excluded.name, meets.name), "
+                "date = COALESCE(excluded.date, meets.date), season = COALESCE(excluded.season, meets.season), "
+                "indoor = COALESCE(excluded.indoor, meets.indoor)",
+                meet_rows)
+            if replace:
+                #races without an athletic.net id can't be matched up with last time, so they are replaced
+                self.connection.execute("DELETE FROM results WHERE athlete_id = ? AND result_id IS NULL", (athlete_id,))
+                self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS keep_results (result_id INTEGER PRIMARY KEY)")
+                self.connection.execute("DELETE FROM keep_results")
+                self.connection.executemany("INSERT OR IGNORE INTO keep_results VALUES (?)",
+                                            [(row[0],) for row in result_rows if row[0] is not None])
+                self.connection.execute("DELETE FROM results WHERE athlete_id = ? AND result_id IS NOT NULL "
+                                        "AND result_id NOT IN (SELECT result_id FROM keep_results)", (athlete_id,))
+            self.connection.executemany(
+                "INSERT INTO results (result_id, athlete_id, event_id, meet_id, mark, value, date, season, indoor, grade) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(athlete_id, result_id) DO UPDATE SET event_id = excluded.event_id, "
+                "meet_id = excluded.meet_id, mark = excluded.mark, value = excluded.value, date = excluded.date, "
+                "season = excluded.season, indoor = excluded.indoor, grade = excluded.grade",
+                result_rows)
+            if not replace:
+                #the leaderboards need every race the athlete has, not just these
+                result_rows = self.connection.execute(
+                    "SELECT result_id, athlete_id, event_id, meet_id, mark, value, date, season, indoor, grade "
+                    "FROM results WHERE athlete_id = ?", (athlete_id,)).fetchall()
+            self.connection.execute("DELETE FROM bests WHERE athlete_id = ?", (athlete_id,))
+            self.connection.executemany(
+                "INSERT INTO bests (event_id, season, grade, athlete_id, value, mark, meet_id, date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                athlete_bests(athlete_id, result_rows))
+        return saved
+
+    def athlete(self, athlete_id):
+        """
+        Builds an athlete dictionary from the database in the same shape track.load_athlete gives (the meets,
+        meet table and event index filled in), so all of the get_ functions and fastest work on it as they are.
+
+        Returns: the athlete dictionary, or None if the athlete hasn't been ingested
+        """
+        athlete_id = int(athlete_id)
+        if self.connection.execute("SELECT 1 FROM athletes WHERE athlete_id = ?", (athlete_id,)).fetchone() is None:
+            return None
+        meets = {}
+        meet_table = {}
+        for meet_id, name, date, season in self.connection.execute(
+                "SELECT meet_id, name, date, season FROM meets WHERE meet_id IN "
+                "(SELECT DISTINCT meet_id FROM results WHERE athlete_id = ?)", (athlete_id,)):
+            meets[str(meet_id)] = {"IDMeet": meet_id, "MeetName": name, "EndDate": date}
+            meet_table[meet_id] = {"name": name, "date": date or "", "season": "" if season is None else str(season)}
+        index = {}
+        for event_id, mark, meet_id in self.connection.execute(
+                "SELECT event_id, mark, meet_id FROM results WHERE athlete_id = ? ORDER BY date, id", (athlete_id,)):
+            index.setdefault(event_id, []).append((mark, meet_id))
+        return {"meets": meets, "_meet_table": meet_table, "_event_index": index}
+
+    def event_results(self, athlete_id, event_id, seasons=None, part=None, start=None, end=None):
+        """
+        Gets one athlete's races in one event (the same records catalog.join gives), straight from the database.
+
+        Inputs: athlete_id, event_id, and a meet_catalog style query
+
+        Returns: A list of tuples of (race time, meet name, meet date), in date order.
+        """
+        conditions, parameters = _query_filters(seasons, part, start, end)
+        where = "".join(" AND " + condition for condition in conditions)
+        return self.connection.execute(
+            "SELECT results.mark, meets.name, results.date FROM results LEFT JOIN meets USING (meet_id) "
+            f"WHERE results.athlete_id = ? AND results.event_id = ?{where} ORDER BY results.date, results.id",
+            [int(athlete_id), event_id] + parameters).fetchall()
+
+    def meet_marks(self, athlete_id, meet_id):
+        """
+        Gets what is already saved for one athlete at one meet, so marks read from somewhere else (i.e. a meet
+        results page) can be matched up with them instead of being saved twice.
+
+        Returns: a list of tuples of (IDResult, EventID, mark, value)
+        """
+        return self.connection.execute(
+            "SELECT result_id, event_id, mark, value FROM results WHERE athlete_id = ? AND meet_id = ? ORDER BY id",
+            (int(athlete_id), meet_id)).fetchall()
+
+    def top_times(self, event_id, limit=10, seasons=None, part=None, start=None, end=None, best_per_athlete=False):
+        """
+        The best marks on the team in one event (fastest times, or longest/highest for field events). Walks the
+        (event_id, value) index from the best mark and stops after limit matches, so it doesn't matter how many
+        races are in the database. With best_per_athlete each athlete's races in the event are ranked with
+        ROW_NUMBER() and only their first (best, earliest if tied) is kept, so the mark, meet and date always
+        come from the same race.
+
+        Inputs:
+        event_id - athletic.net EventID
+        limit - how many marks to give back
+        seasons, part, start, end - a meet_catalog style query (see MeetCatalog.select)
+        best_per_athlete - only each athlete's best mark instead of every mark
+
+        Returns: a list of tuples of (athlete name, mark, value, meet name, meet date), best first
+        """
+        conditions, parameters = _query_filters(seasons, part, start, end)
+        where = "".join(" AND " + condition for condition in conditions)
+        order = "ASC" if event_registry.lower_is_better(event_id) else "DESC"
+        if best_per_athlete:
+            sql = ("WITH ranked AS (SELECT results.athlete_id, results.mark, results.value, results.meet_id, "
+                   "results.date, ROW_NUMBER() OVER (PARTITION BY results.athlete_id "
+                   f"ORDER BY results.value {order}, results.date, results.id) AS place "
+                   f"FROM results WHERE results.event_id = ? AND results.value IS NOT NULL{where}) "
+                   "SELECT athletes.name, ranked.mark, ranked.value, meets.name, ranked.date "
+                   "FROM ranked JOIN athletes USING (athlete_id) LEFT JOIN meets USING (meet_id) "
+                   f"WHERE ranked.place = 1 ORDER BY ranked.value {order}, ranked.date LIMIT ?")
+        else:
+            sql = ("SELECT athletes.name, results.mark, results.value, meets.name, results.date "
+                   "FROM results JOIN athletes USING (athlete_id) LEFT JOIN meets USING (meet_id) "
+                   f"WHERE results.event_id = ? AND results.value IS NOT NULL{where} "
+                   f"ORDER BY results.value {order} LIMIT ?")
+        return self.connection.execute(sql, [event_id] + parameters + [limit]).fetchall()
+
+    def fastest(self, athlete_id, event_id, seasons=None, part=None, start=None, end=None):
+        """
+        One athlete's best mark in one event, the same thing track.fastest gives but answered by the database.
+
+        Returns: a tuple of (mark, meet name, meet date), or None if they have no marks
+        """
+        conditions, parameters = _query_filters(seasons, part, start, end)
+        where = "".join(" AND " + condition for condition in conditions)
+        order = "ASC" if event_registry.lower_is_better(event_id) else "DESC"
+        return self.connection.execute(
+            "SELECT results.mark, meets.name, results.date FROM results LEFT JOIN meets USING (meet_id) "
+            f"WHERE results.athlete_id = ? AND results.event_id = ? AND results.value IS NOT NULL{where} "
+            f"ORDER BY results.value {order}, results.date LIMIT 1",
+            [int(athlete_id), event_id] + parameters).fetchone()
+
+    def leaderboard(self, event_id, season=None, grade=None, limit=10):
+        """
+        The top of one leaderboard: one best mark per athlete, best first (fastest, or longest/highest for field
+        events). Only limit rows of the bests_board index are read.
+
+        Inputs:
+        event_id - athletic.net EventID
+        season - a season (i.e. 2022) or None for all-time bests
+        grade - only marks made in that grade (9-12), or None for every grade
+        limit - how many athletes to give back
+
+        Returns: a list of tuples of (athlete name, mark, value, meet name, meet date), best first
+        """
+        order = "ASC" if event_registry.lower_is_better(event_id) else "DESC"
+        return self.connection.execute(
+            "SELECT athletes.name, bests.mark, bests.value, meets.name, bests.date "
+            "FROM bests JOIN athletes USING (athlete_id) LEFT JOIN meets USING (meet_id) "
+            "WHERE bests.event_id = ? AND bests.season = ? AND bests.grade = ? "
+            f"ORDER BY bests.value {order} LIMIT ?",
+            (event_id, int(season or ALL), int(grade or ALL), limit)).fetchall()
+
+    def latest_season(self):
+        """
+        Returns: the most recent season anyone on the team has a race in, or None if the database is empty
+        """
+        return self.connection.execute("SELECT MAX(season) FROM results").fetchone()[0]
@@ -0,0 +1,216 @@
+import sys
+import json
+import time
+import random
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from athletic_client import AthleticNetClient
+from bio_cache import BioCache, DEFAULT_TTL
+
+#http status codes that are worth trying again (rate limited or the server having a bad moment)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class HostRateLimiter:
+    """
+    Keeps requests to the same host spaced out so a big sync doesn't hammer athletic.net.
+    Every worker thread asks the limiter before it sends a request, and the limiter hands out
+    time slots per host that are at least 1/per_second seconds apart.
+    """
+
+    def __init__(self, per_second=4.0):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """
+        Blocks until the host of the url is allowed another request.
+
+        Input: url (string)
+        """
+        if not self.interval:
+            return
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_roster(filepath):
+    """
+    Reads a roster file. Either a json file in the same shape as athlete_info in track.py
+    ([{"David Whitaker": "15714155"}, ...] or one {"name": "id", ...} dictionary), or a plain
+    text file with one "name,id" per line.
+
+    Input: filepath (string)
+
+    Returns: a list of (athlete name, athlete id) tuples
+    """
+    with open(filepath, 'r', encoding='utf-8') as file_obj:
+        text = file_obj.read()
+    if filepath.endswith(".json"):
+        return roster_pairs(json.loads(text))
+    roster = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            name, athlete_id = line.rsplit(",", 1)
+            roster.append((name.strip(), athlete_id.strip()))
+    return roster
+
+def roster_pairs(athlete_info):
+    """
+    Flattens a roster in the athlete_info shape (a list of one-key dictionaries, or a dictionary)
+    into a list of (athlete name, athlete id) tuples.
+    """
+    if isinstance(athlete_info, dict):
+        return [(name, str(athlete_id)) for name, athlete_id in athlete_info.items()]
+    pairs = []
+    for entry in athlete_info:
+        if isinstance(entry, dict):
+            pairs.extend((name, str(athlete_id)) for name, athlete_id in entry.items())
+        else:
+            pairs.append((entry[0], str(entry[1])))
+    return pairs
+
+def fetch_with_retry(client, url, limiter=None, retries=3, backoff=0.5, headers=None):
+    """
+    Downloads one url with the shared client, trying again with exponential backoff (backoff, 2*backoff,
+    4*backoff... plus a little jitter) when the connection fails or the server answers 429/5xx.
+    A Retry-After header from the server is respected if it asks for a longer wait.
+
+    Inputs: client (an AthleticNetClient), url, limiter (a HostRateLimiter or None),
+            retries (extra attempts after the first), backoff (seconds before the first retry),
+            headers (extra request headers, i.e. the conditional GET headers from the cache)
+
+    Returns: a tuple of (the athletic_client.Response, number of attempts it took)
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if limiter is not None:
+            limiter.wait(url)
+        wait = backoff * (2 ** (attempt - 1))
+        try:
+            return client.get(url, headers), attempt
+        except urllib.error.HTTPError as inst:
+            if inst.code not in RETRY_STATUS or attempt > retries:
+                raise
+            retry_after = inst.headers.get("Retry-After") if inst.headers else None
+            if retry_after and retry_after.isdigit():
+                wait = max(wait, float(retry_after))
+        except (OSError, http.client.HTTPException):
+            if attempt > retries:
+                raise
+        time.sleep(wait + random.uniform(0, wait / 4))
+
+def sync_roster(roster, directory=".", workers=8, per_host_rate=4.0, retries=3, backoff=0.5,
+                force=False, base_url=None, client=None, timeout=30, progress=True, ttl=DEFAULT_TTL, limiter=None):
+    """
+    Downloads the bio data of every athlete on a roster at the same time using a bounded pool of
+    worker threads. Requests to the same host are rate limited and failures are retried with backoff.
+    Files go through a BioCache: athletes fetched within the ttl are skipped (unless force is True) and
+    older ones are revalidated with a conditional GET, so athletes that haven't changed cost a 304.
+
+    Inputs:
+    roster - athlete_info style list/dict or a list of (name, id) tuples
+    directory - where the json files are saved
+    workers - the most downloads running at once
+    per_host_rate - the most requests per second to one host (0 turns the limit off)
+    retries, backoff - passed on to fetch_with_retry
+    force - revalidate every athlete, even ones fetched within the ttl
+    ttl - seconds a downloaded athlete counts as fresh
+    base_url, timeout - used to make an AthleticNetClient when one isn't passed in
+    client - an AthleticNetClient to share (its pooled connections are reused across athletes)
+    progress - print a line as each athlete finishes
+    limiter - a HostRateLimiter to share with other requests (one is made from per_host_rate if not given)
+
+    Returns:
+    a dictionary summary with lists of "downloaded", "not_modified", "skipped" and "failed" names (failed is a dict of
+    name -> error message), plus the total "attempts", "bytes" (decompressed), "wire_bytes" (what came over
+    the network) and wall "seconds"
+    """
+    pairs = roster_pairs(roster)
+    limiter = limiter or HostRateLimiter(per_host_rate)
+    own_client = client is None
+    if own_client:
+        client = AthleticNetClient(base_url, timeout=timeout, max_connections=workers)
+    wire_start = client.stats()["bytes_received"]
+    cache = BioCache(directory, ttl, client)
+    summary = {"downloaded": [], "not_modified": [], "skipped": [], "failed": {}, "attempts": 0, "bytes": 0,
+               "wire_bytes": 0, "seconds": 0.0}
+    start = time.perf_counter()
+
+    def download(name, athlete_id):
+        counts = {"attempts": 0, "bytes": 0}
+
+        def fetch(url, headers):
+            response, attempts = fetch_with_retry(client, url, limiter, retries, backoff, headers)
+            counts["attempts"] += attempts
+            counts["bytes"] += len(response.body)
+            return response
+
+        outcome = cache.refresh(name, athlete_id, fetch)
+        return outcome, counts["bytes"], counts["attempts"]
+
+    todo = []
+    for name, athlete_id in pairs:
+        if not force and cache.is_fresh(name):
+            summary["skipped"].append(name)
+        else:
+            todo.append((name, athlete_id))
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as pool:
+            futures = {pool.submit(download, name, athlete_id): name for name, athlete_id in todo}
+            done = 0
+            for future in as_completed(futures):
+                name = futures[future]
+                done += 1
+                try:
+                    outcome, size, attempts = future.result()
+                except Exception as inst:
+                    summary["failed"][name] = str(inst)
+                    if progress:
+                        print(f"[{done}/{len(todo)}] {name} failed: {inst}")
+                    continue
+                summary[outcome].append(name)
+                summary["attempts"] += attempts
+                summary["bytes"] += size
+                if progress:
+                    label = "downloaded" if outcome == "downloaded" else "not modified"
+                    print(f"[{done}/{len(todo)}] {name} {label} ({size} bytes, {attempts} attempt(s))")
+
+    summary["seconds"] = time.perf_counter() - start
+    summary["wire_bytes"] = client.stats()["bytes_received"] - wire_start
+    if own_client:
+        client.close()
+    return summary
+
+def print_summary(summary):
+    """
+    Prints the summary dictionary from sync_roster in a readable way.
+    """
+    print(f"Downloaded {len(summary['downloaded'])}, not modified {len(summary['not_modified'])}, "
+          f"skipped {len(summary['skipped'])} (still fresh), "
+          f"failed {len(summary['failed'])} in {summary['seconds']:.2f}s "
+          f"({summary['bytes']} bytes, {summary['wire_bytes']} over the network, {summary['attempts']} requests)")
+    for name, error in summary["failed"].items():
+        print(f"  {name}: {error}")
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python roster_sync.py ROSTER_FILE [DIRECTORY]")
+        return
+    directory = sys.argv[2] if len(sys.argv) > 2 else "."
+    print_summary(sync_roster(read_roster(sys.argv[1]), directory))
+
+if __name__ == "__main__":
+    main()
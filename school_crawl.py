@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import datetime
+import argparse
+from athletic_client import AthleticNetClient
+import roster_sync
+
+#the school the programs were built for (Northville HS)
+DEFAULT_SCHOOL_ID = "12811"
+#how many seasons back a crawl looks when it isn't told which seasons to use
+DEFAULT_SEASONS = 4
+#how many athletes are downloaded between saves of the crawl, so a stopped crawl loses at most this many
+BATCH_SIZE = 25
+
+
+def season_range(seasons=None):
+    """
+    Turns a season or range of seasons into a list of years.
+
+    Input: seasons ("2022", "2019-2024", a (first, last) pair, or None for the last DEFAULT_SEASONS seasons)
+
+    Returns: a list of years, oldest first
+    Raises: ValueError if the seasons can't be understood
+    """
+    if seasons is None:
+        latest = datetime.date.today().year
+        return list(range(latest - DEFAULT_SEASONS + 1, latest + 1))
+    if isinstance(seasons, str):
+        first, _, last = seasons.strip().partition("-")
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError(f"Can't understand the seasons {seasons!r}, expected i.e. 2022 or 2019-2024")
+        seasons = (int(first), int(last or first))
+    first, last = int(seasons[0]), int(seasons[1])
+    return list(range(min(first, last), max(first, last) + 1))
+
+def parse_roster(payload):
+    """
+    Reads the athletes out of a roster answer. Takes a list of athletes or a dictionary with an "athletes"
+    list, with the id in "ID", "IDAthlete" or "AthleteID" and the name in "Name" or "FirstName"/"LastName".
+
+    Input: payload (the decoded json)
+
+    Returns: a list of (athlete id as a string, name) tuples
+    """
+    if isinstance(payload, dict):
+        payload = payload.get("athletes") or payload.get("Athletes") or []
+    athletes = []
+    for entry in payload:
+        athlete_id = entry.get("ID") or entry.get("IDAthlete") or entry.get("AthleteID")
+        name = entry.get("Name") or " ".join(part for part in (entry.get("FirstName"), entry.get("LastName")) if part)
+        if athlete_id and name:
+            athletes.append((str(athlete_id), name.strip()))
+    return athletes
+
+
+class CrawlState:
+    """
+    What a crawl of one school has found and downloaded so far, saved as school_<id>.crawl.json in the
+    crawl's folder after every season and every batch of downloads. A crawl that is stopped (or fails)
+    picks up from here the next time: finished seasons aren't asked for again (except the latest, which
+    can still get new athletes) and athletes that were already downloaded are skipped.
+
+    The roster itself is also saved as school_<id>.roster.json in the athlete_info shape, so it can be
+    handed straight to track.py along with the crawl's folder, where the athletes' json files are
+    (python track.py reports schools/school_12811/school_12811.roster.json --data-dir schools/school_12811).
+    """
+
+    def __init__(self, school_id, directory="."):
+        self.school_id = str(school_id)
+        self.directory = directory
+        self.path = os.path.join(directory, f"school_{self.school_id}.crawl.json")
+        self.roster_path = os.path.join(directory, f"school_{self.school_id}.roster.json")
+        #season -> how many athletes it had, athlete id -> {"name", "listed", "seasons", "fetched"}
+        self.seasons = {}
+        self.athletes = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file_obj:
+                saved = json.load(file_obj)
+        except (OSError, ValueError):
+            saved = {}
+        if saved.get("school_id") == self.school_id:
+            self.seasons = saved.get("seasons", {})
+            self.athletes = saved.get("athletes", {})
+        #crawls saved before names were kept give namesakes their id, the way their files were named then
+        names = {}
+        for entry in self.athletes.values():
+            names[entry["name"]] = names.get(entry["name"], 0) + 1
+        for athlete_id, entry in self.athletes.items():
+            entry.setdefault("listed", entry["name"] if names[entry["name"]] == 1 else f"{entry['name']} ({athlete_id})")
+        self._listed = {entry["listed"] for entry in self.athletes.values()}
+
+    def add_season(self, season, athletes):
+        """
+        Records one season's roster.
+
+        Inputs: season, athletes (list of (athlete id, name) tuples from parse_roster)
+
+        Returns: the number of athletes that weren't known before
+        """
+        new = 0
+        for athlete_id, name in athletes:
+            entry = self.athletes.get(athlete_id)
+            if entry is None:
+                #the name an athlete is listed (and their file saved) under never changes once it is given out,
+                #so a namesake found later gets their id added instead of renaming someone already downloaded
+                listed = name if name not in self._listed else f"{name} ({athlete_id})"
+                self._listed.add(listed)
+                entry = self.athletes[athlete_id] = {"name": name, "listed": listed, "seasons": [], "fetched": None}
+                new += 1
+            if int(season) not in entry["seasons"]:
+                entry["seasons"].append(int(season))
+                entry["seasons"].sort()
+        self.seasons[str(season)] = len(athletes)
+        return new
+
+    def roster(self):
+        """
+        Returns: the roster as a list of (name, athlete id) tuples. The downloaded files are named after the
+                 athlete, so an athlete who shares the name of someone found before them has their id added to it.
+        """
+        return [(entry["listed"], athlete_id)
+                for athlete_id, entry in sorted(self.athletes.items(), key=lambda item: item[1]["listed"])]
+
+    def save(self):
+        """
+        Writes the crawl state and the roster file (both are replaced in one step, never half written).
+        """
+        os.makedirs(self.directory or ".", exist_ok=True)
+        state = {"school_id": self.school_id, "seasons": self.seasons, "athletes": self.athletes}
+        roster = [{name: athlete_id} for name, athlete_id in self.roster()]
+        for path, data in ((self.path, state), (self.roster_path, roster)):
+            temp_path = path + ".part"
+            with open(temp_path, "w", encoding="utf-8") as f_out:
+                json.dump(data, f_out, indent=1)
+            os.replace(temp_path, path)
+
+
+def crawl_school(school_id=DEFAULT_SCHOOL_ID, seasons=None, directory=".", workers=4, per_host_rate=2.0, retries=3,
+                 backoff=0.5, force=False, base_url=None, client=None, batch_size=BATCH_SIZE, progress=True):
+    """
+    Finds every athlete who was on a school's track team in the given seasons and downloads their bio data.
+    The rosters are asked for one season at a time, then the athletes are downloaded a batch at a time with
+    roster_sync.sync_roster (a bounded pool of workers, retries with backoff, Retry-After respected). All
+    requests, rosters and athletes, share one HostRateLimiter, so a crawl never sends more than per_host_rate
+    requests a second to a host. Progress is saved after every season and batch (see CrawlState).
+
+    Inputs:
+    school_id - the athletic.net SchoolID
+    seasons - the seasons to look at (see season_range)
+    directory - where the athletes' json files and the crawl/roster files go
+    workers - the most downloads running at once
+    per_host_rate - the most requests per second to one host
+    retries, backoff - passed on to roster_sync.fetch_with_retry
+    force - ask for every season and download every athlete again
+    base_url, client - where to download from (see AthleticNetClient), i.e. a stand-in from athletic_standin.py
+    batch_size - athletes downloaded between saves
+    progress - print a line as each season and batch finishes
+
+    Returns: a dictionary summary with the "school_id", the number of athletes "discovered" (in total) and
+    "new" (this run), lists of "fetched" and "failed" seasons/athletes, how many were "skipped" and the
+    wall "seconds"
+    """
+    years = season_range(seasons)
+    state = CrawlState(school_id, directory)
+    limiter = roster_sync.HostRateLimiter(per_host_rate)
+    own_client = client is None
+    if own_client:
+        client = AthleticNetClient(base_url, max_connections=workers)
+    summary = {"school_id": str(school_id), "discovered": 0, "new": 0, "fetched": [], "failed": {}, "skipped": 0,
+               "seconds": 0.0}
+    start = time.perf_counter()
+    try:
+        for season in years:
+            if not force and str(season) in state.seasons and season != years[-1]:
+                continue
+            try:
+                response, attempts = roster_sync.fetch_with_retry(client, client.roster_url(school_id, season), limiter,
+                                                                  retries, backoff)
+                athletes = parse_roster(response.json())
+            except Exception as inst:
+                summary["failed"][f"season {season}"] = str(inst)
+                if progress:
+                    print(f"School {school_id} season {season} failed: {inst}")
+                continue
+            new = state.add_season(season, athletes)
+            summary["new"] += new
+            state.save()
+            if progress:
+                print(f"School {school_id} season {season}: {len(athletes)} athletes ({new} new)")
+
+        todo = [(name, athlete_id) for name, athlete_id in state.roster()
+                if force or not state.athletes[athlete_id]["fetched"]]
+        summary["skipped"] = len(state.athletes) - len(todo)
+        for first in range(0, len(todo), batch_size):
+            batch = todo[first:first + batch_size]
+            result = roster_sync.sync_roster(batch, directory, workers, retries=retries, backoff=backoff, force=force,
+                                             client=client, progress=False, limiter=limiter)
+            ids = dict(batch)
+            for name in result["downloaded"] + result["not_modified"] + result["skipped"]:
+                state.athletes[ids[name]]["fetched"] = time.time()
+                summary["fetched"].append(name)
+            summary["failed"].update(result["failed"])
+            state.save()
+            if progress:
+                print(f"School {school_id}: {min(first + batch_size, len(todo))}/{len(todo)} athletes "
+                      f"({len(result['failed'])} failed in this batch)")
+    finally:
+        if own_client:
+            client.close()
+    summary["discovered"] = len(state.athletes)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+def crawl_schools(school_ids, seasons=None, directory=".", workers=4, per_host_rate=2.0, base_url=None, force=False,
+                  progress=True):
+    """
+    Crawls several schools one after another (see crawl_school), each into its own folder under directory,
+    sharing one client.
+
+    Returns: a list of the summaries from crawl_school
+    """
+    summaries = []
+    with AthleticNetClient(base_url, max_connections=workers) as client:
+        for school_id in school_ids:
+            summaries.append(crawl_school(school_id, seasons, os.path.join(directory, f"school_{school_id}"), workers,
+                                          per_host_rate, force=force, client=client, progress=progress))
+    return summaries
+
+def print_summary(summary):
+    """
+    Prints the summary dictionary from crawl_school in a readable way.
+    """
+    print(f"School {summary['school_id']}: {summary['discovered']} athletes ({summary['new']} new), "
+          f"downloaded {len(summary['fetched'])}, skipped {summary['skipped']} (already downloaded), "
+          f"failed {len(summary['failed'])} in {summary['seconds']:.2f}s")
+    for name, error in summary["failed"].items():
+        print(f"  {name}: {error}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find and download every athlete on a school's track team.")
+    parser.add_argument("schools", nargs="*", default=[DEFAULT_SCHOOL_ID], metavar="SCHOOL_ID",
+                        help=f"athletic.net SchoolIDs (default {DEFAULT_SCHOOL_ID})")
+    parser.add_argument("--seasons", default=None, help=f"i.e. 2022 or 2019-2024 (default the last {DEFAULT_SEASONS})")
+    parser.add_argument("--dir", default="schools", help="where each school's folder goes (default schools)")
+    parser.add_argument("--workers", type=int, default=4, help="the most downloads at once (default 4)")
+    parser.add_argument("--rate", type=float, default=2.0, help="the most requests a second to one host (default 2)")
+    parser.add_argument("--base-url", metavar="URL", help="download from URL instead of athletic.net")
+    parser.add_argument("--force", action="store_true", help="ask for every season and athlete again")
+    args = parser.parse_args(argv)
+    try:
+        season_range(args.seasons)
+    except ValueError as inst:
+        parser.error(str(inst))
+    summaries = crawl_schools(args.schools, args.seasons, args.dir, args.workers, args.rate, args.base_url, args.force)
+    for summary in summaries:
+        print_summary(summary)
+    return 1 if any(summary["failed"] for summary in summaries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
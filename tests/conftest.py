@@ -0,0 +1,21 @@
+import os.path
+import sys
+import pytest
+
+#the programs are plain modules in the folder above, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import athletic_standin
+
+
+@pytest.fixture
+def standin():
+    """
+    A stand-in athletic.net on a free port, with made up athletes, rosters and meet pages.
+
+    Returns: a tuple of (the StandIn, the bio data url up to the athlete id)
+    """
+    server, url = athletic_standin.start(athletic_standin.StandIn(synthetic_results=60, roster_size=8, meet_size=6))
+    yield server.standin, url
+    server.shutdown()
+    server.server_close()
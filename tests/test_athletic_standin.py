@@ -0,0 +1,87 @@
+import json
+import urllib.error
+import pytest
+import athletic_client
+import athletic_standin
+from athletic_client import AthleticNetClient
+from athletic_standin import StandIn
+
+
+@pytest.fixture
+def serve():
+    """
+    Starts stand-ins for a test and stops them after it.
+
+    Returns: a function StandIn -> (the StandIn, the bio data url up to the athlete id)
+    """
+    servers = []
+
+    def start(standin):
+        server, url = athletic_standin.start(standin)
+        servers.append(server)
+        return server.standin, url
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fixtures_are_replayed(tmp_path, serve):
+    bio = {"athlete": {"IDAthlete": 42}, "resultsTF": [{"IDResult": 1, "EventID": 4, "Result": "2:01.00"}], "meets": {}}
+    (tmp_path / "42.json").write_text(json.dumps(bio), encoding="utf-8")
+    standin, url = serve(StandIn(fixtures=str(tmp_path)))
+    with AthleticNetClient(base_url=url) as client:
+        response = client.get(client.bio_url(42))
+        assert response.status == 200
+        assert json.loads(response.body) == bio
+        with pytest.raises(urllib.error.HTTPError) as error:
+            client.get(client.bio_url(43))
+        assert error.value.code == 404
+
+def test_etag_gives_a_304_until_the_payload_changes(serve):
+    standin, url = serve(StandIn(synthetic_results=30))
+    with AthleticNetClient(base_url=url) as client:
+        first = client.get(client.bio_url(7))
+        etag = first.headers["ETag"]
+        assert client.get(client.bio_url(7), {"If-None-Match": etag}).status == 304
+        standin.set_payload(7, {"athlete": {"IDAthlete": 7}, "resultsTF": [], "meets": {}})
+        changed = client.get(client.bio_url(7), {"If-None-Match": etag})
+        assert changed.status == 200 and changed.headers["ETag"] != etag
+
+def test_synthetic_payloads_are_the_same_for_a_seed(serve):
+    bodies = []
+    for seed in (1, 1, 2):
+        standin, url = serve(StandIn(synthetic_results=30, seed=seed))
+        with AthleticNetClient(base_url=url) as client:
+            bodies.append(client.get(client.bio_url(9)).body)
+    assert bodies[0] == bodies[1] != bodies[2]
+    assert len(json.loads(bodies[0])["resultsTF"]) == 30
+
+def test_failures_depend_only_on_the_seed(serve):
+    runs = []
+    for attempt in range(2):
+        standin, url = serve(StandIn(synthetic_results=5, error_rate=0.3, throttle_rate=0.3, retry_after=2, seed=11))
+        statuses = []
+        with AthleticNetClient(base_url=url) as client:
+            for athlete_id in list(range(1, 9)) * 2:
+                try:
+                    statuses.append(client.get(client.bio_url(athlete_id)).status)
+                except urllib.error.HTTPError as error:
+                    statuses.append(error.code)
+                    if error.code == 429:
+                        assert error.headers["Retry-After"] == "2"
+        runs.append(statuses)
+    assert runs[0] == runs[1]
+    assert {200, 429, 500} <= set(runs[0])
+
+def test_made_up_rosters_turn_over_a_quarter_a_season(serve):
+    standin, url = serve(StandIn(roster_size=8))
+    host = url.split(athletic_standin.BIO_PATH)[0]
+    with AthleticNetClient(base_url=url) as client:
+        rosters = [json.loads(client.get(f"{host}{athletic_client.ROSTER_PATH}?teamId=12811&seasonId={season}").body)
+                   for season in (2022, 2023)]
+        with pytest.raises(urllib.error.HTTPError):
+            client.get(f"{host}{athletic_client.ROSTER_PATH}?teamId=12811&seasonId=soon")
+    ids = [{athlete["ID"] for athlete in roster} for roster in rosters]
+    assert len(ids[0]) == len(ids[1]) == 8
+    assert len(ids[0] & ids[1]) == 6
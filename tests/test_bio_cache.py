@@ -0,0 +1,62 @@
+import json
+import pytest
+from athletic_client import AthleticNetClient
+from bio_cache import BioCache
+
+
+@pytest.fixture
+def cache(tmp_path, standin):
+    client = AthleticNetClient(base_url=standin[1])
+    yield BioCache(str(tmp_path), ttl=3600, client=client)
+    client.close()
+
+
+def test_get_downloads_once_within_the_ttl(cache, standin):
+    filename = cache.get("Runner One", 1)
+    with open(filename, encoding="utf-8") as file_obj:
+        assert json.load(file_obj)["athlete"]["IDAthlete"] == 1
+    cache.get("Runner One", 1)
+    assert standin[0].counts["200"] == 1
+    assert standin[0].counts["requests"] == 1
+    assert cache.is_fresh("Runner One")
+
+def test_stale_copy_is_revalidated_with_a_304(cache, standin):
+    cache.get("Runner One", 1)
+    meta = cache.load_meta("Runner One")
+    meta["fetched_at"] -= 7200
+    with open(cache.meta_path("Runner One"), "w", encoding="utf-8") as f_out:
+        json.dump(meta, f_out)
+    assert not cache.is_fresh("Runner One")
+
+    cache.get("Runner One", 1)
+    assert standin[0].counts["304"] == 1
+    assert standin[0].counts["200"] == 1
+    assert cache.is_fresh("Runner One")
+    assert cache.load_meta("Runner One")["sha256"] == meta["sha256"]
+
+def test_changed_payload_is_downloaded_again(cache, standin):
+    assert cache.refresh("Runner One", 1) == "downloaded"
+    assert cache.refresh("Runner One", 1) == "not_modified"
+    standin[0].set_payload(1, {"athlete": {"IDAthlete": 1}, "resultsTF": [], "meets": {}})
+    assert cache.refresh("Runner One", 1) == "downloaded"
+    with open(cache.path("Runner One"), encoding="utf-8") as file_obj:
+        assert json.load(file_obj)["resultsTF"] == []
+
+def test_file_that_does_not_match_its_size_is_not_used(cache, standin):
+    cache.get("Runner One", 1)
+    with open(cache.path("Runner One"), "a", encoding="utf-8") as file_obj:
+        file_obj.write("half a download")
+    assert cache.load_meta("Runner One") is None
+    assert not cache.has_copy("Runner One")
+    assert not cache.is_fresh("Runner One")
+
+    #without usable metadata no validators are sent, so it is a full download
+    cache.get("Runner One", 1)
+    assert standin[0].counts["200"] == 2
+    assert cache.load_meta("Runner One") is not None
+
+def test_missing_athlete_raises_without_a_copy(cache, standin):
+    standin[0].synthetic_results = None
+    with pytest.raises(Exception):
+        cache.get("Nobody", 5)
+    assert not cache.has_copy("Nobody")
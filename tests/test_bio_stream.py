@@ -0,0 +1,46 @@
+import json
+import benchmark
+from bio_stream import read_bio, iter_bio, CHUNK_SIZE
+
+
+def write_bio(tmp_path, bio, name="bio.json", **dump_options):
+    path = tmp_path / name
+    with open(path, "w", encoding="utf-8") as f_out:
+        json.dump(bio, f_out, **dump_options)
+    return str(path)
+
+
+def test_streaming_and_json_load_give_the_same_athlete(tmp_path):
+    bio = benchmark.make_bio(300, seed=3, athlete_id=7)
+    #things the programs don't use, which both ways have to drop
+    bio["athlete"]["Notes"] = 'a "quoted" \\ note with { and ] in it'
+    bio["resultsTF"][0]["Extra"] = {"nested": [1, 2, {"deep": "}"}]}
+    bio["meets"][next(iter(bio["meets"]))]["Location"] = "Northville HS"
+    path = write_bio(tmp_path, bio)
+
+    loaded = read_bio(path)
+    streamed = read_bio(path, threshold=0)
+    assert streamed == loaded
+    assert len(loaded["resultsTF"]) == 300
+    assert set(loaded["meets"]) == set(bio["meets"])
+    assert "Extra" not in loaded["resultsTF"][0]
+    assert "Location" not in next(iter(loaded["meets"].values()))
+
+def test_streaming_across_chunk_boundaries(tmp_path):
+    bio = benchmark.make_bio(2000, seed=1)
+    #pretty printed, so the whitespace, keys and numbers land on the edges of chunks in many different places
+    path = write_bio(tmp_path, bio, indent=3)
+    expected = read_bio(path)
+    for chunk_size in (7, 64, 1000, CHUNK_SIZE):
+        athlete = {"resultsTF": [], "meets": {}}
+        for section, key, record in iter_bio(path, chunk_size=chunk_size):
+            if section == "resultsTF":
+                athlete["resultsTF"].append(record)
+            else:
+                athlete["meets"][str(key)] = record
+        assert athlete == expected
+
+def test_missing_sections_come_back_empty(tmp_path):
+    path = write_bio(tmp_path, {"athlete": {"IDAthlete": 1}, "resultsTF": None})
+    assert read_bio(path) == {"resultsTF": [], "meets": {}}
+    assert read_bio(path, threshold=0) == {"resultsTF": [], "meets": {}}
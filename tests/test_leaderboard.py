@@ -0,0 +1,63 @@
+import pytest
+import event_registry
+import results_store
+
+#meet id -> (name, date)
+MEETS = {1: ("Early Invite", "2022-04-02"), 2: ("League Meet", "2022-05-14"), 3: ("Indoor Opener", "2022-12-03"),
+         4: ("Regionals", "2023-05-20")}
+
+
+def race(result_id, event_id, meet_id, mark, grade):
+    value = event_registry.parse_mark(mark, event_registry.kind(event_id))
+    return (result_id, event_id, meet_id, mark, value, grade)
+
+@pytest.fixture
+def store():
+    meets = [(meet_id, name, date) for meet_id, (name, date) in MEETS.items()]
+    with results_store.ResultsStore(":memory:") as store:
+        store.ingest(1, "Ann", meets, [race(11, 4, 1, "2:10.00", 10), race(12, 4, 2, "2:05.50", 10),
+                                       race(13, 4, 4, "2:03.00", 11), race(14, 52, 2, "DNF", 10)])
+        store.ingest(2, "Bea", meets, [race(21, 4, 1, "2:08.00", 9), race(22, 4, 3, "2:06.00", 10),
+                                       race(23, 52, 4, "5:01.00", 10)])
+        store.ingest(3, "Cat", meets, [race(31, 4, 2, "2:05.50", 12), race(32, 4, 4, "2:20.00a", 12)])
+        yield store
+
+
+def names_and_marks(rows):
+    return [(name, mark) for name, mark, value, meet, date in rows]
+
+def test_all_time_board_has_one_best_per_athlete(store):
+    assert names_and_marks(store.leaderboard(4)) == [("Ann", "2:03.00"), ("Cat", "2:05.50"), ("Bea", "2:06.00")]
+    assert names_and_marks(store.leaderboard(4, limit=2)) == [("Ann", "2:03.00"), ("Cat", "2:05.50")]
+
+def test_season_and_grade_boards(store):
+    #the December meet is in the 2023 season
+    board = names_and_marks(store.leaderboard(4, season=2022))
+    #Ann and Cat tie, in either order
+    assert sorted(board[:2]) == [("Ann", "2:05.50"), ("Cat", "2:05.50")] and board[2:] == [("Bea", "2:08.00")]
+    assert names_and_marks(store.leaderboard(4, season=2023)) == [("Ann", "2:03.00"), ("Bea", "2:06.00"), ("Cat", "2:20.00a")]
+    assert names_and_marks(store.leaderboard(4, grade=10)) == [("Ann", "2:05.50"), ("Bea", "2:06.00")]
+    assert names_and_marks(store.leaderboard(4, season=2022, grade=9)) == [("Bea", "2:08.00")]
+
+def test_marks_that_are_not_marks_stay_off(store):
+    assert names_and_marks(store.leaderboard(52)) == [("Bea", "5:01.00")]
+
+def test_board_keeps_the_meet_of_the_best_mark(store):
+    name, mark, value, meet, date = store.leaderboard(4)[0]
+    assert (meet, date) == ("Regionals", "2023-05-20")
+    assert value == pytest.approx(123.0)
+
+def test_boards_follow_a_new_ingest(store):
+    meets = [(meet_id, name, date) for meet_id, (name, date) in MEETS.items()]
+    store.ingest(3, "Cat", meets, [race(31, 4, 2, "2:05.50", 12), race(32, 4, 4, "2:01.90", 12)])
+    assert names_and_marks(store.leaderboard(4))[0] == ("Cat", "2:01.90")
+    #Ann's json no longer has her 2:03.00, so her best is what is left
+    store.ingest(1, "Ann", meets, [race(11, 4, 1, "2:10.00", 10), race(12, 4, 2, "2:05.50", 10)])
+    assert ("Ann", "2:05.50") in names_and_marks(store.leaderboard(4))
+    assert names_and_marks(store.leaderboard(4, season=2023)) == [("Cat", "2:01.90"), ("Bea", "2:06.00")]
+
+def test_meet_page_marks_add_to_the_boards(store):
+    store.ingest(2, "Bea", [(5, "Meet Page Invite", "2023-06-01")], [race(None, 4, 5, "1:59.00", 10)], replace=False)
+    assert names_and_marks(store.leaderboard(4))[0] == ("Bea", "1:59.00")
+    #the races from her json are still there
+    assert names_and_marks(store.leaderboard(52)) == [("Bea", "5:01.00")]
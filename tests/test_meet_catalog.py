@@ -0,0 +1,79 @@
+import datetime
+import numpy as np
+import pytest
+import meet_catalog
+import track
+from meet_catalog import MeetCatalog, season_of, parse_query
+
+
+@pytest.mark.parametrize("date, season", [
+    ("2023-11-02", 2024),
+    ("2023-12-31T00:00:00", 2024),
+    ("2024-01-15", 2024),
+    ("2024-06-01", 2024),
+    ("2024-10-31", 2024),
+    (datetime.date(2022, 11, 1), 2023),
+    (np.datetime64("2022-05-20"), 2022),
+    (None, None),
+    ("", None),
+    ("2024", None),
+])
+def test_season_of(date, season):
+    assert season_of(date) == season
+
+
+def make_athlete():
+    #meet id -> date, spread over the 2023 and 2024 seasons with indoor meets on both sides of new year
+    dates = {1: "2022-12-10", 2: "2023-03-01", 3: "2023-05-20", 4: "2023-11-02", 5: "2024-02-10", 6: "2024-04-27",
+             7: "2024-06-01", 8: ""}
+    return {"meets": {str(meet_id): {"IDMeet": meet_id, "MeetName": f"Meet {meet_id}", "EndDate": date}
+                      for meet_id, date in dates.items()},
+            "resultsTF": [{"EventID": 4, "Result": f"2:0{meet_id}.00", "MeetID": meet_id} for meet_id in dates]}
+
+def test_meet_table_seasons():
+    table = track.get_meet_table(make_athlete())
+    assert table[4] == {"name": "Meet 4", "date": "2023-11-02", "season": "2024"}
+    assert table[3]["season"] == "2023"
+    assert table[8]["season"] == ""
+
+def test_season_query_defaults_to_the_latest_season():
+    catalog = track.get_meet_catalog(make_athlete())
+    assert catalog.latest_season() == 2024
+    assert catalog.season_list() == [2023, 2024]
+    query = track.season_query(catalog)
+    assert query == {"seasons": [2024, 2024], "part": None, "start": None, "end": None}
+    assert [meet_id for name, meet_id, date in catalog.select_meets(**query)] == [4, 5, 6, 7]
+
+def test_season_query_keeps_a_given_query():
+    catalog = track.get_meet_catalog(make_athlete())
+    query = parse_query("2023 indoor")
+    assert track.season_query(catalog, query) is query
+    assert [meet_id for name, meet_id, date in catalog.select_meets(**query)] == [1, 2]
+
+def test_season_query_without_dated_meets():
+    catalog = MeetCatalog({})
+    assert track.season_query(catalog)["seasons"] is None
+    assert catalog.select_meets(**track.season_query(catalog)) == []
+
+def test_join_by_season_and_dates():
+    athlete = make_athlete()
+    catalog = track.get_meet_catalog(athlete)
+    races = track.get_event(athlete, 4)
+    assert [meet for time, meet, date in catalog.join(races, **parse_query("2024 outdoor"))] == ["Meet 6", "Meet 7"]
+    last_days = parse_query("last 30 days", today=datetime.date(2024, 6, 1))
+    assert catalog.join(races, **last_days) == [("2:07.00", "Meet 7", "2024-06-01")]
+    #the meet without a date never matches
+    assert len(catalog.join(races, **parse_query("all"))) == 7
+
+@pytest.mark.parametrize("text, query", [
+    ("2022", {"seasons": [2022, 2022], "part": None, "start": None, "end": None}),
+    ("2024-2021 outdoor", {"seasons": [2021, 2024], "part": "outdoor", "start": None, "end": None}),
+    ("indoor", {"seasons": None, "part": "indoor", "start": None, "end": None}),
+])
+def test_parse_query(text, query):
+    assert parse_query(text) == query
+    assert meet_catalog.describe(query)
+
+def test_parse_query_rejects_nonsense():
+    with pytest.raises(ValueError):
+        parse_query("last season")
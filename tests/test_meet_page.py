@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("lxml")
+
+import event_registry
+import results_store
+import WebScrape
+from athletic_client import AthleticNetClient
+
+
+@pytest.fixture
+def meet_page(tmp_path, standin):
+    """
+    Returns: the results page of meet 4242, downloaded from the stand-in through read_meet_page
+    """
+    client = AthleticNetClient(base_url=standin[1])
+    host = standin[1].split("/api/")[0]
+    try:
+        html = WebScrape.read_meet_page(host + "/TrackAndField/meet/4242/results", str(tmp_path), client)
+    finally:
+        client.close()
+    return html
+
+
+def test_parse_meet_page_reads_the_stand_in_page(meet_page, standin):
+    meet_results = WebScrape.parse_meet_page(meet_page)
+    meet = meet_results["meet"]
+    assert meet["IDMeet"] == 4242
+    assert meet["MeetName"] == "Stand-in Invitational 4242"
+    assert len(meet["EndDate"]) == 10 and meet["EndDate"].startswith("2024-")
+
+    rows = standin[0].meet_size
+    report_events = event_registry.report_events()
+    results = meet_results["results"]
+    assert len(results) == rows * len(report_events)
+    #the 100 isn't in the registry, so its table is counted and skipped
+    assert meet_results["skipped"]["event we don't know"] == rows
+    for event_id, name, title in report_events:
+        event_results = [result for result in results if result["EventID"] == event_id]
+        assert [result["Place"] for result in event_results] == list(range(1, rows + 1))
+        relay = event_registry.find(name)["relay"]
+        assert all((result["AthleteID"] is None) == relay for result in event_results)
+    assert all(result["MeetID"] == 4242 and result["IDResult"] for result in results)
+    assert all(9 <= result["Grade"] <= 12 for result in results)
+
+def test_read_meet_page_keeps_the_download(meet_page, tmp_path, standin):
+    host = standin[1].split("/api/")[0]
+    again = WebScrape.read_meet_page(host + "/TrackAndField/meet/4242/results", str(tmp_path))
+    assert again == meet_page
+    assert standin[0].counts["200"] == 1
+
+def test_ingest_meet_keeps_the_roster_name(meet_page):
+    meet_results = WebScrape.parse_meet_page(meet_page)
+    first = next(result for result in meet_results["results"] if result["AthleteID"] is not None)
+    with results_store.ResultsStore(":memory:") as store:
+        store.ingest(first["AthleteID"], "Roster Spelling", [], [], source_hash="abc")
+        athletes, marks, unlinked = WebScrape.ingest_meet(store, meet_results)
+        assert unlinked == sum(1 for result in meet_results["results"] if result["AthleteID"] is None)
+        assert marks == len(meet_results["results"]) - unlinked
+        assert athletes == len({result["AthleteID"] for result in meet_results["results"]} - {None})
+        assert store.connection.execute("SELECT name, source_hash FROM athletes WHERE athlete_id = ?",
+                                        (int(first["AthleteID"]),)).fetchone() == ("Roster Spelling", "abc")
+
+        #reading the same page again doesn't save anything twice
+        WebScrape.ingest_meet(store, meet_results)
+        assert store.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0] == marks
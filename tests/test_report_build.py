@@ -0,0 +1,101 @@
+import json
+import os.path
+import pytest
+import benchmark
+import report_build
+import track
+from bio_cache import BioCache
+from report_build import BuildManifest, report_inputs
+
+
+def write_report(directory, name):
+    report_build.write_atomic(os.path.join(directory, name + ".html"), "<html></html>")
+
+@pytest.fixture
+def built(tmp_path):
+    """
+    A reports folder with one report and its recorded inputs.
+
+    Returns: a tuple of (the folder, the inputs)
+    """
+    directory = str(tmp_path)
+    inputs = report_inputs("abc", [4, 52], ["800", "1600"], {"images/A800.png": None, "images/A1600.png": None})
+    write_report(directory, "A")
+    manifest = BuildManifest(directory)
+    manifest.record("A", inputs)
+    manifest.save()
+    return directory, inputs
+
+
+def test_missing_report_is_always_written(tmp_path):
+    manifest = BuildManifest(str(tmp_path))
+    for policy in report_build.POLICIES:
+        assert manifest.should_write("A", policy, None)
+
+def test_unchanged_report_is_skipped(built):
+    directory, inputs = built
+    manifest = BuildManifest(directory)
+    assert manifest.entry("A") == json.loads(json.dumps(inputs))
+    assert not manifest.should_write("A", "changed", inputs)
+    assert manifest.up_to_date("A", "abc", [4, 52])
+    assert manifest.should_write("A", "always", inputs)
+    assert not manifest.should_write("A", "never", dict(inputs, source="new"))
+
+@pytest.mark.parametrize("change", [
+    {"source": "new json"},
+    {"requested": [4]},
+    {"events": ["800"]},
+    {"charts": {"images/A800.png": "a new graph", "images/A1600.png": None}},
+    {"query": {"seasons": [2022, 2022], "part": None, "start": None, "end": None}},
+    {"template": report_build.REPORT_TEMPLATE_VERSION - 1},
+])
+def test_changed_input_rebuilds(built, change):
+    directory, inputs = built
+    manifest = BuildManifest(directory)
+    assert manifest.should_write("A", "changed", dict(inputs, **change))
+    assert manifest.should_write("A", "changed", None)
+
+def test_up_to_date_checks_before_any_work(built):
+    directory, inputs = built
+    manifest = BuildManifest(directory)
+    assert not manifest.up_to_date("A", "new json", [4, 52])
+    assert not manifest.up_to_date("A", "abc", [4])
+    assert not manifest.up_to_date("A", "abc", [4, 52], {"seasons": [2022, 2022], "part": None, "start": None, "end": None})
+    assert not manifest.up_to_date("B", "abc", [4, 52])
+    os.remove(os.path.join(directory, "A.html"))
+    assert not manifest.up_to_date("A", "abc", [4, 52])
+
+def test_unknown_policy(built):
+    with pytest.raises(ValueError):
+        BuildManifest(built[0]).should_write("A", "sometimes")
+
+def test_broken_manifest_counts_as_empty(tmp_path):
+    with open(tmp_path / report_build.MANIFEST_NAME, "w", encoding="utf-8") as f_out:
+        f_out.write("{not json")
+    write_report(str(tmp_path), "A")
+    assert BuildManifest(str(tmp_path)).entries == {}
+    assert BuildManifest(str(tmp_path)).should_write("A", "changed", report_inputs("abc", [4], ["800"], {}))
+
+
+def test_build_report_skips_until_the_json_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv("MPLBACKEND", "Agg")
+    monkeypatch.chdir(tmp_path)
+    bio = benchmark.make_bio(80, seed=2, athlete_id=3)
+    with open("RunnerThree.json", "w", encoding="utf-8") as f_out:
+        json.dump(bio, f_out)
+    cache = BioCache(".")
+    report = track.build_report("Runner Three", "3", output_directory="out", cache=cache, offline=True)
+    written = os.path.getmtime(report)
+    inputs = BuildManifest("out").entry("RunnerThree")
+    assert inputs["source"] == cache.fingerprint("Runner Three")
+
+    os.utime(report, (written - 100, written - 100))
+    track.build_report("Runner Three", "3", output_directory="out", cache=cache, offline=True)
+    assert os.path.getmtime(report) == written - 100
+
+    bio["resultsTF"].append(dict(bio["resultsTF"][0], IDResult=1, Result="1:59.00"))
+    with open("RunnerThree.json", "w", encoding="utf-8") as f_out:
+        json.dump(bio, f_out)
+    track.build_report("Runner Three", "3", output_directory="out", cache=cache, offline=True)
+    assert os.path.getmtime(report) > written - 100
+    assert BuildManifest("out").entry("RunnerThree")["source"] == cache.fingerprint("Runner Three") != inputs["source"]
@@ -0,0 +1,112 @@
+import json
+import pytest
+import benchmark
+import event_registry
+import meet_catalog
+import results_store
+import track
+from bio_cache import BioCache
+
+
+def all_races(team):
+    """
+    Every race of a made up team worked out straight from the json files, to check the database against.
+
+    Returns: a list of (athlete name, event id, mark, value, meet name, date, season, grade) tuples
+    """
+    races = []
+    for athlete_name, athlete_id, path in team:
+        with open(path, encoding="utf-8") as file_obj:
+            bio = json.load(file_obj)
+        for result in bio["resultsTF"]:
+            meet = bio["meets"][str(result["MeetID"])]
+            value = event_registry.parse_mark(result["Result"], event_registry.kind(result["EventID"]))
+            date = meet["EndDate"][:10]
+            races.append((athlete_name, result["EventID"], result["Result"], value, meet["MeetName"], date,
+                          meet_catalog.season_of(date), result["Grade"]))
+    return races
+
+@pytest.fixture
+def team(tmp_path):
+    """
+    Six made up athletes ingested into a database in tmp_path.
+
+    Returns: a tuple of (the team from benchmark.write_team, the database path, the ingest summary)
+    """
+    team = benchmark.write_team(str(tmp_path), athletes=6, results=150, seed=4)
+    db_path = str(tmp_path / "results.sqlite3")
+    summary = track.ingest_team([(name, athlete_id) for name, athlete_id, path in team], db_path,
+                                BioCache(str(tmp_path)), offline=True)
+    return team, db_path, summary
+
+
+def test_ingest_saves_every_race(team):
+    team, db_path, summary = team
+    assert sorted(summary["ingested"]) == sorted(name for name, athlete_id, path in team)
+    assert summary["races"] == 6 * 150
+    with results_store.ResultsStore(db_path) as store:
+        assert store.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 6 * 150
+        athlete = store.athlete(team[0][1])
+        with open(team[0][2], encoding="utf-8") as file_obj:
+            bio = json.load(file_obj)
+        assert sum(len(races) for races in athlete["_event_index"].values()) == len(bio["resultsTF"])
+
+def test_unchanged_json_is_skipped(team, tmp_path):
+    team, db_path, summary = team
+    again = track.ingest_team([(name, athlete_id) for name, athlete_id, path in team], db_path,
+                              BioCache(str(tmp_path)), offline=True)
+    assert again["ingested"] == [] and len(again["unchanged"]) == 6
+
+def test_reingest_drops_races_that_are_gone(team):
+    team, db_path, summary = team
+    athlete_name, athlete_id, path = team[0]
+    with open(path, encoding="utf-8") as file_obj:
+        bio = json.load(file_obj)
+    bio["resultsTF"] = bio["resultsTF"][:100]
+    with open(path, "w", encoding="utf-8") as f_out:
+        json.dump(bio, f_out)
+    with results_store.ResultsStore(db_path) as store:
+        assert track.ingest_athlete(store, athlete_name, athlete_id, path, "changed") == 100
+        assert store.connection.execute("SELECT COUNT(*) FROM results WHERE athlete_id = ?",
+                                        (int(athlete_id),)).fetchone()[0] == 100
+        assert store.source_hash(athlete_id) == "changed"
+
+@pytest.mark.parametrize("event_id", [4, 52, 8])
+@pytest.mark.parametrize("seasons", [None, [2022, 2022], [2020, 2023]])
+def test_top_times_match_the_json(team, event_id, seasons):
+    team, db_path, summary = team
+    races = [race for race in all_races(team) if race[1] == event_id and race[3] is not None
+             and (seasons is None or seasons[0] <= race[6] <= seasons[1])]
+    lower = event_registry.lower_is_better(event_id)
+    expected = sorted(race[3] for race in races)
+    expected = expected if lower else expected[::-1]
+    with results_store.ResultsStore(db_path) as store:
+        top = store.top_times(event_id, limit=10, seasons=seasons)
+        assert [row[2] for row in top] == expected[:10]
+        for name, mark, value, meet, date in top:
+            assert (name, event_id, mark, value, meet, date) in [race[:6] for race in races]
+
+        best = store.top_times(event_id, limit=10, seasons=seasons, best_per_athlete=True)
+        names = [row[0] for row in best]
+        assert len(names) == len(set(names))
+        for name, mark, value, meet, date in best:
+            own = [race for race in races if race[0] == name]
+            assert value == (min if lower else max)(race[3] for race in own)
+            #the mark, meet and date all come from the same race
+            assert (name, event_id, mark, value, meet, date) in [race[:6] for race in own]
+
+def test_fastest_matches_track_fastest(team):
+    team, db_path, summary = team
+    with results_store.ResultsStore(db_path) as store:
+        for athlete_name, athlete_id, path in team:
+            athlete = track.load_athlete(path, snapshot=False)
+            catalog = track.get_meet_catalog(athlete)
+            for event_id, name, title in track.REPORT_EVENTS:
+                records = catalog.join(track.get_event(athlete, event_id), seasons=[2023, 2023])
+                best = track.fastest(records, event_id)
+                saved = store.fastest(athlete_id, event_id, seasons=[2023, 2023])
+                if best == track.NO_RACE:
+                    assert saved is None
+                else:
+                    kind = event_registry.kind(event_id)
+                    assert event_registry.parse_mark(saved[0], kind) == event_registry.parse_mark(best[0], kind)
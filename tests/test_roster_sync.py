@@ -0,0 +1,63 @@
+import json
+import os.path
+import athletic_standin
+import roster_sync
+from athletic_standin import StandIn
+
+
+ROSTER = [{f"Runner {number}": str(number)} for number in range(1, 13)]
+
+
+def sync(url, directory, **options):
+    return roster_sync.sync_roster(ROSTER, str(directory), workers=4, per_host_rate=0, backoff=0.01,
+                                   base_url=url, progress=False, **options)
+
+
+def test_sync_downloads_everyone_then_revalidates(tmp_path, standin):
+    summary = sync(standin[1], tmp_path)
+    assert sorted(summary["downloaded"]) == sorted(name for entry in ROSTER for name in entry)
+    assert summary["failed"] == {}
+    with open(tmp_path / "Runner7.json", encoding="utf-8") as file_obj:
+        assert json.load(file_obj)["athlete"]["IDAthlete"] == 7
+    #gzip on the wire
+    assert summary["wire_bytes"] < summary["bytes"]
+
+    again = sync(standin[1], tmp_path)
+    assert len(again["skipped"]) == len(ROSTER) and again["attempts"] == 0
+
+    forced = sync(standin[1], tmp_path, force=True)
+    assert len(forced["not_modified"]) == len(ROSTER)
+    assert standin[0].counts["304"] == len(ROSTER)
+
+def test_sync_retries_errors_and_throttling(tmp_path):
+    server, url = athletic_standin.start(StandIn(synthetic_results=20, error_rate=0.2, throttle_rate=0.2,
+                                                 retry_after=0, seed=5))
+    try:
+        summary = sync(url, tmp_path, retries=6)
+        stats = server.standin.stats()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert summary["failed"] == {}
+    assert len(summary["downloaded"]) == len(ROSTER)
+    assert stats["500"] + stats["429"] > 0
+    assert summary["attempts"] == stats["requests"]
+
+def test_sync_reports_athletes_it_cannot_get(tmp_path):
+    server, url = athletic_standin.start(StandIn(synthetic_results=None))
+    try:
+        summary = sync(url, tmp_path, retries=0)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert set(summary["failed"]) == {name for entry in ROSTER for name in entry}
+    assert not os.path.exists(tmp_path / "Runner1.json")
+
+def test_read_roster_formats(tmp_path):
+    (tmp_path / "team.txt").write_text("# seniors\nDavid Whitaker, 15714155\n\nBrady Heron,15714146\n", encoding="utf-8")
+    (tmp_path / "team.json").write_text(json.dumps([{"David Whitaker": 15714155}, {"Brady Heron": "15714146"}]),
+                                        encoding="utf-8")
+    expected = [("David Whitaker", "15714155"), ("Brady Heron", "15714146")]
+    assert roster_sync.read_roster(str(tmp_path / "team.txt")) == expected
+    assert roster_sync.read_roster(str(tmp_path / "team.json")) == expected
+    assert roster_sync.roster_pairs({"David Whitaker": 15714155}) == expected[:1]
@@ -1,11 +1,49 @@
 import os.path
-import urllib.request
 import json
-import pprint as pp
-import datetime
-import matplotlib.pyplot as plt
-import numpy as np
-import webbrowser
+import argparse
+from bio_cache import BioCache
+from bio_stream import read_bio
+import sys
+import time
+import charts
+import instrument
+import report_build
+import meet_catalog
+import event_registry
+from meet_catalog import MeetCatalog
+#numpy, matplotlib (through charts.py), the download code (athletic_client, roster_sync), the worker pools and
+#webbrowser are imported inside the functions that use them, so a quick lookup at the command line doesn't wait
+#for them to load
+
+#dictionary of athlete name and athletic.net for team members that I want to be able to look up. 
+ATHLETE_INFO = [{'David Whitaker': '15714155'},
+                {'Brady Heron': '15714146'},
+                {'Brandon Latta': '15714149'},
+                {'Brock Malaikal': '15748733'},
+                {'Brendan Herger': '15979366'},
+                {'Ethan Powell': '17514447'},
+                {'Isaac Luebke': '15714150'},
+                {'Maximilian Potrzeba': '15714152'},
+                {'Nicholas Yaquinto': '12409091'},
+                {'Raunak Chattopadhyay': '15714142'},
+                {'Sohil Jayee': '15714147'}]
+
+#what fastest() gives back when there are no real marks to pick from
+NO_RACE = ('25:25.25a', "")
+
+#the events that go in a report: (athletic.net EventID, name used in the report, title of the graph).
+#They come from the event registry (event_registry.py), so adding an event there adds it everywhere.
+REPORT_EVENTS = event_registry.report_events()
+
+#bump this when the arrays saved in a snapshot change, so old snapshots get rebuilt
+SNAPSHOT_VERSION = 2
+#bits in the snapshot "flags" column
+FLAG_VALID = 1
+FLAG_HAND = 2
+FLAG_ADJUSTED = 4
+
+#lists of marks shorter than this are parsed in plain python by fastest(), which is quicker than going through numpy
+BULK_MARKS = 256
 
 
 def read_json(filepath, encoding='utf-8'):
@@ -18,58 +56,237 @@ def read_json(filepath, encoding='utf-8'):
     Returns:
         dict/list: dict or list representations of the decoded JSON document
     """
-    with open(filepath, 'r', encoding=encoding) as file_obj:
+    with instrument.span("parse", filepath), open(filepath, 'r', encoding=encoding) as file_obj:
         return json.load(file_obj)
 
-def get_meets(athlete, year='2022'):
+def snapshot_path(filepath):
     """
-    Takes the json input of an Athlete's info from Athletic.net and parses through
-    to find the meet names and event id numbers for meets in 2022. Could be changed for any year.
+    Gives the path of the binary snapshot saved next to an athlete's json file ('DavidWhitaker.json' -> 'DavidWhitaker.snapshot.npz').
+    """
+    return os.path.splitext(filepath)[0] + ".snapshot.npz"
+
+def write_snapshot(filepath, athlete):
+    """
+    Saves the parts of an athlete's json we actually use as numpy columns in a .npz file next to the json,
+    so later runs can skip reading and parsing the json. One row per race: event id, meet id, the mark as
+    written, the mark as a number (seconds for races, meters for jumps and throws, see event_registry.py), the
+    meet date and flags (valid/hand timed/adjusted). Meets are saved once
+    each with their names stored one time per unique name. The size and modified time of the json are saved
+    too so the snapshot is thrown away when the json changes.
+
+    Inputs: filepath (path of the json file the athlete was read from), athlete (the dictionary read from it)
+
+    Returns: the path of the snapshot
+    """
+    import numpy as np
+    results = get_results(athlete) or []
+    meet_table = get_meet_table(athlete)
+    marks = np.array([result.get("Result") or "" for result in results], dtype=str)
+    event_ids = np.array([-1 if result.get("EventID") is None else result.get("EventID") for result in results],
+                         dtype=np.int32)
+    #parse the marks once for each way events are measured (times, distances, heights) instead of once per event
+    values = np.zeros(len(marks), dtype=np.float64)
+    valid = np.zeros(len(marks), dtype=bool)
+    kinds = {}
+    for event_id in set(event_ids.tolist()):
+        kinds.setdefault(event_registry.kind(event_id), []).append(event_id)
+    for kind, kind_ids in kinds.items():
+        rows = np.isin(event_ids, kind_ids)
+        values[rows], valid[rows] = event_registry.parse_marks(marks[rows], kind)
+    endings = np.char.lower(np.char.rstrip(marks))
+    flags = (valid * FLAG_VALID
+             | np.char.endswith(endings, "h") * FLAG_HAND
+             | np.char.endswith(endings, "a") * FLAG_ADJUSTED).astype(np.uint8)
+    meet_ids = [result.get("MeetID") for result in results]
+    dates = [meet_table[meet_id]["date"] if meet_id in meet_table and meet_table[meet_id]["date"] else "NaT"
+             for meet_id in meet_ids]
+
+    table_ids = list(meet_table.keys())
+    names = [meet_table[meet_id]["name"] or "" for meet_id in table_ids]
+    unique_names = sorted(set(names))
+    name_number = {name: number for number, name in enumerate(unique_names)}
+    stat = os.stat(filepath)
+
+    path = snapshot_path(filepath)
+    temp_path = path + ".part.npz"
+    np.savez(temp_path,
+             version=np.array(SNAPSHOT_VERSION),
+             source=np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64),
+             event_id=event_ids,
+             meet_id=np.array([-1 if meet_id is None else meet_id for meet_id in meet_ids], dtype=np.int64),
+             mark=marks,
+             value=values,
+             date=np.array(dates, dtype="datetime64[D]"),
+             flags=flags,
+             meet_table_id=np.array([-1 if meet_id is None else meet_id for meet_id in table_ids], dtype=np.int64),
+             meet_table_name=np.array([name_number[name] for name in names], dtype=np.int32),
+             meet_table_date=np.array([meet_table[meet_id]["date"] for meet_id in table_ids], dtype=str),
+             meet_names=np.array(unique_names, dtype=str))
+    os.replace(temp_path, path)
+    if instrument.enabled():
+        instrument.count("bytes_written", os.path.getsize(path))
+    return path
+
+def load_snapshot(filepath):
+    """
+    Loads the snapshot of an athlete's json file if there is one and it still matches the json.
+
+    Input: filepath (path of the athlete's json file)
+
+    Returns: a dictionary of the snapshot's numpy arrays, or None if it is missing, out of date or unreadable
+    """
+    import numpy as np
+    try:
+        stat = os.stat(filepath)
+        with np.load(snapshot_path(filepath), allow_pickle=False) as data:
+            if int(data["version"]) != SNAPSHOT_VERSION:
+                return None
+            if data["source"].tolist() != [stat.st_size, stat.st_mtime_ns]:
+                return None
+            return {key: data[key] for key in data.files}
+    except (OSError, KeyError, ValueError):
+        return None
+
+def athlete_from_snapshot(snapshot):
+    """
+    Makes an athlete dictionary from a snapshot. Instead of the raw resultsTF list it keeps the race columns
+    as they are under "_snapshot", with the meet table (the same one get_meet_table would build) filled in.
+    The races of an event are only turned into (race time, meet id) tuples when get_event asks for that
+    event (see snapshot_event), so all of the get_ functions work on it without ever touching the json and
+    events nobody looks at cost nothing.
+
+    Input: snapshot (the dictionary from load_snapshot)
+
+    Returns: an athlete dictionary
+    """
+    meet_names = snapshot["meet_names"].tolist()
+    meets = {}
+    meet_table = {}
+    for meet_id, name_number, date in zip(snapshot["meet_table_id"].tolist(), snapshot["meet_table_name"].tolist(),
+                                          snapshot["meet_table_date"].tolist()):
+        meet_id = None if meet_id == -1 else meet_id
+        name = meet_names[name_number]
+        meets[str(meet_id)] = {"IDMeet": meet_id, "MeetName": name, "EndDate": date}
+        meet_table[meet_id] = {"name": name, "date": date, "season": str(meet_catalog.season_of(date) or "")}
+    return {"meets": meets, "_meet_table": meet_table, "_snapshot": snapshot, "_snapshot_events": {}}
+
+def snapshot_event(athlete, event_id):
+    """
+    Gets the races of one event out of the columns of an athlete loaded from a snapshot. The first call sorts
+    the rows by event once (a stable numpy argsort, so races keep their order); after that each event is one
+    binary search and a slice of the columns, and its list is kept on the athlete.
+
+    Inputs: athlete (from athlete_from_snapshot), event_id
+
+    Returns: a list of tuples of (race time, meet id) (empty if the event was never run)
+    """
+    events = athlete["_snapshot_events"]
+    if event_id not in events:
+        import numpy as np
+        snapshot = athlete["_snapshot"]
+        order = athlete.get("_snapshot_order")
+        if order is None:
+            with instrument.span("index", "snapshot order"):
+                order = athlete["_snapshot_order"] = np.argsort(snapshot["event_id"], kind="stable")
+        sorted_ids = snapshot["event_id"][order]
+        wanted = -1 if event_id is None else event_id
+        rows = order[np.searchsorted(sorted_ids, wanted, "left"):np.searchsorted(sorted_ids, wanted, "right")]
+        events[event_id] = [(mark, None if meet_id == -1 else meet_id)
+                            for mark, meet_id in zip(snapshot["mark"][rows].tolist(), snapshot["meet_id"][rows].tolist())]
+    return events[event_id]
+
+def load_athlete(filepath, snapshot=True):
+    """
+    Loads an athlete from the snapshot next to their json file, or streams the resultsTF and meets out of the
+    json (and saves a snapshot for next time) if the snapshot is missing or the json has changed since it was made.
+
+    Input: filepath (path of the athlete's json file)
+           snapshot - False reads the json without touching the snapshot, which keeps numpy from being loaded
+                      (for quick lookups at the command line)
+
+    Returns: an athlete dictionary that works with all of the get_ functions
+    """
+    with instrument.span("parse", filepath, snapshot=snapshot):
+        if not snapshot:
+            return read_bio(filepath)
+        snapshot = load_snapshot(filepath)
+        if snapshot is not None:
+            return athlete_from_snapshot(snapshot)
+        athlete = read_bio(filepath)
+        try:
+            write_snapshot(filepath, athlete)
+        except OSError as inst:
+            print("Couldn't save a snapshot of " + filepath + ": " + str(inst))
+        return athlete
+
+def get_meets(athlete, year=None):
+    """
+    Takes the json input of an Athlete's info from Athletic.net and finds the meet names and event id
+    numbers for the meets of one season, using the athlete's meet catalog.
 
     Parameters:
     Inputs: athlete (a dictionary from the json file)
+            year (the season, i.e. '2022'. Defaults to the athlete's latest season)
 
-    Returns: a list of dictionaries of the meet name and meet id number
+    Returns: a list of dictionaries of the meet name and meet id number, in date order
     """
-    meet_list = []
-    dates_names =[]
-    meet_dict = athlete.get("meets")
-    #print(meet_dict)
+    catalog = get_meet_catalog(athlete)
+    season = catalog.latest_season() if year is None else year
+    return [{name: meet_id} for name, meet_id, date in catalog.select_meets(seasons=season)]
 
-    for key in meet_dict.keys():
-        dates_names.append(meet_dict[key])
-    for entry in dates_names:
-        x= entry.get('EndDate')
-        y= x.split("-")[0]
-        if y == year:
-            meet_list.append({entry.get("MeetName"): entry.get("IDMeet")})
-    return meet_list
+def get_meet_dates(athlete, year=None):
+    """
+    Takes the json input of an Athlete's info from Athletic.net and finds the meet dates and event id
+    numbers for the meets of one season, using the athlete's meet catalog.
 
-def get_meet_dates(athlete, year='2022'):
+    Parameters:
+    Inputs: athlete (a dictionary from the json file)
+            year (the season, i.e. '2022'. Defaults to the athlete's latest season)
+
+    Returns: a list of dictionaries of the meet date ('YYYY-MM-DD') and meet id number, in date order
     """
-    Takes the json input of an Athlete's info from Athletic.net and parses through
-    to find the meet names and event id numbers for meets in 2022. Could be changed for any year.
+    catalog = get_meet_catalog(athlete)
+    season = catalog.latest_season() if year is None else year
+    return [{date: meet_id} for name, meet_id, date in catalog.select_meets(seasons=season)]
+
+def get_meet_table(athlete):
+    """
+    Takes the json input of an Athlete's info from Athletic.net and builds a lookup table of every
+    meet keyed by its meet id number, so a race result can find its meet without searching.
+    The table is saved on the athlete dictionary so it only gets built once per athlete.
 
     Parameters:
     Inputs: athlete (a dictionary from the json file)
 
-    Returns: a list of dictionaries of the meet name and meet id number
+    Returns: a dictionary of meet id -> dictionary of the meet "name", "date" ('YYYY-MM-DD') and "season" ('YYYY')
+    """
+    table = athlete.get("_meet_table")
+    if table is None:
+        table = {}
+        for entry in (athlete.get("meets") or {}).values():
+            end_date = (entry.get("EndDate") or "")[:10]
+            table[entry.get("IDMeet")] = {"name": entry.get("MeetName"),
+                                          "date": end_date,
+                                          "season": str(meet_catalog.season_of(end_date) or "")}
+        athlete["_meet_table"] = table
+    return table
+
+def get_meet_catalog(athlete):
     """
-    meet_list = []
-    dates_names =[]
-    meet_dict = athlete.get("meets")
-    #print(meet_dict)
+    Gives the athlete's meets as a MeetCatalog: sorted by date once, with numpy dates and an index by season,
+    so any range of seasons or dates can be picked out without going through the meets again.
+    The catalog is saved on the athlete dictionary so it only gets built once per athlete.
 
-    for key in meet_dict.keys():
-        dates_names.append(meet_dict[key])
-    for entry in dates_names:
-        x= entry.get('EndDate')
-        x1 = datetime.datetime.fromisoformat(x)
-        # date = month/date/year
-        y= x.split("-")[0]
-        if y == year:
-            meet_list.append({x1.strftime("%Y-%m-%d"): entry.get("IDMeet")})
-    return meet_list
+    Inputs: athlete (a dictionary from the json file)
+
+    Returns: a meet_catalog.MeetCatalog
+    """
+    catalog = athlete.get("_meet_catalog")
+    if catalog is None:
+        with instrument.span("index", "meet catalog"):
+            catalog = MeetCatalog(get_meet_table(athlete))
+        athlete["_meet_catalog"] = catalog
+    return catalog
 
 def get_results(athlete):
     """
@@ -82,77 +299,146 @@ def get_results(athlete):
     return results_dict
 
 
+def index_results(athlete):
+    """
+    Takes the json input of an athlete's info from athletic.net and walks the resultsTF list
+    one time, sorting every race into a bucket by its EventID. This covers every event the athlete
+    has run, not just the ones we have a get_ function for. The index is saved on the athlete
+    dictionary so it only gets built once no matter how many events are looked up.
+
+    Inputs: athlete (a dictionary from the json file of all info for that athlete)
+
+    Returns: a dictionary of EventID -> list of tuples of (race time, meet id)
+    """
+    index = athlete.get("_event_index")
+    if index is None:
+        index = {}
+        with instrument.span("index", "event index"):
+            if "_snapshot" in athlete:
+                for event_id in sorted(set(athlete["_snapshot"]["event_id"].tolist())):
+                    event_id = None if event_id == -1 else event_id
+                    index[event_id] = snapshot_event(athlete, event_id)
+            else:
+                for result in get_results(athlete) or []:
+                    index.setdefault(result.get("EventID"), []).append((result.get("Result"), result.get("MeetID")))
+        athlete["_event_index"] = index
+    return index
+
+def get_event(athlete, event_id):
+    """
+    Looks up the results of one event in the athlete's event index (built on the first call). For an athlete
+    loaded from a snapshot only this event's races are pulled out of the columns (see snapshot_event).
+
+    Inputs: athlete (a dictionary from the json file of all info for that athlete)
+            event_id (the athletic.net EventID number, i.e. 4 for the 800)
+
+    Returns: a list of Tuples with race times and meet id numbers (empty if the event was never run)
+    """
+    if "_snapshot" in athlete and "_event_index" not in athlete:
+        return snapshot_event(athlete, event_id)
+    return index_results(athlete).get(event_id, [])
+
+
 def get_800(athlete):
     """
-    Takes the json input of an athlete's info from athletic.net, as well as the list of dictionaries
-    of meet names/meet id numbers and returns the results of the 800 meter races for the 2022 season
-        Parameters:
+    Takes the json input of an athlete's info from athletic.net and returns every one of their 800 meter races, from
+    every season in the json. To keep only some seasons or dates, join them with the meet catalog:
+    get_meet_catalog(athlete).join(get_800(athlete), **query), with a query from meet_catalog.parse_query.
+
     Inputs: athlete (a dictionary from the json file of all info for that athlete)
 
-    Returns: a list of Tuples with Meet Names and 800m times
+    Returns: a list of Tuples with 800m times and meet id numbers
     """
-    times800 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 4:
-            times800.append((result.get("Result"), result.get("MeetID")))
-    return times800
+    return get_event(athlete, event_registry.find("800")["id"])
 
 def get_1600(athlete):
     """
-    Takes the json input of an athlete's info from athletic.net and returns the results of the 1600 meter races for the 2022 season
-        Parameters:
+    Takes the json input of an athlete's info from athletic.net and returns every one of their 1600 meter races, from
+    every season in the json. To keep only some seasons or dates, join them with the meet catalog:
+    get_meet_catalog(athlete).join(get_1600(athlete), **query), with a query from meet_catalog.parse_query.
+
     Inputs: athlete (a dictionary from the json file of all info for that athlete)
 
-    Returns: a list of Tuples with Meet Names and 1600m times
+    Returns: a list of Tuples with 1600m times and meet id numbers
     """
-    times1600 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 52:
-            times1600.append((result.get("Result"), result.get("MeetID")))
-    return times1600
+    return get_event(athlete, event_registry.find("1600")["id"])
 
 def get_3200(athlete):
     """
-    Takes the json input of an athlete's info from athletic.net and returns the results of the 3200 meter races for the 2022 season
-        Parameters:
+    Takes the json input of an athlete's info from athletic.net and returns every one of their 3200 meter races, from
+    every season in the json. To keep only some seasons or dates, join them with the meet catalog:
+    get_meet_catalog(athlete).join(get_3200(athlete), **query), with a query from meet_catalog.parse_query.
+
     Inputs: athlete (a dictionary from the json file of all info for that athlete)
 
-    Returns: a list of Tuples with Meet Names and 3200m times
+    Returns: a list of Tuples with 3200m times and meet id numbers
     """
-    times3200 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 60: #and result.get("MeetID") in meetlist.values():
-            times3200.append((result.get("Result"), result.get("MeetID")))
-    return times3200
+    return get_event(athlete, event_registry.find("3200")["id"])
 
 def get_4x800(athlete):
     """
-    Takes the json input of an athlete's info from athletic.net and returns the results of the 4 x 800 meter races for the 2022 season
-        Parameters:
+    Takes the json input of an athlete's info from athletic.net and returns every one of their 4 x 800 meter relays, from
+    every season in the json. To keep only some seasons or dates, join them with the meet catalog:
+    get_meet_catalog(athlete).join(get_4x800(athlete), **query), with a query from meet_catalog.parse_query.
+
     Inputs: athlete (a dictionary from the json file of all info for that athlete)
 
-    Returns: a list of Tuples with Meet Names and 4x800m times
+    Returns: a list of Tuples with 4x800m times and meet id numbers
     """
-    times4x800 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 39: #and result.get("MeetID") in meetlist.values():
-            times4x800.append((result.get("Result"), result.get("MeetID")))
-    return times4x800
+    return get_event(athlete, event_registry.find("4x800")["id"])
 
 def get_4x400(athlete):
     """
-    Takes the json input of an athlete's info from athletic.net and returns the results of the 4 x 800 meter races for the 2022 season
-        Parameters:
-    Inputs: athlete (a dictionary from the json file)
+    Takes the json input of an athlete's info from athletic.net and returns every one of their 4 x 400 meter relays, from
+    every season in the json. To keep only some seasons or dates, join them with the meet catalog:
+    get_meet_catalog(athlete).join(get_4x400(athlete), **query), with a query from meet_catalog.parse_query.
+
+    Inputs: athlete (a dictionary from the json file of all info for that athlete)
+
+    Returns: a list of Tuples with 4x400m times and meet id numbers
+    """
+    return get_event(athlete, event_registry.find("4x400")["id"])
 
-    Returns: a list of Tuples with Meet Names and 4x400m times
+
+def join_results(meet_table, distance_results, year=None):
     """
-    times4x400 = []
-    for result in get_results(athlete):
-        if result.get("EventID") == 8: #and result.get("MeetID") in meetlist.values():
-            times4x400.append((result.get("Result"), result.get("MeetID")))
-    return times4x400
+    Connects each race of a distance with the meet it was run at using the meet table, so every
+    result is matched in one lookup instead of searching through all the meets.
+
+    Inputs: the meet table from get_meet_table,
+            the list of tuples of the time with the meet id,
+            the season year to keep (None keeps every season).
+            To pick races by a range of seasons or dates use get_meet_catalog(athlete).join instead.
 
+    Returns: A list of tuples of (race time, meet name, meet date), in date order.
+    """
+    results_list = []
+    with instrument.span("join", races=len(distance_results)):
+        for result in distance_results:
+            meet = meet_table.get(result[1])
+            if meet is not None and (year is None or meet["season"] == str(year)):
+                results_list.append((result[0], meet["name"], meet["date"]))
+        results_list.sort(key=lambda record: record[2])
+    return results_list
+
+def _join_meet_list(meets, distance_results):
+    """
+    Shared hash join for pretty_results and pretty_results_dates. Builds a dictionary of
+    meet id -> (position, label) from the meet list once, then matches each result in one lookup.
+    Results keep the order of the meet list, the same as the old nested loops gave.
+    """
+    with instrument.span("join", races=len(distance_results)):
+        labels = {}
+        for position, meet in enumerate(meets):
+            for key, value in meet.items():
+                labels.setdefault(value, (position, key))
+        matched = []
+        for result in distance_results:
+            label = labels.get(result[1])
+            if label is not None:
+                matched.append((label[0], (result[0], label[1])))
+        matched.sort(key=lambda pair: pair[0])
+        return [pair[1] for pair in matched]
 
 def pretty_results(meets, distance_results):
     """
@@ -165,15 +451,7 @@ def pretty_results(meets, distance_results):
 
     Return: A list of tuples of the meet name and time.
     """
-    results_list = []
-    for meet in meets:
-        for key, value in meet.items():
-            name = key
-            meetid = value
-            for result in distance_results:
-                if result[1] == meetid:
-                    results_list.append((result[0], name))
-    return results_list
+    return _join_meet_list(meets, distance_results)
 
 def pretty_results_dates(meets, distance_results):
     """
@@ -186,97 +464,136 @@ def pretty_results_dates(meets, distance_results):
 
     Outputs: A list of tuples of the meets dates and race times.
     """
-    results_list = []
-    for meet in meets:
-        for key, value in meet.items():
-            name = key
-            meetid = value
-            for result in distance_results:
-                if result[1] == meetid:
-                    results_list.append((result[0], name))
-    return results_list
+    return _join_meet_list(meets, distance_results)
 
 
-def convert_to_time(racetime):
+def season_query(catalog, query=None):
     """
-    Takes a string represenation of a racetime and breaks it into an integer
+    Fills in which seasons a report covers for one athlete.
 
-    Input: String of race time in the format ('#:#.#a')
+    Inputs: catalog (the athlete's MeetCatalog), query (from meet_catalog.parse_query, or None)
 
-    Returns: Integer (###)
+    Returns: the query, or if there wasn't one a query for the athlete's latest season
     """
-    race1 = racetime.strip("a")
-    min_race1 = race1.split(":")[0]
-    sec_race1 = (race1.split(":")[1]).split(".")[0]
-    hund_race1 = (race1.split(":")[1]).split(".")[1]
-    race_time = int(min_race1+sec_race1+hund_race1)
-    return race_time
+    if query is not None:
+        return query
+    latest = catalog.latest_season()
+    return {"seasons": None if latest is None else [latest, latest], "part": None, "start": None, "end": None}
+
 
-def fastest(racelist):
+def fastest(racelist, event_id=None):
     """
     Take a list of tuples for whichever distance of races and returns a tuple of the fastest time
-    and which meet that occurred at
+    and which meet that occurred at. For jumps and throws it is the longest or highest mark instead.
 
     Input:
     List of tuples of all the instances of a race at a specific distance
+    event_id - the EventID the races are from, so the event registry can say how marks compare (None for times)
 
     Returns:
     Tuple of the fastest race and the name of the meet where that occurred
 
     """
-    fastest = ('25:25.25a', "")
-    for race in racelist:
-        try:
-            t = race[0]
-            t2 = convert_to_time(t)
-            if t2 < convert_to_time(fastest[0]):
-                fastest = race
-            else:
-                pass
-        except:
-                pass
-    return fastest
+    if len(racelist) == 0:
+        return NO_RACE
+    kind = event_registry.kind(event_id)
+    lower_is_better = kind == event_registry.TIME
+    if len(racelist) < BULK_MARKS:
+        best = NO_RACE
+        best_value = None
+        for race in racelist:
+            value = event_registry.parse_mark(race[0], kind)
+            if value is not None and (best_value is None or
+                                      (value < best_value if lower_is_better else value > best_value)):
+                best, best_value = race, value
+        return best
+    import numpy as np
+    values, valid = event_registry.parse_marks([race[0] for race in racelist], kind)
+    if not valid.any():
+        return NO_RACE
+    if lower_is_better:
+        return racelist[int(np.argmin(np.where(valid, values, np.inf)))]
+    return racelist[int(np.argmax(np.where(valid, values, -np.inf)))]
+
+def progress_points(race_dets, kind=event_registry.TIME):
+    """
+    Turns a list of (race time, date) tuples into the points of a progress graph, leaving out marks that aren't times.
+    kind says how the event is measured (see event_registry.kind).
 
-def graph_progress(race_dets, title, png_name):
+    Returns: a tuple of (numpy datetime64 array of dates, numpy array of times in seconds (meters for field events))
     """
-    Take a list of tuples for whichever distance of races and the dates the occurred on and a graph of the race results
+    import numpy as np
+    seconds, valid = event_registry.parse_marks([race[0] for race in race_dets], kind)
+    xpoints = np.array([race[1] for race in race_dets], dtype="datetime64[D]")[valid]
+    return xpoints, seconds[valid]
+
+def graph_progress(race_dets, title, png_name, output_directory="reports", event_id=None):
+    """
+    Take a list of tuples for whichever distance of races and the dates the occurred on and a graph of the race results.
+    The graph is drawn off screen with the chart engine in charts.py and skipped if the saved png already shows the same data.
 
     Input:
     List of tuples of all the instances of a race at a specific distance
     Title for the graph
+    png_name - where to save the graph, relative to output_directory (i.e. "images/DavidWhitaker800.png")
+    event_id - the EventID, so field events are graphed in meters (None for times)
 
     Returns:
-    a graph
+    the hash of the graph's data and style (None if there weren't enough races to graph)
     """
-    xpoints = []
-    ypoints = []
     if len(race_dets) > 1:
-        for set in race_dets:
-            if set[0] == "DNS" or set[0] == "DNF" or set[0].lower() == "scratch":
-                pass
-            else:
-                y1 = set[0].strip("a").split(":")[0]
-                y2 = set[0].strip('a"').split(":")[1].split(".")[0]
-                y3 = set[0].strip('a"').split(".")[1]
-                y = float(y1)*60 + float(y2) + float(y3)/100
-                ypoints.append(y)
-                xpoints.append(np.datetime64(set[1]))
-        font1 = {'family':'serif','color':'blue','size':20}
-        font2 = {'family':'serif','color':'darkred','size':15}
-        plt.plot(xpoints, ypoints)
-        plt.title(title, fontdict = font1)
-        plt.xlabel("Date of the Race", fontdict = font2)
-        plt.ylabel("Time in Seconds", fontdict = font2)
-        plt.tick_params(axis='x', labelrotation=45)
-        plt.tight_layout()
-
-        full_png_name = os.path.join("reports", png_name)
-        plt.savefig(full_png_name)
-        plt.show()
+        xpoints, ypoints = progress_points(race_dets, event_registry.kind(event_id))
+        full_png_name = os.path.join(output_directory, png_name)
+        key, rendered = charts.get_renderer().render(xpoints, ypoints, title, full_png_name,
+                                                     ylabel=event_registry.axis_label(event_id))
+        if not rendered:
+            print(f"Graph for {title} hasn't changed. Using {full_png_name}")
+        return key
     else:
         print(f"No graph available for {title}. Didn't run this event or only ran it once.")
+        return None
 
-def create_html(athlete_name, name, results_type, results, images):
+def event_details(athlete, event_id, query):
+    """
+    Gets one event's races for a query, joined with their meets, the first time they are asked for. They are
+    kept on the athlete dictionary (under "_event_details") with the best mark and graph once those are worked
+    out too (see event_best and event_chart), so asking for the same event again costs nothing.
+
+    Inputs: athlete (from load_athlete), event_id, query (from season_query)
+
+    Returns: a dictionary of "races" (race time, meet name) and "dates" (race time, meet date) in date order
+    """
+    key = (event_id, json.dumps(query, sort_keys=True))
+    details = athlete.setdefault("_event_details", {})
+    if key not in details:
+        records = get_meet_catalog(athlete).join(get_event(athlete, event_id), **query)
+        details[key] = {"races": [(time, meet) for time, meet, date in records],
+                        "dates": [(time, date) for time, meet, date in records]}
+    return details[key]
+
+def event_best(athlete, event_id, query):
+    """
+    Returns: the best mark of an event for a query (see fastest), worked out the first time it is asked for
+    """
+    details = event_details(athlete, event_id, query)
+    if "best" not in details:
+        details["best"] = fastest(details["races"], event_id)
+    return details["best"]
+
+def event_chart(athlete, event_id, query, title, png_name, output_directory="reports"):
+    """
+    Draws the graph of an event for a query the first time it is asked for (see graph_progress).
+
+    Returns: the hash of the graph (None if there weren't enough races to graph)
+    """
+    details = event_details(athlete, event_id, query)
+    if details.get("png") != (output_directory, png_name):
+        details["chart"] = graph_progress(details["dates"], title, png_name, output_directory, event_id)
+        details["png"] = (output_directory, png_name)
+    return details["chart"]
+
+def create_html(athlete_name, name, results_type, results, images, output_directory='reports', policy="changed",
+                inputs=None, manifest=None, header=None):
     """ This function creates the report for the athlete and saves it as an html file. The report contains a header with the athlete's name, school, season, sport, and the
     school logo. Then adds a title, set of race results and a graph of those results based on what the user has asked this website to pull up. It is customizable so if you
     only searched 800 and 1600, then those are the only results displayed. If you search all the races, then all 5 are displayed.
@@ -286,122 +603,192 @@ def create_html(athlete_name, name, results_type, results, images):
     results_type - a list of events that were searched for (i.e. 800, 1600, 3200)
     results - a list of tuples that share the meet name and race time)
     images - a list of links to the graphs
+    output_directory - the folder the report is saved in
+    policy - what to do if the report is already there (see report_build.POLICIES): "changed" only rewrites it if
+             its inputs changed since the last build, "always" rewrites it, "never" keeps the old one
+    inputs - what the report is built from (report_build.report_inputs), remembered in the build manifest
+    manifest - the report_build.BuildManifest to check and update (the one in output_directory is used if not given)
+    header - values for the header (school, season, logo...) in place of the ones in report_build.HEADER
 
     Outputs:
     url_link - a string that is the url to the athelete's report
     """
-    #Build the html string
-    html_doc = ""
-    html_prefix = '''<!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <link rel="stylesheet" href="styles.css">
-        <title>Northville Track and Field</title>
-    </head>
-    <body>
-    '''
-    html_doc += html_prefix
-    html_doc += '    <div class="header">\n'
-    html_doc += '        <img class="logo" src="'+ "Mustangs.png" +'" alt="Mustang-Logo">\n'
-    html_doc += '        <div class="header-text">\n'
-    html_doc += '           <div class="athlete_name">'+ athlete_name.upper() +'</div>\n'
-    html_doc += '           <div class="season_year">'+ "2022" +' Season</div>\n'
-    html_doc += '           <div class="school">'+ "Northville HS" +'</div>\n'
-    html_doc += '           <div class="sport">'+ "Track & Field" +'</div>\n'
-    html_doc += '        </div>\n'
-    html_doc += '    </div>\n'
-
-    #Create the loops that fill in the rest of the html
-    #First loop is the race type
-    n = len(results_type)
-    i = 0
-    while i <n:
-        html_doc+= '    <hr class="solid">'
-        html_doc+= '    <div class="RaceTitle">' + results_type[i] + '</div>\n'
-        html_doc+= '    <div class="Results">\n'
-
-        #Loop for Races within that race type
-        m = len(results[i])
-        j=0
-        while j<m:
-            print(results)
-            html_doc+= '        <div class="Result">\n'
-            html_doc+= '            <div class="Place">' + results[i][j][1] + ': </div>\n'
-            html_doc+= '            <div class="Time">' + results[i][j][0] + '</div>\n'
-            html_doc+= '        </div>\n'
-            j+=1
-
-        html_doc+= '    </div>\n'
-
-        #Graph
-        html_doc+= '    <img class="graph" src="' + images[i] + '">\n'
-        i+=1
-
-    html_suffix = '''
-    </body>
-    </html>'''
-    html_doc+= html_suffix
-    #save html string as a file
-    # assign directory
-    output_directory = 'reports'
     output_file_name = name + ".html"
     url_link = output_directory + '/' + output_file_name
     f_out_path = os.path.join(output_directory, output_file_name)
-    #if there is no current file in the directory, create one
-    if not os.path.isfile(f_out_path):
-        with open(f_out_path, "w", encoding='utf-8') as f_out:
-            f_out.write(html_doc)
-            f_out.close()
-            print("File Written", f_out_path)
-    #if there is a file, either leave it as it, or allow the user to update it with an overwrite
-    else:
-        print("file exists. Overwrite?", f_out_path)
-        if input().upper()=='Y':
-            with open(f_out_path, "w", encoding='utf-8') as f_out:
-                f_out.write(html_doc)
-                f_out.close()
-                print("File Written", f_out_path)
-        else:
-            print("No File Written")
+    header_values = dict(report_build.HEADER)
+    header_values.update(header or {})
+    if inputs is not None:
+        inputs = dict(inputs, header=header_values)
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = report_build.BuildManifest(output_directory)
+    #decide up front whether there is anything to write, so an unchanged report isn't even built
+    if not manifest.should_write(name, policy, inputs):
+        print("Report is up to date. No File Written", f_out_path)
+        return url_link
+
+    #fill in the report templates straight into the file. It is written to a temporary file and renamed so a half
+    #written report is never seen
+    with instrument.span("render", name), report_build.atomic_open(f_out_path) as f_out:
+        report_build.render_report(f_out, athlete_name, results_type, results, images, header_values)
+    print("File Written", f_out_path)
+    if inputs is not None:
+        manifest.record(name, inputs)
+        if own_manifest:
+            manifest.save()
     return url_link
 
+def _render_chart(race_dets, title, png_name, output_directory, event_id=None):
+    """
+    Draws one graph in a chart worker process.
+
+    Returns: a tuple of (png_name, seconds it took, chart hash, the trace events the worker recorded)
+    """
+    start = time.perf_counter()
+    key = graph_progress(race_dets, title, png_name, output_directory, event_id)
+    return png_name, time.perf_counter() - start, key, instrument.drain()
+
+def _write_report(job, chart_futures):
+    """
+    Waits for an athlete's graphs and then writes their html report. Runs on a report writer thread so
+    loading the next athletes and drawing their graphs keeps going while this one is written.
+    """
+    chart_seconds = 0.0
+    chart_hashes = dict.fromkeys(job["images"])
+    for future in chart_futures:
+        png_name, seconds, key, events = future.result()
+        instrument.merge(events)
+        chart_seconds += seconds
+        chart_hashes[png_name] = key
+    start = time.perf_counter()
+    inputs = report_build.report_inputs(job["source"], job["requested"], job["results_type"], chart_hashes,
+                                        job["query"])
+    manifest = job["manifest"]
+    job["status"] = "built" if manifest.should_write(job["name"], job["policy"], inputs) else "up to date"
+    create_html(job["athlete_name"], job["name"], job["results_type"], job["results"], job["images"],
+                job["output_directory"], job["policy"], inputs, manifest, job["header"])
+    job["timings"]["charts"] = chart_seconds
+    job["timings"]["write"] = time.perf_counter() - start
+    job["timings"]["total"] = time.perf_counter() - job["started"]
+    return job
+
+def build_team_reports(roster=ATHLETE_INFO, output_directory="reports", events=REPORT_EVENTS, chart_workers=None,
+                       cache=None, policy="changed", query=None):
+    """
+    Batch mode. Makes the html report and graphs of every event for every athlete on a roster, without any
+    questions at the prompt. The graphs are drawn in a pool of worker processes (matplotlib is slow and can't be
+    shared between threads) and the reports are written by a background thread as soon as an athlete's graphs
+    are done, while the main thread moves on to loading the next athlete.
+
+    Builds are incremental: the build manifest in output_directory remembers what each report was built from.
+    With the "changed" policy an athlete whose json, requested events and graphs are the same as last time is
+    skipped before anything is loaded, so after a meet only the athletes who raced get rebuilt.
+
+    Inputs:
+    roster - athlete_info style list/dict or a list of (name, id) tuples
+    output_directory - where the reports go (graphs go in an images folder inside it)
+    events - list of (EventID, report name, graph title) tuples to include
+    chart_workers - how many chart processes to use (defaults to the number of CPUs)
+    cache - the BioCache to get athletes from (one is made if not given)
+    policy - what to do with existing reports (see report_build.POLICIES)
+    query - which seasons or dates to report on (from meet_catalog.parse_query). None uses each athlete's latest season.
+
+    Returns: a list of dictionaries, one per athlete, with the "athlete", the "report" path (None if it failed),
+    the "status" ("built", "up to date" or "failed"), the number of "races" and "charts", the "timings" in
+    seconds (load, charts, write and total) and any "error"
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    import roster_sync
+    cache = cache or BioCache()
+    os.makedirs(os.path.join(output_directory, "images"), exist_ok=True)
+    manifest = report_build.BuildManifest(output_directory)
+    requested = [event[0] for event in events]
+    summaries = []
+    pending = []
+    with ProcessPoolExecutor(max_workers=chart_workers) as chart_pool, \
+         ThreadPoolExecutor(max_workers=2) as writer:
+        for athlete_name, athlete_id in roster_sync.roster_pairs(roster):
+            started = time.perf_counter()
+            name = athlete_name.replace(" ", "")
+            summary = {"athlete": athlete_name, "report": None, "status": "failed", "races": 0, "charts": 0,
+                       "timings": {}, "error": None}
+            summaries.append(summary)
+            try:
+                filename = cache.get(athlete_name, athlete_id)
+                source = cache.fingerprint(athlete_name)
+                if policy != "always" and manifest.up_to_date(name, source, requested, query):
+                    summary["status"] = "up to date"
+                    summary["report"] = os.path.join(output_directory, name + ".html")
+                    summary["timings"] = {"load": time.perf_counter() - started, "charts": 0.0, "write": 0.0}
+                    summary["timings"]["total"] = summary["timings"]["load"]
+                    continue
+                athlete = load_athlete(filename)
+            except Exception as inst:
+                summary["error"] = str(inst)
+                continue
+            catalog = get_meet_catalog(athlete)
+            athlete_query = season_query(catalog, query)
+            job = {"athlete_name": athlete_name, "name": name, "results_type": [], "results": [], "images": [],
+                   "output_directory": output_directory, "started": started, "timings": summary["timings"],
+                   "source": source, "requested": requested, "manifest": manifest, "policy": policy,
+                   "query": query, "header": {"season": meet_catalog.describe(athlete_query)}}
+            chart_futures = []
+            for event_id, event_name, title in events:
+                records = catalog.join(get_event(athlete, event_id), **athlete_query)
+                if not records:
+                    continue
+                image_name = "images/" + name + event_name + ".png"
+                job["results_type"].append(event_name)
+                job["results"].append([(time_, meet) for time_, meet, date in records])
+                job["images"].append(image_name)
+                summary["races"] += len(records)
+                if len(records) > 1:
+                    race_dets = [(time_, date) for time_, meet, date in records]
+                    chart_futures.append(chart_pool.submit(_render_chart, race_dets, title, image_name, output_directory,
+                                                           event_id))
+            summary["charts"] = len(chart_futures)
+            summary["timings"]["load"] = time.perf_counter() - started
+            pending.append((summary, writer.submit(_write_report, job, chart_futures)))
+
+        for summary, future in pending:
+            try:
+                summary["status"] = future.result()["status"]
+                summary["report"] = os.path.join(output_directory, summary["athlete"].replace(" ", "") + ".html")
+            except Exception as inst:
+                summary["error"] = str(inst)
+    manifest.save()
+    return summaries
+
+def print_report_summary(summaries):
+    """
+    Prints the per athlete timings from build_team_reports as a table.
+    """
+    print(f"{'Athlete':<24}{'Status':<12}{'Races':>6}{'Charts':>7}{'Load':>8}{'Charts':>8}{'Write':>8}{'Total':>8}")
+    for summary in summaries:
+        if summary["error"]:
+            print(f"{summary['athlete']:<24}failed: {summary['error']}")
+            continue
+        timings = summary["timings"]
+        print(f"{summary['athlete']:<24}{summary['status']:<12}{summary['races']:>6}{summary['charts']:>7}"
+              f"{timings['load']:>8.2f}{timings['charts']:>8.2f}{timings['write']:>8.2f}{timings['total']:>8.2f}")
+    built = sum(1 for summary in summaries if summary["status"] == "built")
+    print(f"{built} report(s) rebuilt, {sum(1 for summary in summaries if summary['status'] == 'up to date')} up to date")
+
 def main():
-    #header infor for athletic.net
-    hdr = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.3',
-        'Accept-Encoding': 'none',
-        'Accept-Language': 'en-US,en;q=0.8',
-        'Connection': 'keep-alive'
-        }
-    #url to access athletic.net 
-    base_url = "https://www.athletic.net/api/v1/AthleteBio/GetAthleteBioData?athleteId="
-
-    #dictionary of athlete name and athletic.net for team members that I want to be able to look up. 
-    athlete_info = [{'David Whitaker': '15714155'},
-                    {'Brady Heron': '15714146'},
-                    {'Brandon Latta': '15714149'},
-                    {'Brock Malaikal': '15748733'},
-                    {'Brendan Herger': '15979366'},
-                    {'Ethan Powell': '17514447'},
-                    {'Isaac Luebke': '15714150'},
-                    {'Maximilian Potrzeba': '15714152'},
-                    {'Nicholas Yaquinto': '12409091'},
-                    {'Raunak Chattopadhyay': '15714142'},
-                    {'Sohil Jayee': '15714147'}]
-    web_type = '&sport=tf&'
-    level = 'level=4'
+    from athletic_client import AthleticNetClient
+    #client that builds the athletic.net urls and keeps the connection open between downloads
+    client = AthleticNetClient()
 
     #asks the user for an athlete to search for. This program was build for NHS, so it only pulls NHS athletes that are in the dictionary above.
     a = True
     while a ==True:
         athlete_name = input("Which athlete do you want to search for?\n")
         try:
-            for entry in athlete_info:
+            for entry in ATHLETE_INFO:
                 if athlete_name.title() in entry.keys():
                     n = entry[athlete_name.title()]
-                    website = base_url+n+web_type+level
+                    website = client.bio_url(n)
                     print(website)
                     a = False
                     break
@@ -412,112 +799,63 @@ def main():
 
     name = athlete_name.replace(" ", "")
 
-    filename = os.path.join(name + '.json')
-    #creates a file of info for an athlete if it hasn't already been pulled down. If it has, it doesn't repeat the process (simple cache set up)
-    if not os.path.isfile(filename):
-        print('Downloading: ' + filename)
-        try:
-            request = urllib.request.Request(url=website, headers=hdr)
-            response = urllib.request.urlopen(request)
-            response_str = response.read().decode()
-            f = open(filename, "w")
-            f.write(response_str)
-            f.close()
-        except Exception as inst:
-            print(inst)
-            print('Encountered unknown error. Continuing.')
-    else:
-        print("File Already Downloaded")
-
-    #Saved Information that could be relevant in the future
-    neededinfo = {"level": 4, "SchoolID": "12811"}
-    #reads in the json data for analysis
-    athlete = read_json(filename)
-    #finds the meets info
-    meets = get_meets(athlete)
-    #finds the meet names with dates
-    meet_dates = get_meet_dates(athlete)
-
-    #This series of function calls gets the race results for an individual athlete
-    eighthundredresults = get_800(athlete)
-    eight100 = pretty_results(meets, eighthundredresults)
-    eight100_dates = pretty_results(meet_dates, eighthundredresults)
-    fastest800 = fastest(eight100)
-
-    sixteenhundredresults = get_1600(athlete)
-    sixteen100 = pretty_results(meets, sixteenhundredresults)
-    sixteen100_dates = pretty_results(meet_dates, sixteenhundredresults)
-    fastest1600 = fastest(sixteen100)
-
-    thirtytwohundred = get_3200(athlete)
-    thirtytwo100 = pretty_results(meets, thirtytwohundred)
-    thirtytwo100_dates = pretty_results(meet_dates, thirtytwohundred)
-    fastest3200 = fastest(thirtytwo100)
-
-    fourbyeight = get_4x800(athlete)
-    fourbyeight100 = pretty_results(meets, fourbyeight)
-    fourbyeight100_dates = pretty_results(meet_dates, fourbyeight)
-    fastest4x800 = fastest(fourbyeight100)
-
-    fourbyfour = get_4x400(athlete)
-    fourbyfour100 = pretty_results(meets, fourbyfour)
-    fourbyfour100_dates = pretty_results(meet_dates, fourbyfour)
-    fastest4x400 = fastest(fourbyfour100)
+    #gets the json info for the athlete through the cache. A copy from today is used as is, an older copy is shown
+    #right away while it gets checked against athletic.net in the background, and a missing one is downloaded
+    cache = BioCache(client=client, stale_while_revalidate=True)
+    try:
+        filename = cache.get(athlete_name, n)
+    except Exception as inst:
+        print(inst)
+        print("Couldn't download " + athlete_name + " and there is no saved copy.")
+        return
+
+    #the hash of the json goes in the build manifest. It is taken before the json is read, so if the background
+    #refresh replaces the json while the report is being made, the next run sees a change and rebuilds it
+    source = cache.fingerprint(athlete_name)
+    #reads in the athlete's data, from the saved snapshot if the json hasn't changed since it was made
+    athlete = load_athlete(filename)
+    #finds the meets info, sorted by date and season, and picks the athlete's latest season
+    catalog = get_meet_catalog(athlete)
+    query = season_query(catalog)
+
+    #Every event in the event registry (event_registry.py) the athlete has ever done goes in the menu. Nothing
+    #else about an event is worked out until it is picked, and then it is kept (see event_details), so picking
+    #it again is free.
+    events = [event for event in REPORT_EVENTS if get_event(athlete, event[0])]
+    if not events:
+        print(f"{athlete_name} doesn't have any results in the events we track")
+        return
+    menu = ", ".join(f"Enter {number} for the {title}" for number, (event_id, event_name, title) in enumerate(events, 1))
 
     results_type = []
     results = []
     images = []
+    requested = []
+    chart_hashes = {}
     i = True
     while i == True:
-        what_distance = int(input("\nWhat distance do you want to see results for? \n Enter 1 for the 800m, Enter 2 for the 1600m, Enter 3 for the 3200m, Enter 4 for the 4x800m Relay, or Enter 5 for the 4x400m Relay\n If you are done, please enter 0\n"))
-        #This if, elif, else loop matches the user input of race info request to race results and graph. This info is then saved to enter in a report.
-        if what_distance == 1:
-            print(f"800 Results = {eight100}")
-            results_type.append("800")
-            results.append(eight100)
-            print(f"800 Results with Dates = {eight100_dates}")
-            print(f"Fastest 800 = {fastest800}")
-            image_name = "images/" + name + "800.png"
-            graph_progress(eight100_dates, "800m", image_name)
-            images.append(image_name)
-        elif what_distance == 2:
-            print(f"1600 Results = {sixteen100}")
-            results_type.append("1600")
-            results.append(sixteen100)
-            print(f"1600 Results with Dates = {sixteen100_dates}")
-            print(f"Fastest 1600 = {fastest1600}")
-            image_name = "images/" + name + "1600.png"
-            graph_progress(sixteen100_dates, "1600m", image_name)
-            images.append(image_name)
-        elif what_distance == 3:
-            print(f"3200 Results = {thirtytwo100}")
-            results_type.append("3200")
-            results.append(thirtytwo100)
-            print(f"3200 Results with Dates = {thirtytwo100_dates}")
-            print(f"Fastest 3200 = {fastest3200}")
-            image_name = "images/" + name + "3200.png"
-            graph_progress(thirtytwo100_dates, "3200m", image_name)
-            images.append(image_name)
-        elif what_distance == 4:
-            print(f"4x800m Relay Results = {fourbyeight100}")
-            results_type.append("4x800")
-            results.append(fourbyeight100)
-            print(f"4x800m Relay Results with Dates = {fourbyeight100_dates}")
-            print(f"Fastest 4x800 Relay = {fastest4x800}")
-            image_name = "images/" + name + "4x800.png"
-            graph_progress(fourbyeight100_dates, "4x800m Relay", image_name)
-            images.append(image_name)
-        elif what_distance == 5:
-            print(f"4x400m Relay Results = {fourbyfour100}")
-            results_type.append("4x400")
-            results.append(fourbyfour100)
-            print(f"4x400m Relay Results with Dates = {fourbyfour100_dates}")
-            print(f"Fastest 4x400m Relay = {fastest4x400}")
-            image_name = "images/" + name + "4x400.png"
-            graph_progress(fourbyfour100_dates, "4x400m Relay", image_name)
-            images.append(image_name)
-        elif what_distance > 5:
+        what_distance = int(input(f"\nWhat event do you want to see results for? \n {menu}\n If you are done, please enter 0\n"))
+        #This matches the user input of race info request to race results and graph. This info is then saved to enter in a report.
+        if what_distance > len(events):
             print("We do not have results for your request")
+        elif what_distance > 0:
+            event_id, event_name, title = events[what_distance - 1]
+            event = event_details(athlete, event_id, query)
+            if not event["races"]:
+                print(f"No {title} results for {meet_catalog.describe(query)}")
+                continue
+            label = "Fastest" if event_registry.lower_is_better(event_id) else "Best"
+            print(f"{title} Results = {event['races']}")
+            print(f"{title} Results with Dates = {event['dates']}")
+            print(f"{label} {title} = {event_best(athlete, event_id, query)}")
+            image_name = "images/" + name + event_name + ".png"
+            chart_hashes[image_name] = event_chart(athlete, event_id, query, title, image_name)
+            #an event picked twice only goes in the report once
+            if event_id not in requested:
+                results_type.append(event_name)
+                results.append(event["races"])
+                requested.append(event_id)
+                images.append(image_name)
         else:
             i = False
             print("Bye")
@@ -525,10 +863,505 @@ def main():
 
 
     #Call the create_html function which nicely prints out a personalized report with graphs and gives back the url to the report
-    addition = create_html(athlete_name, name, results_type, results, images)
-    base = "file:///Users/meganwhitaker/Documents/Megan/umich/courses/SI507/FinalProject/Track/"
-    url = base + addition
-    webbrowser.open_new(url)
+    #The report is only rewritten if something it shows changed since the last time it was made
+    inputs = report_build.report_inputs(source, requested, results_type, chart_hashes, query)
+    addition = create_html(athlete_name, name, results_type, results, images, inputs=inputs,
+                           header={"season": meet_catalog.describe(query)})
+    import webbrowser
+    webbrowser.open_new("file://" + os.path.abspath(addition))
+
+def sync_team(roster_file=None, directory="."):
+    """
+    Bulk sync mode. Downloads the json info for every athlete on the team (or on a roster file)
+    at the same time instead of one at a time at the prompt, then prints a summary.
+
+    Input: roster_file - optional path to a roster file (see roster_sync.read_roster); uses ATHLETE_INFO if not given
+           directory - where the athletes' json files go
+    """
+    import roster_sync
+    roster = roster_sync.read_roster(roster_file) if roster_file else ATHLETE_INFO
+    summary = roster_sync.sync_roster(roster, directory)
+    roster_sync.print_summary(summary)
+
+def ingest_athlete(store, athlete_name, athlete_id, filepath, source_hash=None, force=False):
+    """
+    Puts one athlete's races and meets from their json file into the team database (see results_store.py).
+
+    Inputs:
+    store - an open results_store.ResultsStore
+    athlete_name, athlete_id - who the json belongs to
+    filepath - path of the athlete's json file
+    source_hash - hash of the json (BioCache.fingerprint). If it matches the last ingest the athlete is skipped.
+    force - ingest even if the hash matches
+
+    Returns: the number of races saved, or None if the athlete was skipped
+    """
+    if not force and source_hash is not None and store.source_hash(athlete_id) == source_hash:
+        return None
+    athlete = read_bio(filepath)
+    meets = [(entry.get("IDMeet"), entry.get("MeetName"), entry.get("EndDate"))
+             for entry in (athlete.get("meets") or {}).values()]
+    results = [(result.get("IDResult"), result.get("EventID"), result.get("MeetID"), result.get("Result"),
+                event_registry.parse_mark(result.get("Result"), event_registry.kind(result.get("EventID"))), result.get("Grade"))
+               for result in get_results(athlete) or []]
+    return store.ingest(athlete_id, athlete_name, meets, results, source_hash)
+
+def ingest_team(roster=ATHLETE_INFO, db_path=None, cache=None, offline=False, force=False):
+    """
+    Ingestion stage for the team database. Makes sure every athlete on the roster has a json file (through the
+    cache) and puts the ones whose json changed since the last ingest into the database.
+
+    Inputs:
+    roster - athlete_info style list/dict or a list of (name, id) tuples
+    db_path - the database file (results_store.DEFAULT_PATH if not given)
+    cache - the BioCache to get athletes from (one is made if not given)
+    offline - use saved copies without checking athletic.net
+    force - ingest every athlete even if their json hasn't changed
+
+    Returns: a dictionary with lists of the "ingested", "unchanged" and "failed" athletes (failed is a dict of
+    name -> error message), the number of "races" saved and the wall "seconds"
+    """
+    import roster_sync
+    import results_store
+    cache = cache or BioCache()
+    summary = {"ingested": [], "unchanged": [], "failed": {}, "races": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    with results_store.ResultsStore(db_path or results_store.DEFAULT_PATH) as store:
+        store.add_events(REPORT_EVENTS)
+        for athlete_name, athlete_id in roster_sync.roster_pairs(roster):
+            try:
+                if offline and cache.has_copy(athlete_name):
+                    filename = cache.path(athlete_name)
+                else:
+                    filename = cache.get(athlete_name, athlete_id)
+                races = ingest_athlete(store, athlete_name, athlete_id, filename, cache.fingerprint(athlete_name), force)
+            except Exception as inst:
+                summary["failed"][athlete_name] = str(inst)
+                continue
+            if races is None:
+                summary["unchanged"].append(athlete_name)
+            else:
+                summary["ingested"].append(athlete_name)
+                summary["races"] += races
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+def print_top_times(event, query=None, limit=10, db_path=None, best_per_athlete=False):
+    """
+    Prints the best marks on the team in one event (fastest, or longest/highest for field events), straight from
+    the team database.
+
+    Inputs: event (a (EventID, report name, graph title) tuple), query (from meet_catalog.parse_query, None for the
+            latest season in the database), limit, db_path, best_per_athlete (only each athlete's best time)
+    """
+    import results_store
+    with results_store.ResultsStore(db_path or results_store.DEFAULT_PATH) as store:
+        if query is None:
+            latest = store.latest_season()
+            query = {"seasons": None if latest is None else [latest, latest], "part": None, "start": None, "end": None}
+        rows = store.top_times(event[0], limit, best_per_athlete=best_per_athlete, **query)
+    print(f"Top {limit} {event[2]} ({meet_catalog.describe(query)})")
+    for place, (athlete_name, mark, value, meet, date) in enumerate(rows, 1):
+        print(f"{place:>3}. {mark:<10} {athlete_name:<24} {date}  {meet}")
+    if not rows:
+        print("  no marks")
+
+def print_leaderboards(events=REPORT_EVENTS, season=None, grade=None, limit=10, db_path=None, skip_empty=False):
+    """
+    Prints the team leaderboards (each athlete's best mark, best first) of some events from the team database.
+
+    Inputs: events (list of (EventID, report name, graph title) tuples), season (a season, "all" for all-time bests
+            or None for the latest season in the database), grade (9-12, None for every grade), limit, db_path,
+            skip_empty (leave out events nobody has a mark in)
+    """
+    import results_store
+    with results_store.ResultsStore(db_path or results_store.DEFAULT_PATH) as store:
+        if season is None:
+            season = store.latest_season()
+        season = None if season in (None, "all") else int(season)
+        boards = [(event, store.leaderboard(event[0], season, grade, limit)) for event in events]
+    heading = (f"{season} season" if season else "All-time") + (f", grade {grade}" if grade else "")
+    for event, rows in boards:
+        if not rows and skip_empty:
+            continue
+        print(f"{event[2]} ({heading})")
+        for place, (athlete_name, mark, value, meet, date) in enumerate(rows, 1):
+            print(f"{place:>3}. {mark:<10} {athlete_name:<24} {date}  {meet}")
+        if not rows:
+            print("  no marks")
+
+def find_athlete(athlete_name, athlete_info=ATHLETE_INFO):
+    """
+    Looks up an athlete's athletic.net id by name (spelling has to match, capitals don't matter).
+
+    Inputs: athlete_name, athlete_info (a roster: a list of {name: id} dictionaries like ATHLETE_INFO, or the
+            (name, id) tuples from roster_sync.read_roster)
+
+    Returns: a tuple of (name as it is in athlete_info, athlete id), or None if they aren't in it
+    """
+    import roster_sync
+    wanted = athlete_name.strip().lower()
+    for name, athlete_id in roster_sync.roster_pairs(athlete_info):
+        if name.lower() == wanted:
+            return name, athlete_id
+    return None
+
+def pick_events(event_names, events=REPORT_EVENTS):
+    """
+    Input: event_names (list of report names like "800" or "4x400", None for all of them)
+
+    Returns: the matching (EventID, report name, graph title) tuples from events, in the order asked for
+    """
+    if not event_names:
+        return list(events)
+    by_name = {event[1]: event for event in events}
+    return [by_name[event_name] for event_name in event_names]
+
+def load_from_cache(athlete_name, athlete_id, cache, offline=False, snapshot=True):
+    """
+    Gets an athlete's json through the cache and loads it. With offline a saved copy is used however old it is,
+    and nothing is downloaded unless there is no copy at all.
+
+    Returns: an athlete dictionary (see load_athlete)
+    """
+    return load_athlete(cached_file(athlete_name, athlete_id, cache, offline), snapshot)
+
+def cached_file(athlete_name, athlete_id, cache, offline=False):
+    """
+    Gets the path of an athlete's json through the cache (see load_from_cache for what offline does).
+
+    Returns: the path of the json file
+    """
+    if offline and cache.has_copy(athlete_name):
+        return cache.path(athlete_name)
+    return cache.get(athlete_name, athlete_id)
+
+def build_report(athlete_name, athlete_id, events=REPORT_EVENTS, query=None, output_directory="reports", cache=None,
+                 policy="changed", offline=False):
+    """
+    Makes one athlete's html report and graphs without asking anything at the prompt (what main does, for
+    scripts and cron jobs). Events the athlete has no races for in the chosen seasons are left out.
+
+    Inputs:
+    athlete_name, athlete_id - who to report on
+    events - list of (EventID, report name, graph title) tuples to include
+    query - which seasons or dates to report on (from meet_catalog.parse_query). None uses the latest season.
+    output_directory - where the report goes (graphs go in an images folder inside it)
+    cache - the BioCache to get the athlete from (one is made if not given)
+    policy - what to do with an existing report (see report_build.POLICIES)
+    offline - use the saved copy of the athlete without checking athletic.net
+
+    Returns: the path of the report
+    """
+    cache = cache or BioCache(stale_while_revalidate=True)
+    filename = cached_file(athlete_name, athlete_id, cache, offline)
+    #taken before the json is read, so a background refresh that lands in between makes the next run rebuild
+    source = cache.fingerprint(athlete_name)
+    athlete = load_athlete(filename)
+    os.makedirs(os.path.join(output_directory, "images"), exist_ok=True)
+    name = athlete_name.replace(" ", "")
+    catalog = get_meet_catalog(athlete)
+    athlete_query = season_query(catalog, query)
+    results_type = []
+    results = []
+    images = []
+    chart_hashes = {}
+    for event_id, event_name, title in events:
+        records = catalog.join(get_event(athlete, event_id), **athlete_query)
+        if not records:
+            continue
+        image_name = "images/" + name + event_name + ".png"
+        results_type.append(event_name)
+        results.append([(time_, meet) for time_, meet, date in records])
+        images.append(image_name)
+        chart_hashes[image_name] = graph_progress([(time_, date) for time_, meet, date in records], title, image_name,
+                                                  output_directory, event_id)
+    inputs = report_build.report_inputs(source, [event[0] for event in events], results_type,
+                                        chart_hashes, query)
+    create_html(athlete_name, name, results_type, results, images, output_directory, policy, inputs,
+                header={"season": meet_catalog.describe(athlete_query)})
+    return os.path.join(output_directory, name + ".html")
+
+def print_results(athlete_name, athlete_id, events=REPORT_EVENTS, query=None, cache=None, offline=False, every_race=False,
+                  store=None, skip_empty=False):
+    """
+    Prints an athlete's fastest time (and with every_race, all of their races) in each event as text. Nothing
+    is graphed, and numpy and matplotlib are never loaded, so this answers in a blink. With a store
+    (a results_store.ResultsStore) the athlete comes from the team database instead of their json.
+    With skip_empty, events the athlete has no marks in are left out instead of printed as "no races".
+    """
+    if store is not None:
+        athlete = store.athlete(athlete_id)
+        if athlete is None:
+            raise LookupError(f"{athlete_name} isn't in the team database. Run python track.py ingest first")
+    else:
+        cache = cache or BioCache(stale_while_revalidate=True)
+        athlete = load_from_cache(athlete_name, athlete_id, cache, offline, snapshot=False)
+    catalog = get_meet_catalog(athlete)
+    athlete_query = season_query(catalog, query)
+    print(f"{athlete_name} ({meet_catalog.describe(athlete_query)})")
+    for event_id, event_name, title in events:
+        records = catalog.join(get_event(athlete, event_id), **athlete_query)
+        if skip_empty and not records:
+            continue
+        if every_race:
+            for time_, meet, date in records:
+                print(f"  {event_name:<6} {time_:<10} {date}  {meet}")
+        best = fastest(records, event_id)
+        label = "Fastest" if event_registry.lower_is_better(event_id) else "Best"
+        if best == NO_RACE:
+            print(f"{label} {event_name}: no races")
+        else:
+            print(f"{label} {event_name}: {best[0]} at {best[1]} ({best[2]})")
+
+def make_parser():
+    """
+    Returns: the argparse parser for the command line (see cli)
+    """
+    event_names = [event[1] for event in REPORT_EVENTS]
+    parser = argparse.ArgumentParser(prog="track.py",
+                                     description="Northville track results from athletic.net. Run with no command to be asked questions at the prompt.")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="time each stage and save a Chrome trace to FILE (and a summary next to it) at exit")
+    parser.add_argument("--base-url", metavar="URL",
+                        help="download from URL instead of athletic.net, i.e. a stand-in from athletic_standin.py")
+    commands = parser.add_subparsers(dest="command")
+
+    def add_common(command, athlete=True):
+        if athlete:
+            command.add_argument("athlete", help='athlete name, i.e. "David Whitaker"')
+        command.add_argument("--events", nargs="+", choices=event_names, metavar="EVENT",
+                             help="events to include: " + ", ".join(event_names) + " (default all)")
+        command.add_argument("--seasons", default=None,
+                             help='seasons or dates, i.e. 2022, "2021-2024 outdoor", "last 30 days" (default latest season). '
+                                  'November and December meets count toward the next season')
+
+    def add_data_dir(command):
+        command.add_argument("--data-dir", default=".",
+                             help="where the athletes' json files are, i.e. a school's folder from crawl (default .)")
+
+    def add_roster(command):
+        command.add_argument("--roster", metavar="FILE", default=None,
+                             help="also look for the athlete in this roster file, i.e. a school's roster from crawl")
+        add_data_dir(command)
+
+    for command_name, command_help in (("fastest", "print the fastest time in each event"),
+                                       ("results", "print every race and the fastest time in each event")):
+        command = commands.add_parser(command_name, help=command_help)
+        add_common(command)
+        add_roster(command)
+        command.add_argument("--offline", action="store_true", help="use the saved copy without checking athletic.net")
+        command.add_argument("--db", default=None, help="answer from this team database (see ingest) instead of the json")
+
+    command = commands.add_parser("report", help="make an athlete's html report with graphs")
+    add_common(command)
+    add_roster(command)
+    command.add_argument("--output-dir", default="reports", help="where the report goes (default reports)")
+    command.add_argument("--policy", choices=report_build.POLICIES, default="changed",
+                         help="what to do if the report is already there (default changed)")
+    command.add_argument("--offline", action="store_true", help="use the saved copy without checking athletic.net")
+    command.add_argument("--no-browser", action="store_true", help="don't open the report when it is done")
+
+    command = commands.add_parser("reports", help="make the report of everyone on the roster")
+    command.add_argument("roster", nargs="?", help="roster file (default the athletes in track.py)")
+    add_common(command, athlete=False)
+    command.add_argument("--output-dir", default="reports", help="where the reports go (default reports)")
+    command.add_argument("--policy", choices=report_build.POLICIES, default="changed",
+                         help="what to do with reports that are already there (default changed)")
+    command.add_argument("--workers", type=int, default=None, help="chart processes to use (default one per CPU)")
+    add_data_dir(command)
+
+    command = commands.add_parser("ingest", help="put everyone on the roster into the team database")
+    command.add_argument("roster", nargs="?", help="roster file (default the athletes in track.py)")
+    command.add_argument("--db", default=None, help="database file (default results.sqlite3)")
+    command.add_argument("--offline", action="store_true", help="use saved copies without checking athletic.net")
+    command.add_argument("--force", action="store_true", help="ingest athletes even if their json hasn't changed")
+    add_data_dir(command)
+
+    command = commands.add_parser("top", help="the fastest times on the team in an event, from the team database")
+    command.add_argument("event", choices=event_names, help="event: " + ", ".join(event_names))
+    command.add_argument("--seasons", default=None,
+                         help='seasons or dates, i.e. 2022, "2021-2024 outdoor", "last 30 days" (default latest season). '
+                              'November and December meets count toward the next season')
+    command.add_argument("--limit", type=int, default=10, help="how many times to show (default 10)")
+    command.add_argument("--best", action="store_true", help="only each athlete's best time")
+    command.add_argument("--db", default=None, help="database file (default results.sqlite3)")
+
+    command = commands.add_parser("leaderboard", help="each athlete's best mark per event, from the team database")
+    command.add_argument("events", nargs="*", metavar="EVENT",
+                         help="events to show: " + ", ".join(event_names) + " (default all)")
+    command.add_argument("--season", default=None, help='a season, or "all" for all-time bests (default latest season). '
+                                                     'November and December meets count toward the next season')
+    command.add_argument("--grade", type=int, choices=range(9, 13), default=None, help="only marks made in this grade")
+    command.add_argument("--limit", type=int, default=10, help="how many athletes to show per event (default 10)")
+    command.add_argument("--db", default=None, help="database file (default results.sqlite3)")
+
+    command = commands.add_parser("serve", help="run a local web server that shows the reports")
+    command.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    command.add_argument("--port", type=int, default=8507, help="port to listen on (default 8507)")
+    command.add_argument("--static-dir", default="reports", help="where styles.css and the logo are (default reports)")
+    command.add_argument("--offline", action="store_true", help="only use saved copies, never check athletic.net")
+
+    command = commands.add_parser("sync", help="download everyone on the roster")
+    command.add_argument("roster", nargs="?", help="roster file (default the athletes in track.py)")
+    add_data_dir(command)
+
+    command = commands.add_parser("meet", help="read a meet results page (url or saved html) and print or save its marks")
+    command.add_argument("source", help="url of the meet results page, or a saved copy of it")
+    command.add_argument("--meet-id", type=int, default=None, help="the meet's athletic.net id, if the page doesn't have it")
+    command.add_argument("--team", default=None, help="only show this team's marks")
+    command.add_argument("--db", default=None, help="also add the marks to this team database (see ingest)")
+    command.add_argument("--cache-dir", default="meets", help="where downloaded pages are kept (default meets)")
+
+    command = commands.add_parser("crawl", help="find and download everyone on a school's team (see school_crawl.py)")
+    command.add_argument("schools", nargs="*", metavar="SCHOOL_ID", help="athletic.net SchoolIDs (default Northville)")
+    command.add_argument("--seasons", default=None, help="i.e. 2022 or 2019-2024 (default the last 4)")
+    command.add_argument("--dir", default="schools", help="where each school's folder goes (default schools)")
+    command.add_argument("--workers", type=int, default=4, help="the most downloads at once (default 4)")
+    command.add_argument("--rate", type=float, default=2.0, help="the most requests a second to one host (default 2)")
+    command.add_argument("--force", action="store_true", help="ask for every season and athlete again")
+    return parser
+
+def cli(argv=None):
+    """
+    The command line. With no command it runs the interactive main(), otherwise it does the command and
+    exits without asking anything, so it can be run from cron or a script:
+
+        python track.py fastest "David Whitaker" --events 1600
+        python track.py results "David Whitaker" --seasons "2021-2024 outdoor"
+        python track.py report "David Whitaker" --events 800 1600 --output-dir reports --no-browser
+        python track.py fastest "Jane Doe" --roster schools/school_12811/school_12811.roster.json --data-dir schools/school_12811
+        python track.py reports [ROSTER] --seasons 2022
+        python track.py reports schools/school_12811/school_12811.roster.json --data-dir schools/school_12811
+        python track.py ingest [ROSTER] [--data-dir DIR]
+        python track.py top 1600 --seasons 2022 --limit 10
+        python track.py serve --port 8507
+        python track.py sync [ROSTER]
+
+    Put --trace FILE before the command to time each stage (see instrument.py), and --base-url URL to download
+    from a stand-in server (see athletic_standin.py) instead of athletic.net.
+
+    Returns: the exit code
+    """
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    if args.trace:
+        instrument.enable(args.trace)
+    if args.base_url:
+        import athletic_client
+        os.environ[athletic_client.BASE_URL_VAR] = args.base_url
+    if args.command is None:
+        main()
+        return 0
+    if args.command == "sync":
+        sync_team(args.roster, args.data_dir)
+        return 0
+    if args.command == "meet":
+        import WebScrape
+        try:
+            html = WebScrape.read_meet_page(args.source, args.cache_dir)
+        except Exception as inst:
+            print(f"Couldn't get {args.source}: {inst}", file=sys.stderr)
+            return 1
+        meet_results = WebScrape.parse_meet_page(html, args.meet_id)
+        WebScrape.print_meet(meet_results, args.team)
+        if args.db:
+            import results_store
+            with results_store.ResultsStore(args.db) as store:
+                store.add_events(REPORT_EVENTS)
+                try:
+                    athletes, marks, unlinked = WebScrape.ingest_meet(store, meet_results)
+                except ValueError as inst:
+                    parser.error(str(inst))
+            print(f"Saved {marks} marks of {athletes} athletes to {args.db}")
+            if unlinked:
+                print(f"{unlinked} marks without an athlete (relay teams) weren't saved")
+        return 0
+    if args.command == "crawl":
+        import school_crawl
+        try:
+            school_crawl.season_range(args.seasons)
+        except ValueError as inst:
+            parser.error(str(inst))
+        summaries = school_crawl.crawl_schools(args.schools or [school_crawl.DEFAULT_SCHOOL_ID], args.seasons, args.dir,
+                                               args.workers, args.rate, args.base_url, args.force)
+        for summary in summaries:
+            school_crawl.print_summary(summary)
+        return 1 if any(summary["failed"] for summary in summaries) else 0
+    if args.command == "serve":
+        import report_server
+        report_server.serve(args.host, args.port,
+                            report_server.ReportService(static_directory=args.static_dir, offline=args.offline))
+        return 0
+
+    if args.command == "ingest":
+        import roster_sync
+        roster = roster_sync.read_roster(args.roster) if args.roster else ATHLETE_INFO
+        summary = ingest_team(roster, args.db, BioCache(args.data_dir), offline=args.offline, force=args.force)
+        print(f"Ingested {len(summary['ingested'])} athlete(s) ({summary['races']} races), "
+              f"{len(summary['unchanged'])} unchanged, {len(summary['failed'])} failed in {summary['seconds']:.2f}s")
+        for athlete_name, error in summary["failed"].items():
+            print(f"  {athlete_name}: {error}")
+        return 1 if summary["failed"] else 0
+    if args.command == "leaderboard":
+        if args.season not in (None, "all") and not args.season.isdigit():
+            parser.error(f"Can't understand the season {args.season!r}")
+        event_names = [event[1] for event in REPORT_EVENTS]
+        for event_name in args.events:
+            if event_name not in event_names:
+                parser.error(f"No event called {event_name!r}. Known events: " + ", ".join(event_names))
+        print_leaderboards(pick_events(args.events), args.season, args.grade, args.limit, args.db,
+                           skip_empty=not args.events)
+        return 0
+    try:
+        query = meet_catalog.parse_query(args.seasons) if args.seasons else None
+    except ValueError as inst:
+        parser.error(str(inst))
+    if args.command == "top":
+        print_top_times(pick_events([args.event])[0], query, args.limit, args.db, args.best)
+        return 0
+    events = pick_events(args.events)
+    if args.command == "reports":
+        import roster_sync
+        roster = roster_sync.read_roster(args.roster) if args.roster else ATHLETE_INFO
+        summaries = build_team_reports(roster, args.output_dir, events, args.workers, BioCache(args.data_dir),
+                                       policy=args.policy, query=query)
+        print_report_summary(summaries)
+        return 1 if any(summary["error"] for summary in summaries) else 0
+
+    roster = ATHLETE_INFO
+    if args.roster:
+        import roster_sync
+        #the roster file comes first, so its id wins if an athlete is in both
+        roster = roster_sync.read_roster(args.roster) + roster_sync.roster_pairs(ATHLETE_INFO)
+    found = find_athlete(args.athlete, roster)
+    if found is None:
+        parser.error(f"{args.athlete!r} isn't on the roster. Check the spelling or try another athlete")
+    athlete_name, athlete_id = found
+    cache = BioCache(args.data_dir, stale_while_revalidate=True)
+    try:
+        if args.command in ("fastest", "results"):
+            store = None
+            if args.db:
+                import results_store
+                store = results_store.ResultsStore(args.db)
+            try:
+                print_results(athlete_name, athlete_id, events, query, cache, offline=args.offline,
+                              every_race=args.command == "results", store=store, skip_empty=not args.events)
+            finally:
+                if store is not None:
+                    store.close()
+            return 0
+        report = build_report(athlete_name, athlete_id, events, query, args.output_dir, cache, policy=args.policy,
+                              offline=args.offline)
+    except Exception as inst:
+        print(f"Couldn't get {athlete_name}: {inst}", file=sys.stderr)
+        return 1
+    print(report)
+    if not args.no_browser:
+        import webbrowser
+        webbrowser.open_new("file://" + os.path.abspath(report))
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(cli())